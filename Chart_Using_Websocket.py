@@ -1,76 +1,68 @@
 import asyncio
-import websockets
 import threading
-import json
 import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import plotly.graph_objs as go
 import plotly.subplots as sp
-import pandas as pd
-from datetime import datetime
-import time
+from ring_buffer import CandleRingBuffer
+from binance_feed import KlineStreamConsumer, apply_kline
+from timeframe_aggregator import TimeframeAggregator
+from indicators import EMA, SMA, VWAP, BollingerBands, IndicatorSet, epoch_seconds
+from push_updates import UpdateChannel, add_event_stream, push_url
 
 # Initialize Dash app
 app = dash.Dash(__name__)
 
 # WebSocket URI for live BTC market data (Binance)
 uri = "wss://stream.binance.com:9443/ws/btcusdt@kline_1m"  # Replace with your WebSocket URI
+SYMBOL = "btcusdt"  # Symbol of the stream above, names its update events
+
+# Fixed-capacity buffer to store live data from the WebSocket (last 100 data points)
+live_data_buffer = CandleRingBuffer(capacity=100)
+
+# Higher timeframes derived locally from the 1-minute stream
+DERIVED_TIMEFRAMES = ['5m', '15m', '1h', '4h']
+aggregator = TimeframeAggregator('1m', DERIVED_TIMEFRAMES, capacity=100)
+
+# Overlay indicators per timeframe, updated incrementally from each chart refresh
+indicator_sets = {
+    timeframe: IndicatorSet({'SMA 20': SMA(20), 'EMA 50': EMA(50), 'BB 20': BollingerBands(20, 2.0), 'VWAP': VWAP()},
+                            capacity=100)
+    for timeframe in ['1m'] + DERIVED_TIMEFRAMES
+}
+
+message_count = 0
+
+updates = UpdateChannel()  # Pushes an event to the open charts for every processed kline
+
+
+# Called from the consumer's processing task for every (possibly coalesced) kline
+def on_kline(stream, kline):
+    global message_count
+
+    # Upsert the candlestick by open time so the forming candle is overwritten in place
+    parsed = apply_kline(live_data_buffer, kline)
+    aggregator.update(*parsed[:6])
+    for timeframe in ['1m'] + DERIVED_TIMEFRAMES:
+        updates.publish(SYMBOL, timeframe)
+
+    # Print the last few entries in the buffer for monitoring
+    message_count += 1
+    if message_count % 10 == 0:
+        print(live_data_buffer.to_frame(volume_column='tick_volume').tail())  # Print last few rows
+        print(f"Stream stats: {consumer.stats}")
+
+
+# Non-blocking receive/process tasks with reconnect and a bounded queue in between
+consumer = KlineStreamConsumer(uri, on_kline)
 
-# Buffer to store live data from the WebSocket
-live_data_buffer = []
-
-# Function to get live data from WebSocket and print it
-async def live_data():
-    global live_data_buffer
-    try:
-        async with websockets.connect(uri) as websocket:
-            print("WebSocket connection established.")
-            while True:
-                # Receive the data from WebSocket
-                data = await websocket.recv()
-                parsed_data = json.loads(data)
-
-                # Extract relevant candlestick data
-                kline = parsed_data['k']
-                open_time = datetime.utcfromtimestamp(kline['t'] / 1000)  # Convert milliseconds to seconds
-                open_price = float(kline['o'])
-                high_price = float(kline['h'])
-                low_price = float(kline['l'])
-                close_price = float(kline['c'])
-                volume = float(kline['v'])
-
-                # Store the parsed data in the live data buffer
-                live_data_buffer.append({
-                    'time': open_time,
-                    'open': open_price,
-                    'high': high_price,
-                    'low': low_price,
-                    'close': close_price,
-                    'tick_volume': volume
-                })
-
-                # Print the last few entries in the buffer for monitoring
-                if len(live_data_buffer) % 10 == 0:
-                    df = pd.DataFrame(live_data_buffer)
-                    df['time'] = pd.to_datetime(df['time'], errors='coerce')  # Ensure time is in datetime format
-                    print(df.tail())  # Print last few rows
-
-                # Limit the buffer size to 100 data points
-                if len(live_data_buffer) > 100:
-                    live_data_buffer = live_data_buffer[-100:]
-
-                time.sleep(1)
-
-    except Exception as e:
-        print(f"Error occurred: {e}")
-        await asyncio.sleep(1)  # Retry connection on error
 
 # Start the WebSocket connection in a separate thread
 def start_websocket():
     loop = asyncio.new_event_loop()
     asyncio.set_event_loop(loop)
-    loop.run_until_complete(live_data())
+    loop.run_until_complete(consumer.run())
 
 # Start WebSocket listener in the background
 threading.Thread(target=start_websocket, daemon=True).start()
@@ -83,9 +75,22 @@ app.layout = html.Div([
         value=['show_volume'],
         style={'margin': '10px'}
     ),
+    dcc.Checklist(
+        id='indicator-checklist',
+        options=[{'label': name, 'value': name} for name in ['SMA 20', 'EMA 50', 'BB 20', 'VWAP']],
+        value=['SMA 20'],
+        inline=True,
+        style={'margin': '10px'}
+    ),
     dcc.Dropdown(
         id='timeframe-dropdown',
-        options=[{'label': '1 Minute', 'value': '1m'}],
+        options=[
+            {'label': '1 Minute', 'value': '1m'},
+            {'label': '5 Minutes', 'value': '5m'},
+            {'label': '15 Minutes', 'value': '15m'},
+            {'label': '1 Hour', 'value': '1h'},
+            {'label': '4 Hours', 'value': '4h'}
+        ],
         value='1m',  # Default timeframe
         style={'width': '200px', 'margin-bottom': '10px'}
     ),
@@ -94,11 +99,8 @@ app.layout = html.Div([
         style={'width': '100%', 'height': '100%'},
         config={'displayModeBar': False}  # Hide Plotly mode bar for a cleaner look
     ),
-    dcc.Interval(
-        id='interval-component',
-        interval=1 * 1000,  # Update every 1 second
-        n_intervals=0
-    )
+    dcc.Store(id='push-url'),  # Event stream of the selected timeframe
+    dcc.Store(id='push-event')  # Written by the server whenever that timeframe updates
 ], style={
     'width': '100vw',
     'height': '100vh',
@@ -109,23 +111,36 @@ app.layout = html.Div([
     'justifyContent': 'center'
 })
 
+# Serve the update events instead of polling every second
+add_event_stream(app, updates, [(SYMBOL, timeframe) for timeframe in ['1m'] + DERIVED_TIMEFRAMES])
+
+
+@app.callback(
+    Output('push-url', 'data'),
+    [Input('timeframe-dropdown', 'value')]
+)
+def update_push_url(selected_timeframe):
+    return push_url(SYMBOL, selected_timeframe)
+
 # Callback to update the chart with new data
 @app.callback(
     Output('live-candlestick-chart', 'figure'),
-    [Input('interval-component', 'n_intervals'),
+    [Input('push-event', 'data'),
      Input('timeframe-dropdown', 'value'),
-     Input('volume-checkbox', 'value')]
+     Input('volume-checkbox', 'value'),
+     Input('indicator-checklist', 'value')]
 )
-def update_chart(n, selected_timeframe, volume_option):
+def update_chart(event, selected_timeframe, volume_option, overlay_names):
+    # Switching timeframe only changes which local buffer is read
+    buffer = live_data_buffer if selected_timeframe == '1m' else aggregator.buffer(selected_timeframe)
+
     # Check if there is enough data
-    if len(live_data_buffer) == 0:
+    if len(buffer) == 0:
         print("No data available for chart update.")
         return go.Figure()  # Return an empty figure if no data
 
-    # Convert live data buffer into DataFrame
-    df = pd.DataFrame(live_data_buffer)
-    df['time'] = pd.to_datetime(df['time'], errors='coerce')  # Ensure time is in datetime format
-    df.dropna(subset=['time'], inplace=True)  # Drop rows with invalid time
+    # Snapshot the buffer into a DataFrame
+    df = buffer.to_frame(volume_column='tick_volume')
 
     # Ensure that there is data in the last 100 data points
     if df.empty:
@@ -183,6 +198,14 @@ def update_chart(n, selected_timeframe, volume_option):
     # Add candlestick trace to the figure
     fig.add_trace(candlestick_trace, row=1, col=1)
 
+    # Indicator overlays: only the bars since the last refresh are streamed into the running state
+    indicators = indicator_sets[selected_timeframe]
+    indicators.feed_frame(df)
+    values = indicators.values(epoch_seconds(df['time']))
+    for name in indicators.columns_of(overlay_names or []):
+        fig.add_trace(go.Scatter(x=df['time'], y=values[name], mode='lines', name=name, line=dict(width=1)),
+                      row=1, col=1)
+
     # Layout for styling
     fig.update_layout(
         title="Live Market Data",
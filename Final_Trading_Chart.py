@@ -1,10 +1,17 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import plotly.graph_objs as go
-import plotly.subplots as sp
 import MetaTrader5 as mt5
+import numpy as np
 import pandas as pd
+import threading
+from candle_archive import rates_to_frame
+from figure_builder import VOLUME_TRACE, build_figure
+from figure_patch import bars_delta, build_patch, chart_state
+from indicators import ATR, EMA, MACD, RSI, SMA, VWAP, BollingerBands, IndicatorSet, epoch_seconds
+from market_data_service import MarketDataService
+from push_updates import UpdateChannel, add_event_stream, push_url
 
 # Available timeframes
 TIMEFRAMES = {
@@ -16,20 +23,75 @@ TIMEFRAMES = {
 }
 
 SYMBOL = "BTCUSD"  # You can change this to any other symbol
+CANDLES = 100  # Bars shown on the chart
+CLIENTSIDE_RENDERING = True  # Browsers merge pushed bars themselves; Python only builds the figure on view changes
+PANEL_HEIGHT = 150  # Extra chart height when an indicator panel is shown
 
 # Initialize MetaTrader 5 connection
 mt5.initialize()
 
+# Every chart timeframe up to D1 is derived from the M1 feed
+market_data = MarketDataService(base_timeframe=mt5.TIMEFRAME_M1)
 
-def get_data(symbol, timeframe, count=100):
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
-    if rates is None or len(rates) == 0:
+# Drives the push-event Store and, with CLIENTSIDE_RENDERING, the browser-side bar merge
+updates = UpdateChannel()
+market_data.add_listener(lambda symbol, timeframe, rates: updates.publish(symbol, timeframe))
+
+
+def make_indicators():
+    return IndicatorSet({
+        'SMA 20': SMA(20),
+        'EMA 50': EMA(50),
+        'BB 20': BollingerBands(20, 2.0),
+        'VWAP': VWAP(),
+        'RSI 14': RSI(14),
+        'ATR 14': ATR(14),
+        'MACD': MACD(),
+    }, capacity=CANDLES)
+
+
+# Running indicator state per symbol/timeframe, shared by every session
+indicator_sets = {}
+indicator_lock = threading.Lock()
+
+
+def get_indicators(symbol, timeframe):
+    key = (symbol, int(timeframe))
+    with indicator_lock:
+        indicators = indicator_sets.get(key)
+        if indicators is None:
+            indicators = indicator_sets[key] = make_indicators()
+        return indicators
+
+
+indicator_names = make_indicators()  # Only read for the names and kinds offered in the controls
+
+
+def get_data(symbol, timeframe, count=CANDLES):
+    # The CANDLES window the chart and the indicators are built from
+    snapshot = market_data.get(symbol, timeframe, count)
+    if snapshot is None:
         print(f"Failed to retrieve data for {symbol}")
         return pd.DataFrame()  # Return empty DataFrame if there's an issue
 
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    return df[['time', 'open', 'high', 'low', 'close', 'tick_volume']]
+    return rates_to_frame(snapshot.rates)
+
+
+def pushed_bars(symbol, timeframe, since):
+    # Bars at or after ``since`` (the whole window on a new stream) shipped with each update event
+    snapshot = market_data.snapshot(symbol, int(timeframe))
+    if snapshot is None:
+        return None, since
+    rates = snapshot.rates[-CANDLES:]
+
+    # Feeding the window only streams in the bars from the forming one on, O(1) per indicator
+    indicators = get_indicators(symbol, timeframe)
+    indicators.feed(rates['time'], rates['open'], rates['high'], rates['low'], rates['close'], rates['tick_volume'])
+    if since is not None:
+        rates = rates[np.searchsorted(rates['time'], since):]
+    if len(rates) == 0:
+        return None, since
+    return {'bars': bars_delta(rates_to_frame(rates), lines=indicators.values(rates['time']))}, int(rates['time'][-1])
 
 
 app = dash.Dash(__name__)
@@ -41,6 +103,20 @@ app.layout = html.Div([
         value=['show_volume'],
         style={'margin': '10px'}
     ),
+    dcc.Checklist(
+        id='indicator-checklist',
+        options=[{'label': name, 'value': name} for name in indicator_names.overlays()],
+        value=['SMA 20'],
+        inline=True,
+        style={'margin': '10px'}
+    ),
+    dcc.Dropdown(
+        id='panel-dropdown',
+        options=[{'label': name, 'value': name} for name in indicator_names.panels()],
+        value=None,  # No indicator panel by default
+        placeholder="Indicator panel",
+        style={'width': '200px', 'margin-bottom': '10px'}
+    ),
     dcc.Dropdown(
         id='timeframe-dropdown',
         options=[{'label': key, 'value': value} for key, value in TIMEFRAMES.items()],
@@ -52,11 +128,10 @@ app.layout = html.Div([
         style={'width': '100%', 'height': '100%'},  # Responsive width and height
         config={'displayModeBar': False}  # Hide Plotly mode bar for a cleaner look
     ),
-    dcc.Interval(
-        id='interval-component',
-        interval=1 * 1000,  # Update every 1 second
-        n_intervals=0
-    )
+    dcc.Store(id='chart-state'),  # What the browser's figure holds, for incremental updates
+    dcc.Store(id='push-url'),  # Event stream of the selected timeframe
+    dcc.Store(id='push-event'),  # Written by the server whenever that timeframe publishes
+    dcc.Store(id='push-delta')  # Bars pushed for client-side rendering
 ], style={
     'width': '100vw',  # Full width of the viewport
     'height': '100vh',  # Full height of the viewport
@@ -68,116 +143,79 @@ app.layout = html.Div([
 })
 
 
-@app.callback(
-    Output('live-candlestick-chart', 'figure'),
-    [Input('interval-component', 'n_intervals'),
-     Input('timeframe-dropdown', 'value'),
-     Input('volume-checkbox', 'value')]
-)
-def update_chart(n, selected_timeframe, volume_option):
-    df = get_data(SYMBOL, selected_timeframe, count=100)
+STREAMS = [(SYMBOL, timeframe) for timeframe in TIMEFRAMES.values()]  # Event streams the chart can open
 
-    if df.empty:
-        return go.Figure()
 
-    # Determine if volume is enabled
-    show_volume = 'show_volume' in volume_option
+def keep_subscribed(symbol, timeframe):
+    # Subscribe with the chart's CANDLES window rather than the default 100 bars
+    market_data.subscribe(symbol, int(timeframe), CANDLES)
 
-    # Define colors for volume based on candle direction
-    volume_colors = ['green' if row['close'] > row['open'] else 'red' for index, row in df.iterrows()]
-
-    # Set up subplots: conditionally add second row if volume is checked
-    if show_volume:
-        fig = sp.make_subplots(
-            rows=2, cols=1,
-            shared_xaxes=True,
-            row_heights=[0.7, 0.3],
-            vertical_spacing=0.02,
-        )
-    else:
-        fig = sp.make_subplots(
-            rows=1, cols=1
-        )
-
-    # Create a candlestick chart trace
-    candlestick_trace = go.Candlestick(
-        x=df['time'],
-        open=df['open'],
-        high=df['high'],
-        low=df['low'],
-        close=df['close'],
-        name="Candlesticks",
-        hoverinfo="x+y"  # Show crosshair with date and price
-    )
 
-    # Create a volume bar chart trace if volume is enabled
-    if show_volume:
-        volume_trace = go.Bar(
-            x=df['time'],
-            y=df['tick_volume'],
-            name="Volume",
-            marker=dict(color=volume_colors),
-            hoverinfo="x+y"  # Display volume information on hover
-        )
-        fig.add_trace(volume_trace, row=2, col=1)
-
-    # Add candlestick trace to the figure
-    fig.add_trace(candlestick_trace, row=1, col=1)
-
-    # Determine the color based on price movement
-    last_price = df['close'].iloc[-1]
-    price_color = "green" if df['close'].iloc[-1] > df['close'].iloc[-2] else "red"
-
-    # Update layout to add crosshair-style hovermode and dark theme
-    fig.update_layout(
-        title=f"Live Chart for {SYMBOL}",
-        xaxis=dict(showgrid=True, gridcolor='DarkGray', showticklabels=True),
-        yaxis=dict(showgrid=True, gridcolor='DarkGray', side="right", showticklabels=True),
-        height=800 if show_volume else 600,  # Adjust height dynamically based on volume chart
-        margin=dict(l=0, r=80, t=50, b=0),  # Increased right margin to display price
-        xaxis_rangeslider_visible=False,
-        showlegend=False,
-        plot_bgcolor='rgb(20, 24, 31)',  # Dark background
-        paper_bgcolor='rgb(20, 24, 31)',  # Dark background for paper
-        font=dict(color="white"),  # White font for contrast
-        hovermode='x unified',  # Crosshair style hover mode
+if CLIENTSIDE_RENDERING:
+    # Events carry the changed bars and are merged into the figure in the browser, so
+    # push-event is only written (as a fallback) while the chart has no candles yet
+    add_event_stream(app, updates, STREAMS, event_id='push-delta', on_wait=keep_subscribed, delta=pushed_bars)
+    app.clientside_callback(
+        ClientsideFunction(namespace='chart', function_name='applyDelta'),
+        Output('live-candlestick-chart', 'figure', allow_duplicate=True),
+        Input('push-delta', 'data'),
+        State('live-candlestick-chart', 'figure'),
+        State('push-event', 'id'),
+        prevent_initial_call=True
     )
+else:
+    add_event_stream(app, updates, STREAMS, on_wait=keep_subscribed)
 
-    # Add a horizontal line at the live price level and a box with live price outside the grid
-    fig.add_shape(
-        type="line",
-        x0=0, x1=1, y0=last_price, y1=last_price,
-        xref="paper", yref="y",
-        line=dict(color=price_color, width=2, dash="dash")
-    )
 
-    fig.update_yaxes(
-        tickformat=".2f",  # Display full numbers with two decimal places
-        showgrid=True,
-        gridcolor='DarkGray',
-        side="right"
-    )
+@app.callback(
+    Output('push-url', 'data'),
+    [Input('timeframe-dropdown', 'value')]
+)
+def update_push_url(selected_timeframe):
+    return push_url(SYMBOL, selected_timeframe)
 
-    fig.add_annotation(
-        xref="paper", yref="y",
-        x=1.047, y=last_price,  # Adjust position to be slightly outside the chart
-        text=f"{last_price:.2f}",  # Display live price with two decimal places
-        showarrow=False,
-        font=dict(color="white", size=12, family="Arial"),
-        bgcolor=price_color,
-        bordercolor="white",
-        align="center",
-        borderpad=4  # Padding inside the box to make it adapt to content width
-    )
 
-    # Customize hover appearance for crosshair-like effect
-    fig.update_xaxes(showline=True, linecolor='DarkGray', linewidth=1)
-    fig.update_yaxes(showline=True, linecolor='DarkGray', linewidth=1)
+@app.callback(
+    [Output('live-candlestick-chart', 'figure'),
+     Output('chart-state', 'data')],
+    [Input('push-event', 'data'),
+     Input('timeframe-dropdown', 'value'),
+     Input('volume-checkbox', 'value'),
+     Input('indicator-checklist', 'value'),
+     Input('panel-dropdown', 'value')],
+    [State('chart-state', 'data')]
+)
+def update_chart(event, selected_timeframe, volume_option, overlay_names, panel_name, state):
+    df = get_data(SYMBOL, selected_timeframe)
 
-    # Set consistent time display format and avoid overflow
-    fig.update_xaxes(tickformat="%H:%M", matches='x')
+    if df.empty:
+        return go.Figure(), None
+
+    # Determine if volume is enabled
+    show_volume = 'show_volume' in volume_option
 
-    return fig
+    # Indicator series for the bars on the chart, kept up to date incrementally
+    indicators = get_indicators(SYMBOL, selected_timeframe)
+    indicators.feed_frame(df)
+    values = indicators.values(epoch_seconds(df['time']))
+    overlays = {name: values[name] for name in indicators.columns_of(overlay_names or [])}
+    panel = {name: values[name] for name in indicators.columns_of([panel_name] if panel_name else [])}
+
+    # Send only the changed and appended bars and the moved price line when the view is unchanged
+    # (with client-side rendering the browser's arrays have moved on, so the figure is always rebuilt)
+    view = [selected_timeframe, show_volume, overlay_names, panel_name]
+    if not CLIENTSIDE_RENDERING:
+        first_line = VOLUME_TRACE + 1 if show_volume else VOLUME_TRACE
+        lines = {first_line + i: series for i, series in enumerate(list(overlays.values()) + list(panel.values()))}
+        patch, new_state = build_patch(df, state, view, volume_index=VOLUME_TRACE if show_volume else None,
+                                       lines=lines)
+        if patch is not None:
+            return patch, new_state
+
+    height = (800 if show_volume else 600) + (PANEL_HEIGHT if panel else 0)  # Grow with the volume and indicator rows
+    fig = build_figure(df, f"Live Chart for {SYMBOL}", show_volume, height=height, overlays=overlays, panel=panel,
+                       stream=push_url(SYMBOL, selected_timeframe))
+    return fig, chart_state(df, view)
 
 
 if __name__ == '__main__':
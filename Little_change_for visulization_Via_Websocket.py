@@ -2,126 +2,131 @@ import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import plotly.graph_objs as go
-import plotly.subplots as sp
-import websocket
+import asyncio
 import threading
 import pandas as pd
-import json
-import requests
-import time
-
-# Binance WebSocket URL template
-BINANCE_SOCKET_URL_TEMPLATE = "wss://stream.binance.com:9443/ws/{}@kline_{}"
-BINANCE_REST_API_URL_TEMPLATE = "https://api.binance.com/api/v3/klines?symbol={}&interval={}&limit=50"
+from binance_backfill import KlineBackfill
+from binance_feed import CombinedKlineStream, kline_to_frame
+from candle_store import CandleStore
+from timeframe_aggregator import TimeframeAggregator
+from push_updates import UpdateChannel, add_event_stream, push_url
+from indicators import EMA, SMA, VWAP, BollingerBands, IndicatorSet, epoch_seconds
 
 # Initialize Dash app
 app = dash.Dash(__name__)
 
-# Shared DataFrame to store live prices
-live_data = pd.DataFrame(columns=['time', 'open', 'high', 'low', 'close', 'volume'])
+store = CandleStore()  # Closed candles, one row per open time; also the backfill cache
+backfill = KlineBackfill(store)  # Pooled, paginated REST history
 
 # Default symbol and timeframe
 SYMBOL = "btcusdt"
 DEFAULT_TIMEFRAME = "1m"  # Default to 1-minute candlesticks
+BASE_TIMEFRAME = "1m"  # Stream the higher timeframes are derived from
+DERIVED_TIMEFRAMES = ['15m', '1h', '4h']
+TIMEFRAMES = ['1s', '1m', '15m', '1h', '4h', '1d']  # Intervals offered by the timeframe dropdown
+BASE_HISTORY = 7 * 24 * 60  # 1-minute candles (one week) loaded to backfill the derived timeframes
+
+# One aggregator per symbol, fed by that symbol's base stream
+aggregators = {}
+
+# Pushes an event to the open charts of a symbol/interval whenever its buffer changes
+updates = UpdateChannel()
+
+# Streams whose history is being loaded, guarded by the lock
+pending_streams = set()
+stream_lock = threading.Lock()
 
-# Global WebSocket connection and lock
-websocket_connection = None
-websocket_lock = threading.Lock()
+# Overlay indicators per symbol/interval, updated incrementally from each chart refresh
+indicator_sets = {}
+OVERLAYS = ['SMA 20', 'EMA 50', 'BB 20', 'VWAP']
 
 
-def fetch_historical_data(symbol, interval, limit=50):
+def fetch_historical_data(symbol, interval, limit=500):
     """
     Fetch the historical data for the given symbol and interval from Binance's REST API.
+    Pages are fetched concurrently and cached on disk, so later starts only request the missing tail.
     This data will be used to initialize the chart.
     """
-    url = BINANCE_REST_API_URL_TEMPLATE.format(symbol.upper(), interval)
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        data = response.json()
-        historical_data = []
-        for entry in data:
-            historical_data.append({
-                'time': pd.to_datetime(entry[0], unit='ms'),
-                'open': float(entry[1]),
-                'high': float(entry[2]),
-                'low': float(entry[3]),
-                'close': float(entry[4]),
-                'volume': float(entry[5]),
-            })
-        return pd.DataFrame(historical_data)
-    else:
-        print("Error fetching historical data")
+    try:
+        return backfill.load_recent(symbol, interval, limit)
+    except Exception as e:
+        print(f"Error fetching historical data: {e}")
         return pd.DataFrame()
 
 
-def start_websocket(symbol, interval):
+def on_kline(stream, parsed):
+    symbol, interval = stream.split('@kline_')
+    if interval == BASE_TIMEFRAME and symbol in aggregators:
+        aggregators[symbol].update(*parsed[:6])
+        for timeframe in DERIVED_TIMEFRAMES:
+            updates.publish(symbol, timeframe)
+    updates.publish(symbol, interval)
+
+    # Persist closed candles once; forming updates only live in the stream buffer
+    if parsed[6]:
+        store.upsert(symbol, interval, kline_to_frame(parsed))
+
+
+# Shared fixed-capacity buffers (last 500 candles) per symbol/interval, fed by one connection
+stream = CombinedKlineStream(capacity=500, on_kline=on_kline)
+
+
+def get_indicators(symbol, interval):
+    with stream_lock:
+        indicators = indicator_sets.get((symbol, interval))
+        if indicators is None:
+            indicators = indicator_sets[(symbol, interval)] = IndicatorSet(
+                {'SMA 20': SMA(20), 'EMA 50': EMA(50), 'BB 20': BollingerBands(20, 2.0), 'VWAP': VWAP()},
+                capacity=500)
+        return indicators
+
+
+def start_websocket():
     """
-    Start a WebSocket connection for the given symbol and interval.
+    Run the combined-stream connection on its own event loop in a background thread.
     """
-    global websocket_connection, live_data
-
-    with websocket_lock:
-        # Fetch historical data and set initial live_data
-        live_data = fetch_historical_data(symbol, interval)
-
-        # Close any existing WebSocket connection
-        if websocket_connection:
-            try:
-                websocket_connection.close()
-                time.sleep(1)  # Ensure the connection is fully closed
-            except Exception as e:
-                print(f"Error while closing WebSocket: {e}")
-
-        # WebSocket URL for the selected symbol and interval
-        url = BINANCE_SOCKET_URL_TEMPLATE.format(symbol, interval)
-
-        def on_message(ws, message):
-            global live_data
-            try:
-                data = json.loads(message)
-                kline = data['k']
-
-                # Extract relevant kline data
-                row = {
-                    'time': pd.to_datetime(kline['t'], unit='ms'),
-                    'open': float(kline['o']),
-                    'high': float(kline['h']),
-                    'low': float(kline['l']),
-                    'close': float(kline['c']),
-                    'volume': float(kline['v']),
-                }
-
-                # Append the new row to the live_data DataFrame
-                live_data = pd.concat([live_data, pd.DataFrame([row])]).tail(500)  # Keep last 500 rows
-            except Exception as e:
-                print(f"Error processing WebSocket message: {e}")
-
-        def on_error(ws, error):
-            print(f"WebSocket Error: {error}")
-
-        def on_close(ws, close_status_code, close_msg):
-            print(f"WebSocket Closed for {symbol} at {interval} interval")
-
-        def on_open(ws):
-            print(f"WebSocket Connection Opened for {symbol} at {interval} interval")
-
-        # Start the WebSocket connection
-        websocket_connection = websocket.WebSocketApp(
-            url,
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close
-        )
-        websocket_connection.on_open = on_open
-
-        # Run WebSocket in a separate thread
-        websocket_thread = threading.Thread(target=websocket_connection.run_forever, daemon=True)
-        websocket_thread.start()
-
-
-# Start the WebSocket for the default timeframe
-start_websocket(SYMBOL, DEFAULT_TIMEFRAME)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(stream.run())
+
+
+def ensure_stream(symbol, interval):
+    """
+    Return the live buffer for a symbol/interval, subscribing on first use.
+    History is fetched without holding the lock and before the subscription,
+    so live klines never land ahead of older candles. Derived timeframes are
+    served from the symbol's aggregator without any extra stream.
+    """
+    if interval in DERIVED_TIMEFRAMES:
+        if ensure_stream(symbol, BASE_TIMEFRAME) is None:
+            return None
+        return aggregators[symbol].buffer(interval)
+
+    buffer = stream.buffer(symbol, interval)
+    if buffer is not None:
+        return buffer
+
+    with stream_lock:
+        if (symbol, interval) in pending_streams:
+            return None  # Another session is already loading this stream
+        pending_streams.add((symbol, interval))
+    try:
+        if interval == BASE_TIMEFRAME:
+            history = fetch_historical_data(symbol, interval, limit=BASE_HISTORY)
+            aggregator = TimeframeAggregator(BASE_TIMEFRAME, DERIVED_TIMEFRAMES, capacity=500)
+            aggregator.backfill(history)
+            aggregators[symbol.lower()] = aggregator
+        else:
+            history = fetch_historical_data(symbol, interval)
+        return stream.subscribe(symbol, interval, history)
+    finally:
+        with stream_lock:
+            pending_streams.discard((symbol, interval))
+
+
+# Start the WebSocket connection and subscribe the default timeframe
+threading.Thread(target=start_websocket, daemon=True).start()
+ensure_stream(SYMBOL, DEFAULT_TIMEFRAME)
 
 # Dash Layout
 app.layout = html.Div([
@@ -138,6 +143,13 @@ app.layout = html.Div([
         value=DEFAULT_TIMEFRAME,
         style={'width': '200px', 'margin-bottom': '10px'}
     ),
+    dcc.Checklist(
+        id='indicator-checklist',
+        options=[{'label': name, 'value': name} for name in OVERLAYS],
+        value=['SMA 20'],
+        inline=True,
+        style={'margin-bottom': '10px'}
+    ),
     dcc.Graph(
         id='live-candlestick-chart',
         style={'width': '100%', 'height': '100%'},
@@ -146,41 +158,49 @@ app.layout = html.Div([
             'scrollZoom': True  # Enable mouse scroll zooming
         }
     ),
-    dcc.Interval(
-        id='interval-component',
-        interval=1000,  # Update every 1 second
-        n_intervals=0
-    )
+    dcc.Store(id='push-url'),  # Event stream of the selected timeframe
+    dcc.Store(id='push-event')  # Written by the server whenever that timeframe updates
 ], style={
     'width': '100vw', 'height': '100vh', 'overflow': 'hidden',
     'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center', 'justifyContent': 'center'
 })
 
+# Serve the update events instead of polling every second
+add_event_stream(app, updates, [(SYMBOL, timeframe) for timeframe in TIMEFRAMES])
+
+
+@app.callback(
+    Output('push-url', 'data'),
+    [Input('timeframe-dropdown', 'value')]
+)
+def update_push_url(selected_timeframe):
+    return push_url(SYMBOL, selected_timeframe)
+
 
 # Update chart callback
 @app.callback(
     Output('live-candlestick-chart', 'figure'),
-    [Input('interval-component', 'n_intervals'),
-     Input('timeframe-dropdown', 'value')]
+    [Input('push-event', 'data'),
+     Input('timeframe-dropdown', 'value'),
+     Input('indicator-checklist', 'value')]
 )
-def update_chart(n, selected_timeframe):
-    global live_data
-
-    # Update WebSocket connection if timeframe changes
-    if websocket_connection and websocket_connection.url != BINANCE_SOCKET_URL_TEMPLATE.format(SYMBOL,
-                                                                                               selected_timeframe):
-        start_websocket(SYMBOL, selected_timeframe)
+def update_chart(event, selected_timeframe, overlay_names):
+    # Switching timeframe subscribes another stream on the same connection
+    buffer = ensure_stream(SYMBOL, selected_timeframe)
+    if buffer is None:
+        return go.Figure()
 
-    if live_data.empty:
+    df = buffer.to_frame()
+    if df.empty:
         return go.Figure()
 
     # Set up the candlestick trace
     candlestick_trace = go.Candlestick(
-        x=live_data['time'],
-        open=live_data['open'],
-        high=live_data['high'],
-        low=live_data['low'],
-        close=live_data['close'],
+        x=df['time'],
+        open=df['open'],
+        high=df['high'],
+        low=df['low'],
+        close=df['close'],
         name="Candlesticks"
     )
 
@@ -197,7 +217,14 @@ def update_chart(n, selected_timeframe):
         hovermode='x unified'
     )
 
-    return go.Figure(data=[candlestick_trace], layout=layout)
+    # Indicator overlays: only the bars since the last refresh are streamed into the running state
+    indicators = get_indicators(SYMBOL, selected_timeframe)
+    indicators.feed_frame(df, volume_column='volume')
+    values = indicators.values(epoch_seconds(df['time']))
+    overlays = [go.Scatter(x=df['time'], y=values[name], mode='lines', name=name, line=dict(width=1))
+                for name in indicators.columns_of(overlay_names or [])]
+
+    return go.Figure(data=[candlestick_trace] + overlays, layout=layout)
 
 
 if __name__ == '__main__':
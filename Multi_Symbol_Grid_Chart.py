@@ -0,0 +1,172 @@
+import dash
+from dash import dcc, html
+from dash.dependencies import ALL, ClientsideFunction, Input, Output, State
+import MetaTrader5 as mt5
+import numpy as np
+from candle_archive import rates_to_frame
+from figure_builder import build_figure
+from figure_patch import bars_delta
+from market_data_service import MarketDataService
+from push_updates import UpdateChannel, add_event_stream, push_url
+
+# Available timeframes
+TIMEFRAMES = {
+    '1 Min': mt5.TIMEFRAME_M1,
+    '5 Min': mt5.TIMEFRAME_M5,
+    '15 Min': mt5.TIMEFRAME_M15,
+    '1 Hour': mt5.TIMEFRAME_H1,
+    '4 Hours': mt5.TIMEFRAME_H4
+}
+
+SYMBOLS = ["BTCUSD", "ETHUSD", "EURUSD", "GBPUSD", "USDJPY", "XAUUSD"]  # One panel per symbol
+CANDLES = 100  # Bars shown on each panel
+COLUMNS = 3  # Panels per row
+PANEL_HEIGHT = 320  # Height of one panel in pixels
+GRID = "grid"  # Name of the event stream shared by all panels
+
+# Initialize MetaTrader 5 connection
+mt5.initialize()
+
+# One polling thread for every symbol; only M1 is polled, the other timeframes are aggregated from it
+market_data = MarketDataService(base_timeframe=mt5.TIMEFRAME_M1)
+
+# One push event per polling cycle and timeframe, however many symbols moved in it
+updates = UpdateChannel()
+
+
+def on_cycle(changed):
+    for timeframe in {timeframe for _, timeframe in changed}:
+        updates.publish(GRID, timeframe)
+
+
+market_data.add_cycle_listener(on_cycle)
+
+
+def keep_subscribed(name, timeframe):
+    # An open grid keeps all of its symbols subscribed while prices are quiet
+    for symbol in SYMBOLS:
+        market_data.subscribe(symbol, int(timeframe), CANDLES)
+
+
+def pushed_bars(name, timeframe, since):
+    """
+    Bars of every symbol that published since the stream's previous event, as
+    {symbol: bars}. ``since`` maps each symbol to the snapshot version and the
+    last bar time already sent, so symbols that did not move cost one lookup.
+    """
+    since = dict(since or {})
+    bars = {}
+    for symbol in SYMBOLS:
+        snapshot = market_data.snapshot(symbol, int(timeframe))
+        if snapshot is None:
+            continue
+        version, last_time = since.get(symbol, (0, None))
+        if snapshot.version <= version:
+            continue
+        rates = snapshot.rates[-CANDLES:]
+        if last_time is not None:
+            rates = rates[np.searchsorted(rates['time'], last_time):]
+        if len(rates):
+            bars[symbol] = bars_delta(rates_to_frame(rates))
+            since[symbol] = (snapshot.version, int(rates['time'][-1]))
+    return ({'bars': bars} if bars else None), since
+
+
+app = dash.Dash(__name__)
+
+
+def panel(symbol):
+    return dcc.Graph(
+        id={'type': 'grid-chart', 'symbol': symbol},
+        style={'height': f'{PANEL_HEIGHT}px'},
+        config={'displayModeBar': False}
+    )
+
+
+def placeholder(symbol):
+    # Empty panel shown until the symbol's first snapshot is published
+    return {'data': [], 'layout': {
+        'height': PANEL_HEIGHT,
+        'title': {'text': symbol},
+        'xaxis': {'visible': False},
+        'yaxis': {'visible': False},
+        'annotations': [{'text': f"Waiting for {symbol} data...", 'showarrow': False,
+                         'xref': 'paper', 'yref': 'paper', 'x': 0.5, 'y': 0.5}],
+    }}
+
+
+app.layout = html.Div([
+    dcc.Dropdown(
+        id='timeframe-dropdown',
+        options=[{'label': key, 'value': value} for key, value in TIMEFRAMES.items()],
+        value=mt5.TIMEFRAME_M1,  # Default timeframe
+        style={'width': '200px', 'margin-bottom': '10px'}
+    ),
+    html.Div([panel(symbol) for symbol in SYMBOLS], style={
+        'display': 'grid',
+        'gridTemplateColumns': f'repeat({COLUMNS}, 1fr)',
+        'gap': '4px',
+        'width': '100%'
+    }),
+    dcc.Store(id='push-url'),  # Event stream of the selected timeframe
+    dcc.Store(id='push-delta'),  # Bars of all changed symbols, one message per polling cycle
+    dcc.Store(id='grid-fallback')  # Symbols whose panel has no candles yet, built by the server
+], style={'width': '100vw', 'overflow-x': 'hidden'})
+
+# All panels are updated in the browser from the single event stream
+add_event_stream(app, updates, [(GRID, timeframe) for timeframe in TIMEFRAMES.values()], event_id='push-delta',
+                 on_wait=keep_subscribed, delta=pushed_bars)
+app.clientside_callback(
+    ClientsideFunction(namespace='chart', function_name='applyGridDelta'),
+    Output({'type': 'grid-chart', 'symbol': ALL}, 'figure', allow_duplicate=True),
+    Input('push-delta', 'data'),
+    State({'type': 'grid-chart', 'symbol': ALL}, 'id'),
+    State({'type': 'grid-chart', 'symbol': ALL}, 'figure'),
+    State('grid-fallback', 'id'),
+    prevent_initial_call=True
+)
+
+
+@app.callback(
+    Output('push-url', 'data'),
+    [Input('timeframe-dropdown', 'value')]
+)
+def update_push_url(selected_timeframe):
+    return push_url(GRID, selected_timeframe)
+
+
+@app.callback(
+    Output({'type': 'grid-chart', 'symbol': ALL}, 'figure'),
+    [Input('timeframe-dropdown', 'value'),
+     Input('grid-fallback', 'data')],
+    [State({'type': 'grid-chart', 'symbol': ALL}, 'id')]
+)
+def update_grid(selected_timeframe, fallback, ids):
+    # Whole figures on load and timeframe changes, otherwise only for the panels still without candles
+    symbols = [i['symbol'] for i in ids]
+    if dash.callback_context.triggered_id == 'grid-fallback':
+        wanted = set(fallback['symbols'])
+    else:
+        wanted = set(symbols)
+
+    for symbol in wanted:
+        market_data.subscribe(symbol, selected_timeframe, CANDLES)
+
+    # Never wait for the poller: symbols without bars yet get a placeholder, which the
+    # browser hands back through grid-fallback once their first bars are pushed
+    figures = []
+    for symbol in symbols:
+        if symbol not in wanted:
+            figures.append(dash.no_update)
+            continue
+        snapshot = market_data.snapshot(symbol, selected_timeframe)
+        if snapshot is None:
+            figures.append(placeholder(symbol))
+            continue
+        figures.append(build_figure(rates_to_frame(snapshot.rates[-CANDLES:]), symbol, height=PANEL_HEIGHT,
+                                    stream=push_url(GRID, selected_timeframe)))
+    return figures
+
+
+if __name__ == '__main__':
+    app.run_server(debug=True)
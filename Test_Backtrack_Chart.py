@@ -1,11 +1,17 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output, State
+from dash.dependencies import ClientsideFunction, Input, Output, State
 import plotly.graph_objs as go
-import plotly.subplots as sp
 import MetaTrader5 as mt5
 import pandas as pd
 from datetime import datetime, timedelta
+from candle_archive import CandleArchive, rates_to_frame
+from chart_encoding import COMPRESSION_AVAILABLE, use_fast_json
+from figure_builder import build_figure
+from lod import PyramidCache
+from market_data_service import MarketDataService
+from refresh_scheduler import RefreshScheduler
+from session_cache import SessionCache
 
 # Initialize MetaTrader 5 connection
 if not mt5.initialize():
@@ -24,6 +30,24 @@ TIMEFRAMES = {
     '1 Day': mt5.TIMEFRAME_D1
 }
 INITIAL_CANDLES = 50  # Number of candles to load initially
+TICK_INTERVAL = 1.0  # Seconds between refreshes of the forming bar (None: only at bar closes)
+archive = CandleArchive()  # Memory-mapped MT5 rates per symbol/timeframe
+pyramids = PyramidCache(archive)  # Level-of-detail views of the archive for zoomed-out charts
+sessions = SessionCache()  # Per-browser-session chart state; the browser only keeps the handle
+scheduler = RefreshScheduler(TICK_INTERVAL)  # Ticks while a bar forms, rollover at each bar close
+
+# One polling thread fetches the forming bars for every tab; callbacks only read its snapshots
+market_data = MarketDataService(poll_interval=TICK_INTERVAL or 1.0)
+
+
+def sync_server_clock(changed):
+    # Once per polling cycle with new bars, not once per tab and tick
+    tick = mt5.symbol_info_tick(SYMBOL)
+    if tick is not None:
+        scheduler.sync(tick.time)
+
+
+market_data.add_cycle_listener(sync_server_clock)
 
 
 # Function to fetch data
@@ -41,16 +65,17 @@ def fetch_data(symbol, timeframe, start_date=None, count=None):
             print(f"Failed to retrieve data for {symbol} at {timeframe} timeframe")
             return pd.DataFrame(columns=['time', 'open', 'high', 'low', 'close', 'tick_volume'])
 
-        df = pd.DataFrame(rates)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
+        df = rates_to_frame(rates)
         print(f"Data fetched successfully: {len(df)} rows")
-        return df[['time', 'open', 'high', 'low', 'close', 'tick_volume']]
+        return df
     except Exception as e:
         print(f"Error fetching data: {e}")
         return pd.DataFrame(columns=['time', 'open', 'high', 'low', 'close', 'tick_volume'])
 
 
-app = dash.Dash(__name__)
+# Figures go out as typed arrays, serialized with orjson and compressed when those packages are installed
+use_fast_json()
+app = dash.Dash(__name__, compress=COMPRESSION_AVAILABLE)
 
 app.layout = html.Div([
     dcc.Checklist(
@@ -66,13 +91,15 @@ app.layout = html.Div([
         style={'width': '200px', 'margin-bottom': '10px'}
     ),
     html.Button('Load Data', id='load-data-btn', n_clicks=0),
-    dcc.Store(id='stored-data'),  # Store component for persistent data
+    dcc.Store(id='stored-data'),  # Handle of this browser's entry in the server-side session cache
+    dcc.Store(id='viewport'),  # Visible x range in epoch seconds, None while autoranged
     dcc.Graph(
         id='live-candlestick-chart',
         style={'height': '90vh'},
         config={'displayModeBar': True, 'scrollZoom': True, 'modeBarButtonsToAdd': ['resetScale2d']}
     ),
-    dcc.Interval(id='interval-component', interval=1 * 1000, n_intervals=0)  # Update every second
+    dcc.Store(id='refresh-schedule'),  # Bar width and server clock offset for the browser's timer
+    dcc.Interval(id='interval-component', interval=1 * 1000, n_intervals=0)  # Rescheduled in the browser
 ], style={'width': '100vw', 'height': '100vh', 'overflow': 'hidden'})
 
 
@@ -80,9 +107,10 @@ app.layout = html.Div([
 @app.callback(
     Output('stored-data', 'data'),
     [Input('load-data-btn', 'n_clicks')],
-    [State('timeframe-dropdown', 'value')]
+    [State('timeframe-dropdown', 'value'),
+     State('stored-data', 'data')]
 )
-def load_historical_data(n_clicks, selected_timeframe):
+def load_historical_data(n_clicks, selected_timeframe, stored_data):
     print(f"Loading historical data with {n_clicks} clicks on timeframe {selected_timeframe}")
 
     # Adjust the number of candles fetched based on the selected timeframe
@@ -95,10 +123,45 @@ def load_historical_data(n_clicks, selected_timeframe):
     else:
         count = INITIAL_CANDLES  # Fallback
 
-    df = fetch_data(SYMBOL, selected_timeframe, count=count)
-    if df.empty:
+    # Once the archive holds enough history only newer bars are requested; until then the full
+    # window is fetched and its older bars are merged in front of what is archived
+    last_time = archive.last_time(SYMBOL, selected_timeframe)
+    if last_time is not None and archive.count(SYMBOL, selected_timeframe) >= count:
+        # Bar times are broker server time, so look a day ahead to cover any offset from local time
+        rates = mt5.copy_rates_range(SYMBOL, selected_timeframe, datetime.utcfromtimestamp(last_time),
+                                     datetime.now() + timedelta(days=1))
+    else:
+        rates = mt5.copy_rates_from_pos(SYMBOL, selected_timeframe, 0, count)
+    archive.upsert(SYMBOL, selected_timeframe, rates)
+
+    if not archive.count(SYMBOL, selected_timeframe):
         print("Warning: No data retrieved for the selected timeframe.")
-    return df.to_dict('records') if not df.empty else []
+        return None
+
+    # The bars stay on the server; the browser only gets a handle to its session
+    handle = stored_data['session'] if stored_data else sessions.new_handle()
+    sessions.put(handle, {'timeframe': selected_timeframe, 'refresh': None, 'key': None, 'rates': None, 'factor': 1})
+    return {'session': handle}
+
+
+# Callback to remember the visible x range whenever the user zooms or pans
+@app.callback(
+    Output('viewport', 'data'),
+    [Input('live-candlestick-chart', 'relayoutData')],
+    [State('viewport', 'data')]
+)
+def update_viewport(relayout_data, viewport):
+    if not relayout_data:
+        return dash.no_update
+    if relayout_data.get('xaxis.autorange'):
+        return None
+    if 'xaxis.range[0]' in relayout_data:
+        x_range = [relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]']]
+    elif 'xaxis.range' in relayout_data:
+        x_range = relayout_data['xaxis.range']
+    else:
+        return dash.no_update  # Not an x zoom or pan
+    return [int(pd.Timestamp(value).value // 10 ** 9) for value in x_range]
 
 
 # Callback to update chart with real-time data and manage user view
@@ -106,98 +169,87 @@ def load_historical_data(n_clicks, selected_timeframe):
     Output('live-candlestick-chart', 'figure'),
     [Input('interval-component', 'n_intervals'),
      Input('volume-checkbox', 'value'),
-     Input('stored-data', 'data')],
-    [State('timeframe-dropdown', 'value')]
+     Input('stored-data', 'data'),
+     Input('viewport', 'data')]
 )
-def update_chart(n_intervals, volume_option, stored_data, selected_timeframe):
-    print(f"Updating chart at interval {n_intervals} with timeframe {selected_timeframe}")
-
-    if not stored_data:
+def update_chart(n_intervals, volume_option, stored_data, viewport):
+    session = sessions.get(stored_data['session']) if stored_data else None
+    if session is None:
+        # Nothing loaded yet, or the session was evicted from the cache
         print("No data available in stored-data.")
         fig = go.Figure()
         fig.update_layout(title="No data available", xaxis=dict(showgrid=False), yaxis=dict(showgrid=False))
         return fig
 
-    # Convert stored data back to DataFrame
-    df = pd.DataFrame(stored_data)
-    df['time'] = pd.to_datetime(df['time'])  # Ensure 'time' column is in datetime format
-
-    # Fetch the latest candle and check for updates
-    latest_data = fetch_data(SYMBOL, selected_timeframe, count=1)
-    if not latest_data.empty and not df.empty:
-        latest_data['time'] = pd.to_datetime(latest_data['time'])  # Ensure 'time' is datetime
-        # Update the last candle if the timestamp matches; otherwise, append a new one
-        if latest_data['time'].iloc[0] > df['time'].iloc[-1]:
-            df = pd.concat([df, latest_data], ignore_index=True)
-        else:
-            df.iloc[-1] = latest_data.iloc[0]
+    selected_timeframe = session['timeframe']
 
-    df = df[-INITIAL_CANDLES:]
+    # Between a session's refreshes only newly polled bars or a bar close can change the chart
+    market_data.subscribe(SYMBOL, selected_timeframe, INITIAL_CANDLES)
+    snapshot = market_data.snapshot(SYMBOL, selected_timeframe)
+    refresh = scheduler.state(selected_timeframe, snapshot.version if snapshot is not None else None)
+    if refresh == session['refresh'] and dash.callback_context.triggered_id == 'interval-component':
+        return dash.no_update
+    session = dict(session, refresh=refresh)
+    sessions.put(stored_data['session'], session)
+    print(f"Updating chart at interval {n_intervals} with timeframe {selected_timeframe}")
+
+    # Archive the forming and newly closed bars so every level of detail includes them
+    if snapshot is not None:
+        archive.upsert(SYMBOL, selected_timeframe, snapshot.rates)
 
+    pyramid = pyramids.get(SYMBOL, selected_timeframe)
+    base = pyramid.levels[0]
+    times = base['time']
+    if viewport:
+        start, end = viewport
+    elif len(times):
+        # Default view: the latest candles at full resolution
+        start, end = int(times[max(len(times) - INITIAL_CANDLES, 0)]), int(times[-1])
+    else:
+        start = end = None
+
+    # Skip the tick entirely when neither the bars nor the view have moved since the last one
+    key = (start, end, len(base), base[-1].tobytes() if len(base) else None)
+    if key == session['key']:
+        if dash.callback_context.triggered_id == 'interval-component':
+            return dash.no_update
+        rates, factor = session['rates'], session['factor']
+    else:
+        # Merge adjacent bars when the visible range holds more candles than the chart has pixels
+        rates, factor = pyramid.window(start, end)
+        rates = rates.copy()
+        sessions.put(stored_data['session'], dict(session, key=key, rates=rates, factor=factor))
+    df = rates_to_frame(rates)
+    if df.empty:
+        return go.Figure()
+
+    title = "Live BTC/USD Chart" if factor == 1 else f"Live BTC/USD Chart ({factor} bars per candle)"
     show_volume = 'show_volume' in volume_option
-    volume_colors = ['green' if row['close'] > row['open'] else 'red' for index, row in df.iterrows()]
-
-    fig = sp.make_subplots(
-        rows=2 if show_volume else 1, cols=1,
-        shared_xaxes=True,
-        row_heights=[0.7, 0.3] if show_volume else [1],
-        vertical_spacing=0.02
-    )
-
-    fig.add_trace(go.Candlestick(
-        x=df['time'],
-        open=df['open'],
-        high=df['high'],
-        low=df['low'],
-        close=df['close'],
-        name="Candlesticks"
-    ), row=1, col=1)
-
-    if show_volume:
-        fig.add_trace(go.Bar(
-            x=df['time'],
-            y=df['tick_volume'],
-            name="Volume",
-            marker=dict(color=volume_colors)
-        ), row=2, col=1)
-
-    fig.update_layout(
-        title="Live BTC/USD Chart",
-        xaxis_rangeslider_visible=False,
-        xaxis=dict(range=[df['time'].iloc[0], df['time'].iloc[-1]]),
-        yaxis=dict(showgrid=True, gridcolor='DarkGray'),
-        plot_bgcolor='rgb(20, 24, 31)',
-        paper_bgcolor='rgb(20, 24, 31)',
-        font=dict(color="white")
-    )
-
-    last_price = df['close'].iloc[-1]
-    price_color = "green" if df['close'].iloc[-1] > df['close'].iloc[-2] else "red"
-    fig.add_shape(
-        type="line",
-        x0=0, x1=1, y0=last_price, y1=last_price,
-        xref="paper", yref="y",
-        line=dict(color=price_color, width=2, dash="dash")
-    )
-
-    return fig
-
-
-# Callback to update the interval based on the selected timeframe
+    return build_figure(df, title, show_volume, price_label_x=None,
+                        x_range=pd.to_datetime([start, end], unit='s'), time_format=None, compact=True)
+
+
+# The server only sends the schedule when data is loaded (which also picks up the server clock
+# offset); the browser then reschedules its timer on every tick by itself
 @app.callback(
+    Output('refresh-schedule', 'data'),
+    [Input('stored-data', 'data')]
+)
+def update_schedule(stored_data):
+    # Follow the loaded timeframe the chart refreshes, not the dropdown before Load is clicked
+    session = sessions.get(stored_data['session']) if stored_data else None
+    if session is None:
+        return dash.no_update
+    return scheduler.schedule(session['timeframe'])
+
+
+# Next refresh at the tick rate while a bar forms and exactly at the close of the forming bar
+app.clientside_callback(
+    ClientsideFunction(namespace='schedule', function_name='nextInterval'),
     Output('interval-component', 'interval'),
-    [Input('timeframe-dropdown', 'value')]
+    [Input('interval-component', 'n_intervals'),
+     Input('refresh-schedule', 'data')]
 )
-def update_interval(selected_timeframe):
-    print(f"Selected timeframe for interval update: {selected_timeframe}")
-    if selected_timeframe == mt5.TIMEFRAME_M1:
-        return 60 * 1000  # 1 minute in milliseconds
-    elif selected_timeframe == mt5.TIMEFRAME_H1:
-        return 60 * 60 * 1000  # 1 hour in milliseconds
-    elif selected_timeframe == mt5.TIMEFRAME_D1:
-        return 24 * 60 * 60 * 1000  # 1 day in milliseconds
-    else:
-        return 1 * 1000  # Default to 1 second for testing
 
 
 if __name__ == '__main__':
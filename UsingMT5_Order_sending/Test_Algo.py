@@ -1,6 +1,11 @@
+import os
+import sys
 import MetaTrader5 as mt5
 import time
-import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from market_data_service import MarketDataService  # noqa: E402
+from rolling_stats import RollingStatsService  # noqa: E402
 
 # Initialize MetaTrader 5
 mt5.initialize()
@@ -14,6 +19,11 @@ mt5.login(login, password, server)
 symbol = 'BTCUSD'
 lot_size = 0.01
 
+# Close statistics kept up to date by a background poller, so orders read them without a terminal round trip
+market_data = MarketDataService(idle_timeout=float('inf'))
+close_stats = RollingStatsService(market_data, windows=[3])
+close_stats.track(symbol, mt5.TIMEFRAME_M1)
+
 # Function to fetch minimum stop level
 def get_min_stop_level(symbol):
     symbol_info = mt5.symbol_info(symbol)
@@ -21,14 +31,13 @@ def get_min_stop_level(symbol):
         return symbol_info.trade_stops_level * symbol_info.trade_tick_size
     return 0.0
 
-# Function to calculate variance from last 15 candles
+# Function to read the variance of the last candles' closes
 def calculate_variance(symbol, bars=3):
-    rates = mt5.copy_rates_from_pos(symbol, mt5.TIMEFRAME_M1, 0, bars)
-    if rates is None or len(rates) < bars:
+    variance = close_stats.variance(symbol, mt5.TIMEFRAME_M1, bars)
+    if variance is None:
         print("Not enough price data to calculate variance.")
         return 0.1
-    close_prices = [rate['close'] for rate in rates]
-    return np.var(close_prices)
+    return variance
 
 # Function to track max profit and loss
 def track_trade(ticket):
@@ -103,4 +112,5 @@ for trade_number in range(1, 101):
     print(f"Max Profit: {max_profit:.2f} | Max Loss: {max_loss:.2f}")
 
 # Shutdown MT5 connection
+market_data.stop()
 mt5.shutdown()
@@ -2,9 +2,14 @@ import MetaTrader5 as mt5
 from datetime import datetime, timedelta
 import pandas as pd
 import csv
-import numpy as np
+import os
+import sys
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from market_data_service import MarketDataService  # noqa: E402
+from rolling_stats import RollingStatsService  # noqa: E402
+
 # Initialize MT5
 if not mt5.initialize():
     print("initialize() failed, error code =", mt5.last_error())
@@ -23,6 +28,11 @@ symbol = 'BTCUSD'
 lot_size = 0.01
 csv_file = "trade_records.csv"
 
+# Close statistics kept up to date by a background poller, so orders read them without a terminal round trip
+market_data = MarketDataService(idle_timeout=float('inf'))
+close_stats = RollingStatsService(market_data, windows=[4])
+close_stats.track(symbol, mt5.TIMEFRAME_M1)
+
 
 # Prepare the CSV file
 def prepare_csv():
@@ -52,20 +62,14 @@ def record_trade(trade):
 
 # Function to calculate normalized variance
 def calculate_variance(symbol, period=mt5.TIMEFRAME_M1, bars=4, max_percentage=0.005):
-    rates = mt5.copy_rates_from_pos(symbol, period, 0, bars)
-    if rates is None or len(rates) < bars:
+    stats = close_stats.normalized_variance(symbol, period, bars, max_percentage)
+    if stats is None:
         print(f"Error: Not enough data to calculate variance for {symbol}.")
         return 0.0
 
-    close_prices = [rate['close'] for rate in rates]
-    mean_price = np.mean(close_prices)
-    variance = np.var(close_prices)
-
-    # Normalize variance
-    max_variance = mean_price * max_percentage
-    normalized_variance = min(variance, max_variance)
+    # Variance capped at max_percentage of the mean price
+    mean_price, variance, normalized_variance = stats
 
-    print(f"Close Prices: {close_prices}")
     print(f"Mean Price: {mean_price}")
     print(f"Calculated Variance: {variance} (Normalized: {normalized_variance})")
     return normalized_variance
@@ -199,4 +203,5 @@ for trade_number in range(1, 101):
     time.sleep(55)  # Wait for the next trade
 
 # Shutdown MT5
+market_data.stop()
 mt5.shutdown()
\ No newline at end of file
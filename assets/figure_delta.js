@@ -0,0 +1,137 @@
+// Client-side rendering: merge bars pushed by the server (figure_patch.bars_delta)
+// into a figure made by figure_builder.build_figure, without a Python callback.
+// Bars are matched by open time: the last bar is overwritten, newer ones are
+// appended and the oldest dropped so the window keeps its length. Until the
+// chart has candles, events are handed to the ``fallbackId`` store so the
+// server builds the figure instead. Indicator values in ``bars.lines`` are
+// merged the same way into the traces named after them. Events of a stream
+// other than the one in the figure's layout.meta (a symbol or timeframe the
+// chart has switched away from) are ignored.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    chart: {
+        applyDelta: function (event, figure, fallbackId) {
+            const noUpdate = window.dash_clientside.no_update;
+            const bars = event && event.bars;
+            if (!bars) {
+                return noUpdate;
+            }
+            const shown = figure && figure.layout && figure.layout.meta && figure.layout.meta.stream;
+            if (shown && event.stream && shown !== event.stream) {
+                return noUpdate;  // Still in flight from the previous stream
+            }
+            if (!figure || !figure.data || !figure.data.length || !figure.data[0].x.length) {
+                if (fallbackId) {
+                    window.dash_clientside.set_props(fallbackId, {data: event});
+                }
+                return noUpdate;
+            }
+
+            const candle = Object.assign({}, figure.data[0]);
+            const volume = figure.data.length > 1 && figure.data[1].name === 'Volume' ? Object.assign({}, figure.data[1]) : null;
+            const fields = ['x', 'open', 'high', 'low', 'close'];
+            fields.forEach(function (name) { candle[name] = candle[name].slice(); });
+            if (volume) {
+                volume.x = volume.x.slice();
+                volume.y = volume.y.slice();
+                volume.marker = Object.assign({}, volume.marker, {color: volume.marker.color.slice()});
+            }
+
+            const lines = [];
+            figure.data.forEach(function (trace, t) {
+                if (bars.lines && trace.name in bars.lines) {
+                    lines.push([t, Object.assign({}, trace, {x: trace.x.slice(), y: trace.y.slice()}), bars.lines[trace.name]]);
+                }
+            });
+
+            const window_ = candle.x.length;
+            let changed = false;
+            for (let i = 0; i < bars.x.length; i++) {
+                const last = candle.x.length - 1;
+                let index;
+                if (bars.x[i] === candle.x[last]) {
+                    index = last;
+                } else if (bars.x[i] > candle.x[last]) {
+                    index = last + 1;
+                } else {
+                    continue;  // Older than what the chart shows
+                }
+                fields.forEach(function (name) { candle[name][index] = bars[name][i]; });
+                if (volume) {
+                    volume.x[index] = bars.x[i];
+                    volume.y[index] = bars.volume[i];
+                    volume.marker.color[index] = bars.color[i];
+                }
+                lines.forEach(function (line) {
+                    line[1].x[index] = bars.x[i];
+                    line[1].y[index] = line[2][i];
+                });
+                changed = true;
+            }
+            if (!changed) {
+                return noUpdate;
+            }
+
+            const extra = candle.x.length - window_;
+            if (extra > 0) {
+                fields.forEach(function (name) { candle[name].splice(0, extra); });
+                if (volume) {
+                    volume.x.splice(0, extra);
+                    volume.y.splice(0, extra);
+                    volume.marker.color.splice(0, extra);
+                }
+                lines.forEach(function (line) {
+                    line[1].x.splice(0, extra);
+                    line[1].y.splice(0, extra);
+                });
+            }
+
+            const layout = Object.assign({}, figure.layout);
+            const n = candle.close.length;
+            const lastPrice = candle.close[n - 1];
+            const color = n < 2 || lastPrice > candle.close[n - 2] ? 'green' : 'red';
+            if (layout.shapes && layout.shapes.length) {
+                layout.shapes = [Object.assign({}, layout.shapes[0], {
+                    y0: lastPrice, y1: lastPrice, line: Object.assign({}, layout.shapes[0].line, {color: color})
+                })].concat(layout.shapes.slice(1));
+            }
+            if (layout.annotations && layout.annotations.length) {
+                layout.annotations = [Object.assign({}, layout.annotations[0], {
+                    y: lastPrice, text: lastPrice.toFixed(2), bgcolor: color
+                })].concat(layout.annotations.slice(1));
+            }
+
+            const data = figure.data.slice();
+            data[0] = candle;
+            if (volume) {
+                data[1] = volume;
+            }
+            lines.forEach(function (line) { data[line[0]] = line[1]; });
+            return Object.assign({}, figure, {data: data, layout: layout});
+        },
+
+        // One event for a grid of charts: ``event.bars`` maps each symbol that
+        // changed to its bars, ``ids`` are the graphs' {symbol} ids in the same
+        // order as ``figures``. Charts of symbols that did not move are left
+        // alone; the symbols whose chart has no candles yet are written to the
+        // ``fallbackId`` store for the server to build.
+        applyGridDelta: function (event, ids, figures, fallbackId) {
+            const bars = (event && event.bars) || {};
+            const missing = [];
+            const result = figures.map(function (figure, i) {
+                const symbol = ids[i].symbol;
+                if (!bars[symbol]) {
+                    return window.dash_clientside.no_update;
+                }
+                if (!figure || !figure.data || !figure.data.length || !figure.data[0].x.length) {
+                    missing.push(symbol);
+                    return window.dash_clientside.no_update;
+                }
+                return window.dash_clientside.chart.applyDelta({bars: bars[symbol], stream: event.stream}, figure, null);
+            });
+            if (missing.length && fallbackId) {
+                window.dash_clientside.set_props(fallbackId, {data: {symbols: missing, version: event.version}});
+            }
+            return result;
+        }
+    }
+});
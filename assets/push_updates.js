@@ -0,0 +1,27 @@
+// Server-sent event streams opened by push_updates.add_event_stream.
+// One EventSource per target store; it is replaced when the URL changes and
+// reconnects on its own if the server goes away.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    push: {
+        connect: function (url, eventId) {
+            const sources = window._pushSources = window._pushSources || {};
+            const current = sources[eventId];
+            if (current && current.pushUrl === url) {
+                return window.dash_clientside.no_update;
+            }
+            if (current) {
+                current.close();
+                delete sources[eventId];
+            }
+            if (url) {
+                const source = new EventSource(url);
+                source.pushUrl = url;
+                source.onmessage = function (event) {
+                    window.dash_clientside.set_props(eventId, {data: JSON.parse(event.data)});
+                };
+                sources[eventId] = source;
+            }
+            return window.dash_clientside.no_update;
+        }
+    }
+});
@@ -0,0 +1,25 @@
+// Client-side refresh scheduling from RefreshScheduler.schedule: the next
+// interval is the tick rate while a bar forms, or the time to the close of
+// the forming bar if that comes first, on the broker server clock.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    schedule: {
+        nextInterval: function (nIntervals, schedule) {
+            if (!schedule) {
+                return window.dash_clientside.no_update;
+            }
+            const t = Date.now() / 1000 + schedule.offset;
+            let close;
+            if (schedule.month) {
+                const day = new Date(t * 1000);
+                close = Date.UTC(day.getUTCFullYear(), day.getUTCMonth() + 1, 1) / 1000;
+            } else {
+                close = t - ((t - schedule.origin) % schedule.width) + schedule.width;
+            }
+            let delay = close - t + schedule.rollover;
+            if (schedule.tick !== null) {
+                delay = Math.min(delay, schedule.tick);
+            }
+            return Math.max(Math.round(delay * 1000), 50);
+        }
+    }
+});
@@ -0,0 +1,228 @@
+"""
+Offline replay of the variance-sized SL/TP strategies in UsingMT5_Order_sending
+over stored candles.
+
+    python backtester.py [candles.csv] [bars]
+"""
+import sys
+import time
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+DIRECTIONS = ('sell_first', 'buy_first', 'buy', 'sell')  # Alternating like the order scripts (sell first), or one side only
+HORIZON = 64  # Bars scanned per pass for the first SL/TP touch; doubled for trades still open
+MAX_CELLS = 1 << 22  # Trades x bars compared per block, bounds the temporary arrays (~32 MB)
+
+
+def load_candles(csv_file):
+    """
+    Read a candle CSV (data.csv, price_data.csv or a CandleStore file), keeping
+    the newest copy of every bar and sorting by time, as CandleStore does.
+    """
+    df = pd.read_csv(csv_file)
+    df['time'] = pd.to_datetime(df['time'])
+    return df.drop_duplicates('time', keep='last').sort_values('time', ignore_index=True)
+
+
+def sl_tp_distance(close, bars=3, min_distance=0.0, max_percentage=None):
+    """
+    SL/TP distance for a trade opened at the start of each bar: the variance
+    of the ``bars`` closes before it (as Test_Algo/Test_Random_Algo compute it
+    from the latest bars), capped at ``max_percentage`` of their mean when
+    given and never below ``min_distance``. NaN until ``bars`` bars exist.
+    """
+    rolling = pd.Series(np.asarray(close, dtype=np.float64)).rolling(bars)
+    variance = rolling.var(ddof=0).shift(1).to_numpy()
+    if max_percentage is not None:
+        variance = np.minimum(variance, rolling.mean().shift(1).to_numpy() * max_percentage)
+    return np.where(np.isnan(variance), np.nan, np.maximum(variance, min_distance))
+
+
+def first_touch(high, low, start, upper, lower, horizon=HORIZON):
+    """
+    For every trade k, the first bar j >= start[k] whose high reaches
+    upper[k] or whose low reaches lower[k], scanning sliding windows of
+    ``horizon`` bars at a time (doubled for the trades still open) instead of
+    walking bars in Python. Returns (exit bar or -1 if never touched,
+    upper touched, lower touched); both can be set on the same bar.
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    start = np.asarray(start, dtype=np.int64)
+    n, m = len(high), len(start)
+    exit_bar = np.full(m, -1, dtype=np.int64)
+    hit_upper = np.zeros(m, dtype=bool)
+    hit_lower = np.zeros(m, dtype=bool)
+
+    pending = np.flatnonzero(start < n)
+    offset = 0
+    while len(pending):
+        # Pad past the last bar with values that never touch
+        windows_high = sliding_window_view(np.r_[high, np.full(horizon, -np.inf)], horizon)
+        windows_low = sliding_window_view(np.r_[low, np.full(horizon, np.inf)], horizon)
+        still_open = []
+        block = max(MAX_CELLS // horizon, 1)
+        for lo in range(0, len(pending), block):
+            trades = pending[lo:lo + block]
+            first = np.minimum(start[trades] + offset, n)
+            up = windows_high[first] >= upper[trades, None]
+            down = windows_low[first] <= lower[trades, None]
+            touched = up | down
+            found = touched.any(axis=1)
+            at = touched.argmax(axis=1)
+            rows = np.flatnonzero(found)
+            done = trades[rows]
+            exit_bar[done] = first[rows] + at[rows]
+            hit_upper[done] = up[rows, at[rows]]
+            hit_lower[done] = down[rows, at[rows]]
+            still_open.append(trades[~found & (first + horizon < n)])
+        pending = np.concatenate(still_open)
+        offset += horizon
+        horizon *= 2
+    return exit_bar, hit_upper, hit_lower
+
+
+def _levels(entry, distance, buy, spread):
+    """
+    SL and TP prices and the bid high/low thresholds that trigger them:
+    bars are bid prices, so a sell (closed at the ask) triggers when
+    bid + spread reaches its level.
+    """
+    sl = np.where(buy, entry - distance, entry + distance)
+    tp = np.where(buy, entry + distance, entry - distance)
+    upper = np.where(buy, tp, sl - spread)
+    lower = np.where(buy, sl, tp - spread)
+    return sl, tp, upper, lower
+
+
+def _sides(number, direction):
+    # Whether trade ``number`` (0 for the first) is a buy under the direction rule
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown direction {direction!r}; expected one of {DIRECTIONS}")
+    if direction in ('buy', 'sell'):
+        return np.full(np.shape(number), direction == 'buy')
+    return (np.asarray(number) % 2 == 0) == (direction == 'buy_first')
+
+
+def _sequential_entries(exit_buy, exit_sell, first_bar, direction, max_trades):
+    # One trade at a time: the next opens on the bar after the previous one closed
+    entries, sides = [], []
+    bar = first_bar
+    while bar < len(exit_buy) and (max_trades is None or len(entries) < max_trades):
+        buy = bool(_sides(len(entries), direction))
+        entries.append(bar)
+        sides.append(buy)
+        exit_bar = exit_buy[bar] if buy else exit_sell[bar]
+        if exit_bar < 0:
+            break  # Still open at the end of the data
+        bar = exit_bar + 1
+    return np.array(entries, dtype=np.int64), np.array(sides, dtype=bool)
+
+
+def backtest(df, bars=3, sequential=True, every=1, spread=0.0, min_distance=0.0, max_percentage=None,
+             lot_size=0.01, contract_size=1.0, direction='sell_first', max_trades=None):
+    """
+    Replay trades with symmetric SL/TP at ``sl_tp_distance`` from the entry,
+    opened at bar opens; ``direction`` is one of DIRECTIONS.
+
+    With ``sequential`` (Test_Algo) a trade opens once the previous one has
+    closed; otherwise (Test_Random_Algo) one opens every ``every`` bars and
+    trades may overlap. Buys fill at the ask (open + spread) and close at
+    the bid, sells the other way round; ``spread`` is a price or an array per
+    bar, taken at the entry bar. An SL or TP is hit when the bar's high/low
+    reaches it; a bar that opens beyond the level fills at its open, and a
+    bar that reaches both counts as the SL. Trades still open at the end
+    close at the last close.
+
+    ``df`` is a candle DataFrame or any mapping of its columns to arrays
+    (e.g. memory-mapped). Returns a DataFrame with one row per trade.
+    """
+    open_ = np.asarray(df['open'], dtype=np.float64)
+    high = np.asarray(df['high'], dtype=np.float64)
+    low = np.asarray(df['low'], dtype=np.float64)
+    close = np.asarray(df['close'], dtype=np.float64)
+    spread = np.broadcast_to(np.asarray(spread, dtype=np.float64), open_.shape)
+    n = len(open_)
+    distance = sl_tp_distance(close, bars, min_distance, max_percentage)
+    valid = np.flatnonzero(~np.isnan(distance))
+    if len(valid) == 0:
+        return pd.DataFrame()
+
+    if sequential:
+        # Where a buy and a sell opened at every bar would close, then chain them
+        candidates = np.arange(n)
+        exits = {}
+        for buy in (True, False):
+            entry = open_ + spread if buy else open_
+            _, _, upper, lower = _levels(entry, distance, buy, spread)
+            exits[buy] = first_touch(high, low, candidates, upper, lower)[0]
+        entries, buy = _sequential_entries(exits[True], exits[False], int(valid[0]), direction, max_trades)
+    else:
+        entries = np.arange(valid[0], n, every)[:max_trades]
+        buy = _sides(np.arange(len(entries)), direction)
+
+    entry_spread = spread[entries]
+    entry_price = np.where(buy, open_[entries] + entry_spread, open_[entries])
+    sl, tp, upper, lower = _levels(entry_price, distance[entries], buy, entry_spread)
+    exit_bar, hit_upper, hit_lower = first_touch(high, low, entries, upper, lower)
+
+    closed = exit_bar >= 0
+    at = np.where(closed, exit_bar, n - 1)
+    stopped = closed & np.where(buy, hit_lower, hit_upper)  # Both touched on one bar: the SL
+    exit_open = np.where(buy, open_[at], open_[at] + entry_spread)  # Bid for buys, ask for sells
+    sl_fill = np.where(buy, np.minimum(sl, exit_open), np.maximum(sl, exit_open))
+    tp_fill = np.where(buy, np.maximum(tp, exit_open), np.minimum(tp, exit_open))
+    end_fill = np.where(buy, close[-1], close[-1] + entry_spread)
+    exit_price = np.where(stopped, sl_fill, np.where(closed, tp_fill, end_fill))
+    profit = np.where(buy, exit_price - entry_price, entry_price - exit_price) * lot_size * contract_size
+
+    times = np.asarray(df['time'])
+    return pd.DataFrame({
+        'entry_time': times[entries],
+        'exit_time': times[at],
+        'type': np.where(buy, 'buy', 'sell'),
+        'entry_price': entry_price,
+        'sl': sl,
+        'tp': tp,
+        'exit_price': exit_price,
+        'reason': np.where(stopped, 'sl', np.where(closed, 'tp', 'end')),
+        'bars_held': at - entries + 1,
+        'profit': profit,
+    })
+
+
+def summarize(trades):
+    """
+    Headline figures of a backtest: trade count, win rate, total profit,
+    profit factor and the largest peak-to-trough drop of the equity curve.
+    """
+    if trades.empty:
+        return {'trades': 0, 'win_rate': np.nan, 'total_profit': 0.0, 'profit_factor': np.nan, 'max_drawdown': 0.0}
+    profit = trades['profit'].to_numpy()
+    equity = np.cumsum(profit)
+    gains, losses = profit[profit > 0].sum(), -profit[profit < 0].sum()
+    return {
+        'trades': len(profit),
+        'win_rate': float((profit > 0).mean()),
+        'total_profit': float(equity[-1]),
+        'profit_factor': float(gains / losses) if losses > 0 else np.inf,
+        'max_drawdown': float((np.maximum.accumulate(np.r_[0.0, equity]) - np.r_[0.0, equity]).max()),
+    }
+
+
+if __name__ == '__main__':
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "price_data.csv"
+    candles = load_candles(csv_file)
+    print(f"{len(candles)} bars from {csv_file}")
+    strategies = {
+        'Test_Algo (sequential, variance of 3 closes)': dict(bars=3, sequential=True),
+        'Test_Random_Algo (every bar, capped variance of 4 closes)': dict(bars=4, sequential=False, every=1,
+                                                                           max_percentage=0.005),
+    }
+    for name, params in strategies.items():
+        if len(sys.argv) > 2:
+            params['bars'] = int(sys.argv[2])
+        started = time.perf_counter()
+        summary = summarize(backtest(candles, **params))
+        print(f"{name}: {summary} in {time.perf_counter() - started:.2f} s")
@@ -0,0 +1,65 @@
+"""
+Replay time of a year of synthetic M1 candles through backtester.backtest for
+both order scripts' strategies, against walking the bars of every trade in
+Python on a slice of it.
+
+    python benchmarks/bench_backtester.py [bars] [loop_bars]
+"""
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from backtester import backtest, sl_tp_distance, summarize  # noqa: E402
+from bench_figure_builder import sample_frame  # noqa: E402
+
+SPREAD = 8.0  # Price units, roughly a BTCUSD spread
+
+
+def loop_backtest(df, bars=4, max_percentage=0.005, spread=SPREAD):
+    # A trade every bar, each one checked bar by bar until its SL or TP is touched
+    open_, high, low, close = (df[name].to_numpy() for name in ('open', 'high', 'low', 'close'))
+    distance = sl_tp_distance(close, bars, max_percentage=max_percentage)
+    profits = []
+    for number, entry_bar in enumerate(range(bars, len(df))):
+        buy = number % 2 == 1
+        entry = open_[entry_bar] + spread if buy else open_[entry_bar]
+        sl = entry - distance[entry_bar] if buy else entry + distance[entry_bar]
+        tp = entry + distance[entry_bar] if buy else entry - distance[entry_bar]
+        exit_price = close[-1] if buy else close[-1] + spread
+        for j in range(entry_bar, len(df)):
+            if buy and (low[j] <= sl or high[j] >= tp):
+                exit_price = min(sl, open_[j]) if low[j] <= sl else max(tp, open_[j])
+                break
+            if not buy and (high[j] + spread >= sl or low[j] + spread <= tp):
+                ask = open_[j] + spread
+                exit_price = max(sl, ask) if high[j] + spread >= sl else min(tp, ask)
+                break
+        profits.append((exit_price - entry if buy else entry - exit_price) * 0.01)
+    return profits
+
+
+def main(bars=525600, loop_bars=20000):
+    df = sample_frame(bars)
+    print(f"{bars} M1 bars")
+    for name, params in (('sequential (Test_Algo)', dict(bars=3, sequential=True)),
+                         ('every bar (Test_Random_Algo)', dict(bars=4, sequential=False, max_percentage=0.005))):
+        started = time.perf_counter()
+        trades = backtest(df, spread=SPREAD, **params)
+        elapsed = time.perf_counter() - started
+        print(f"  {name:30} {len(trades):8d} trades {elapsed:8.2f} s  profit {summarize(trades)['total_profit']:.2f}")
+
+    sample = df.iloc[:loop_bars].reset_index(drop=True)
+    started = time.perf_counter()
+    profits = loop_backtest(sample)
+    looped = time.perf_counter() - started
+    started = time.perf_counter()
+    trades = backtest(sample, bars=4, sequential=False, max_percentage=0.005, spread=SPREAD)
+    vectorized = time.perf_counter() - started
+    print(f"{loop_bars} bars, a trade every bar: Python loop {looped:.2f} s, vectorized {vectorized:.3f} s, "
+          f"same profits: {np.allclose(profits, trades['profit'])}")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
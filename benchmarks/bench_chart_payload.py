@@ -0,0 +1,46 @@
+"""
+Bytes and CPU time per chart update for the figure encodings: the legacy
+graph_objs figure serialized with plotly's default engine, then JSON lists of
+floats and ISO timestamps against base64 typed arrays, each serialized with
+the standard json encoder and with orjson, plus the size after gzip as sent
+with response compression.
+
+    python benchmarks/bench_chart_payload.py [bars] [repeats]
+"""
+import gzip
+import os
+import sys
+import timeit
+import plotly.io as pio
+from plotly.io.json import to_json_plotly
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bench_figure_builder import legacy_figure, sample_frame  # noqa: E402
+from chart_encoding import orjson  # noqa: E402
+from figure_builder import build_figure  # noqa: E402
+
+
+def report(name, update, repeats):
+    payload = update().encode()
+    best = min(timeit.repeat(update, number=repeats, repeat=5)) / repeats
+    print(f"  {name:24} {len(payload):9d} {len(gzip.compress(payload)):9d} {best * 1000:10.3f}")
+
+
+def main(bars=500, repeats=50):
+    df = sample_frame(bars)
+    engines = ['json'] + (['orjson'] if orjson is not None else [])
+    print(f"{bars} bars with volume, best of 5 x {repeats} updates")
+    print(f"  {'encoding':24} {'bytes':>9} {'gzip':>9} {'ms/update':>10}")
+    # The previous per-tick path: make_subplots figure, to_json with whatever engine plotly picks
+    report(f"legacy + {pio.json.config.default_engine}", lambda: legacy_figure(df, True).to_json(), repeats)
+    for compact in (False, True):
+        for engine in engines:
+            pio.json.config.default_engine = engine
+            report(f"{'typed arrays' if compact else 'lists'} + {engine}",
+                   lambda: to_json_plotly(build_figure(df, "Live BTC/USD Chart", True, compact=compact)), repeats)
+    if orjson is None:
+        print("  (install orjson to compare the faster encoder)")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
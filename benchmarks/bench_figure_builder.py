@@ -0,0 +1,87 @@
+"""
+Per-call build time of the live chart figure: the previous per-tick
+plotly.graph_objs code path against figure_builder.build_figure.
+
+    python benchmarks/bench_figure_builder.py [bars] [repeats]
+"""
+import os
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+import plotly.subplots as sp
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from figure_builder import build_figure  # noqa: E402
+
+
+def sample_frame(bars):
+    rng = np.random.default_rng(0)
+    close = 60000 + rng.standard_normal(bars).cumsum() * 20
+    open_ = np.r_[close[0], close[:-1]]
+    return pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=bars, freq='min'),
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.random(bars) * 10,
+        'low': np.minimum(open_, close) - rng.random(bars) * 10,
+        'close': close,
+        'tick_volume': rng.integers(1, 500, bars),
+    })
+
+
+def legacy_figure(df, show_volume):
+    # The chart code each script used to run on every tick
+    volume_colors = ['green' if row['close'] > row['open'] else 'red' for index, row in df.iterrows()]
+    if show_volume:
+        fig = sp.make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.02)
+    else:
+        fig = sp.make_subplots(rows=1, cols=1)
+    fig.add_trace(go.Candlestick(x=df['time'], open=df['open'], high=df['high'], low=df['low'],
+                                 close=df['close'], name="Candlesticks", hoverinfo="x+y"), row=1, col=1)
+    if show_volume:
+        fig.add_trace(go.Bar(x=df['time'], y=df['tick_volume'], name="Volume",
+                             marker=dict(color=volume_colors), hoverinfo="x+y"), row=2, col=1)
+    last_price = df['close'].iloc[-1]
+    price_color = "green" if df['close'].iloc[-1] > df['close'].iloc[-2] else "red"
+    fig.update_layout(
+        title="Live Chart for BTCUSD",
+        xaxis=dict(showgrid=True, gridcolor='DarkGray', showticklabels=True),
+        yaxis=dict(showgrid=True, gridcolor='DarkGray', side="right", showticklabels=True),
+        height=800 if show_volume else 600,
+        margin=dict(l=0, r=80, t=50, b=0),
+        xaxis_rangeslider_visible=False,
+        showlegend=False,
+        plot_bgcolor='rgb(20, 24, 31)',
+        paper_bgcolor='rgb(20, 24, 31)',
+        font=dict(color="white"),
+        hovermode='x unified',
+    )
+    fig.add_shape(type="line", x0=0, x1=1, y0=last_price, y1=last_price, xref="paper", yref="y",
+                  line=dict(color=price_color, width=2, dash="dash"))
+    fig.update_yaxes(tickformat=".2f", showgrid=True, gridcolor='DarkGray', side="right")
+    fig.add_annotation(xref="paper", yref="y", x=1.047, y=last_price, text=f"{last_price:.2f}",
+                       showarrow=False, font=dict(color="white", size=12, family="Arial"),
+                       bgcolor=price_color, bordercolor="white", align="center", borderpad=4)
+    fig.update_xaxes(showline=True, linecolor='DarkGray', linewidth=1)
+    fig.update_yaxes(showline=True, linecolor='DarkGray', linewidth=1)
+    fig.update_xaxes(tickformat="%H:%M", matches='x')
+    return fig
+
+
+def main(bars=100, repeats=50):
+    df = sample_frame(bars)
+    print(f"{bars} bars, best of 5 x {repeats} calls")
+    for show_volume in (False, True):
+        cases = {
+            'legacy graph_objs': lambda: legacy_figure(df, show_volume),
+            'figure_builder': lambda: build_figure(df, "Live Chart for BTCUSD", show_volume,
+                                                   height=800 if show_volume else 600),
+        }
+        for name, build in cases.items():
+            best = min(timeit.repeat(build, number=repeats, repeat=5)) / repeats
+            print(f"  volume={show_volume!s:5} {name:18} {best * 1000:8.3f} ms/call")
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
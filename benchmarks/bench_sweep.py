@@ -0,0 +1,35 @@
+"""
+Sweep throughput (backtests per second) on synthetic M1 candles for 1, 2,
+4, ... worker processes up to the core count, against the single-worker rate.
+
+    python benchmarks/bench_sweep.py [bars] [param_sets]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from bench_figure_builder import sample_frame  # noqa: E402
+from sweep import random_search, run, share_history  # noqa: E402
+
+
+def main(bars=100000, param_sets=64):
+    path = share_history(sample_frame(bars))
+    draws = random_search(param_sets)
+    cores = os.cpu_count() or 1
+    counts = sorted({min(2 ** i, cores) for i in range(cores.bit_length() + 1)})
+    print(f"{bars} bars, {param_sets} parameter sets, {cores} cores")
+    try:
+        base = None
+        for workers in counts:
+            started = time.perf_counter()
+            run(path, draws, workers=workers, spread=8.0)
+            rate = param_sets / (time.perf_counter() - started)
+            base = base or rate
+            print(f"  {workers:3d} workers {rate:8.1f} backtests/s  x{rate / base:.2f}")
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,184 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from candle_store import CandleStore
+from timeframes import timeframe_seconds
+
+BINANCE_API_URL = "https://api.binance.com"
+KLINES_PATH = "/api/v3/klines"
+PAGE_LIMIT = 1000  # Maximum klines per request
+REQUEST_WEIGHT = 2  # Weight of one klines request
+WEIGHT_PER_MINUTE = 1200  # Our share of the 6000/min IP budget
+
+
+class RateLimiter:
+    """
+    Sliding one-minute request-weight budget shared by the worker threads.
+    """
+
+    def __init__(self, weight_per_minute=WEIGHT_PER_MINUTE):
+        self.weight_per_minute = weight_per_minute
+        self._spent = []  # (timestamp, weight)
+        self._lock = threading.Lock()
+
+    def acquire(self, weight=REQUEST_WEIGHT):
+        while True:
+            with self._lock:
+                now = time.time()
+                self._spent = [(t, w) for t, w in self._spent if now - t < 60]
+                used = sum(w for _, w in self._spent)
+                if used + weight <= self.weight_per_minute:
+                    self._spent.append((now, weight))
+                    return
+                wait = 60 - (now - self._spent[0][0])
+            time.sleep(max(wait, 0.05))
+
+
+class KlineBackfill:
+    """
+    Paginated Binance klines backfill with pooled connections and a disk cache.
+
+    A date range is split into fixed pages of PAGE_LIMIT klines whose start
+    times are known up front, so independent pages are fetched concurrently
+    over one pooled requests.Session while a RateLimiter keeps the request
+    weight inside the budget. Results are kept in a CandleStore, and later
+    loads only request what is missing: in front of or after the cached range
+    (the last cached candle is always refreshed because it may still be
+    forming) and gaps between cached candles inside the requested range. A gap
+    the exchange has no klines for (e.g. a trading halt) is only requested
+    once per instance. ``base_url`` can point at a local stub server.
+    """
+
+    def __init__(self, store=None, base_url=BINANCE_API_URL, max_workers=4,
+                 weight_per_minute=WEIGHT_PER_MINUTE, session=None, retries=3):
+        self.store = store if store is not None else CandleStore()
+        self.base_url = base_url.rstrip('/')
+        self.max_workers = max_workers
+        self.retries = retries
+        self.limiter = RateLimiter(weight_per_minute)
+        self._empty_gaps = set()  # (symbol, interval, start_ms, end_ms) the exchange returned nothing for
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+    def fetch_page(self, symbol, interval, start_ms, end_ms, limit=PAGE_LIMIT):
+        """
+        Fetch one page of raw klines. Retries on HTTP 429/418 after the
+        server's Retry-After delay and on connection errors with backoff.
+        """
+        params = {'symbol': symbol.upper(), 'interval': interval,
+                  'startTime': int(start_ms), 'endTime': int(end_ms), 'limit': limit}
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire()
+            try:
+                response = self.session.get(self.base_url + KLINES_PATH, params=params, timeout=10)
+            except requests.RequestException as e:
+                if attempt == self.retries:
+                    raise
+                print(f"Error fetching klines page: {e}")
+                time.sleep(2 ** attempt)
+                continue
+            if response.status_code in (418, 429) and attempt < self.retries:
+                time.sleep(float(response.headers.get('Retry-After', 2 ** attempt)))
+                continue
+            response.raise_for_status()
+            return response.json()
+        return []
+
+    def fetch_range(self, symbol, interval, start_ms, end_ms):
+        """
+        Fetch all klines with start_ms <= open time <= end_ms as a DataFrame
+        (time, open, high, low, close, volume).
+        """
+        span = PAGE_LIMIT * timeframe_seconds(interval) * 1000
+        starts = list(range(int(start_ms), int(end_ms) + 1, span))
+        if not starts:
+            return _klines_to_frame([])
+
+        def page(start):
+            return self.fetch_page(symbol, interval, start, min(start + span - 1, end_ms))
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(starts))) as pool:
+            pages = list(pool.map(page, starts))
+        return _klines_to_frame([entry for rows in pages for entry in rows])
+
+    def load(self, symbol, interval, start_ms, end_ms=None):
+        """
+        Return klines from start_ms to end_ms (default: now), serving the cached
+        range from disk and fetching only the missing head, tail and gaps.
+        """
+        if end_ms is None:
+            end_ms = int(time.time() * 1000)
+        key = symbol.lower()
+        cached = self.store.read(key, interval)
+
+        if cached.empty:
+            fresh = self.fetch_range(symbol, interval, start_ms, end_ms)
+            self.store.upsert(key, interval, fresh)
+            combined = fresh
+        else:
+            width_ms = timeframe_seconds(interval) * 1000
+            cached_ms = cached['time'].values.astype('datetime64[ms]').astype('int64')
+            first_ms, last_ms = int(cached_ms[0]), int(cached_ms[-1])
+            # Refresh from the last cached candle, or from start_ms if the cache ends before it
+            tail_ms = max(last_ms, int(start_ms))
+            tail = self.fetch_range(symbol, interval, tail_ms, end_ms) if end_ms >= tail_ms else None
+            fills = []
+            if -(-start_ms // width_ms) * width_ms < first_ms:  # First open time at or after start_ms
+                fills.append(self.fetch_range(symbol, interval, start_ms, min(first_ms - 1, end_ms)))
+            for gap_start, gap_end in self._gaps(key, interval, cached_ms, start_ms, end_ms):
+                fill = self.fetch_range(symbol, interval, gap_start, gap_end)
+                if fill.empty:
+                    self._empty_gaps.add((key, interval, gap_start, gap_end))
+                fills.append(fill)
+            fills = [fill for fill in fills if not fill.empty]
+            if fills:
+                # Bars in front of or between stored ones cannot be appended
+                combined = pd.concat([cached] + fills + [tail], ignore_index=True).sort_values('time', kind='stable')
+                combined = combined.drop_duplicates(subset='time', keep='last')
+                self.store.replace(key, interval, combined)
+            else:
+                self.store.upsert(key, interval, tail)
+                combined = pd.concat([cached, tail], ignore_index=True)
+            combined = combined.drop_duplicates(subset='time', keep='last').reset_index(drop=True)
+
+        times = combined['time']
+        mask = (times >= pd.to_datetime(start_ms, unit='ms')) & (times <= pd.to_datetime(end_ms, unit='ms'))
+        return combined[mask].reset_index(drop=True)
+
+    def _gaps(self, key, interval, cached_ms, start_ms, end_ms):
+        # Missing open times between consecutive cached candles, clipped to the requested range
+        width_ms = timeframe_seconds(interval) * 1000
+        missing = np.flatnonzero(np.diff(cached_ms) > width_ms)
+        for i in missing:
+            gap_start = max(int(cached_ms[i]) + width_ms, int(start_ms))
+            gap_end = min(int(cached_ms[i + 1]) - 1, int(end_ms))
+            if gap_start <= gap_end and (key, interval, gap_start, gap_end) not in self._empty_gaps:
+                yield gap_start, gap_end
+
+    def load_recent(self, symbol, interval, count):
+        """
+        Return the last ``count`` klines up to now.
+        """
+        end_ms = int(time.time() * 1000)
+        start_ms = end_ms - count * timeframe_seconds(interval) * 1000
+        return self.load(symbol, interval, start_ms, end_ms).tail(count).reset_index(drop=True)
+
+
+def _klines_to_frame(rows):
+    df = pd.DataFrame({
+        'time': pd.to_datetime([int(entry[0]) for entry in rows], unit='ms'),
+        'open': [float(entry[1]) for entry in rows],
+        'high': [float(entry[2]) for entry in rows],
+        'low': [float(entry[3]) for entry in rows],
+        'close': [float(entry[4]) for entry in rows],
+        'volume': [float(entry[5]) for entry in rows],
+    })
+    return df.drop_duplicates(subset='time', keep='last').sort_values('time').reset_index(drop=True)
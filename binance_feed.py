@@ -0,0 +1,238 @@
+import asyncio
+import json
+import threading
+import pandas as pd
+import websockets
+from ring_buffer import CandleRingBuffer
+
+BINANCE_COMBINED_STREAM_URL = "wss://stream.binance.com:9443/stream"
+
+
+def parse_kline(kline):
+    """
+    Convert a Binance kline payload (the 'k' object) into
+    (open time ms, open, high, low, close, volume, closed).
+    """
+    return (
+        int(kline['t']),
+        float(kline['o']),
+        float(kline['h']),
+        float(kline['l']),
+        float(kline['c']),
+        float(kline['v']),
+        bool(kline['x']),
+    )
+
+
+def apply_kline(buffer, kline):
+    """
+    Upsert a kline event into a CandleRingBuffer by its open time.
+
+    Binance repeats the forming candle many times per interval with the same
+    open time, so those events overwrite the last row; a new row only appears
+    once a new open time arrives after the previous candle closed (``x``).
+    Returns the parsed kline so callers can act on closed candles.
+    """
+    parsed = parse_kline(kline)
+    buffer.upsert(*parsed[:6])
+    return parsed
+
+
+def kline_to_frame(parsed, volume_column='volume'):
+    """
+    One-row DataFrame for a parsed kline, used to persist closed candles.
+    """
+    open_time, open_, high, low, close, volume, _ = parsed
+    return pd.DataFrame({
+        'time': [pd.to_datetime(open_time, unit='ms')],
+        'open': [open_],
+        'high': [high],
+        'low': [low],
+        'close': [close],
+        volume_column: [volume],
+    })
+
+
+class KlineStreamConsumer:
+    """
+    Asyncio kline ingestion with reconnect and backpressure.
+
+    A receive task reads the socket and a process task hands klines to
+    ``on_kline(stream, kline)``; nothing in either task blocks the event loop.
+    They are joined by a bounded queue of pending (stream, open time) keys:
+    an event for a candle that is still waiting in the queue replaces the
+    pending payload (coalesced), and when the queue is full the oldest pending
+    candle is discarded (dropped). A message that cannot be parsed is counted
+    and skipped (malformed); connection errors reconnect with exponential
+    backoff.
+    """
+
+    def __init__(self, uri, on_kline, queue_size=1000, initial_backoff=1.0, max_backoff=60.0):
+        self.uri = uri
+        self.on_kline = on_kline
+        self.queue_size = queue_size
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.stats = {'received': 0, 'processed': 0, 'coalesced': 0, 'dropped': 0, 'malformed': 0, 'reconnects': 0}
+        self._pending = {}  # (stream, open time) -> latest kline payload
+        self._queue = None
+        self._stopped = False
+        self._loop = None
+        self._websocket = None
+
+    def stop(self):
+        self._stopped = True
+
+    async def run(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        processor = asyncio.create_task(self._process())
+        try:
+            await self._receive_forever()
+        finally:
+            processor.cancel()
+
+    async def _receive_forever(self):
+        backoff = self.initial_backoff
+        while not self._stopped:
+            try:
+                async with websockets.connect(self.uri) as websocket:
+                    print("WebSocket connection established.")
+                    backoff = self.initial_backoff
+                    self._loop = asyncio.get_running_loop()
+                    self._websocket = websocket
+                    await self._on_connect(websocket)
+                    async for message in websocket:
+                        self._enqueue(message)
+                        if self._stopped:
+                            break
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WebSocket error: {e}")
+            finally:
+                self._websocket = None
+            if self._stopped:
+                break
+            self.stats['reconnects'] += 1
+            print(f"Reconnecting in {backoff:g}s...")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _on_connect(self, websocket):
+        pass
+
+    def _enqueue(self, message):
+        self.stats['received'] += 1
+        try:
+            payload = json.loads(message)
+            data = payload.get('data', payload)  # Combined streams wrap the event in 'data'
+            if 'k' not in data:
+                return
+            kline = data['k']
+            parse_kline(kline)  # A malformed kline is skipped here instead of failing in on_kline
+            stream = payload.get('stream') or f"{kline['s'].lower()}@kline_{kline['i']}"
+            key = (stream, int(kline['t']))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            # One bad message must not drop the connection and trigger a reconnect
+            self.stats['malformed'] += 1
+            print(f"Skipping malformed message: {e}")
+            return
+
+        if key in self._pending:
+            self._pending[key] = kline
+            self.stats['coalesced'] += 1
+            return
+        if self._queue.full():
+            oldest = self._queue.get_nowait()
+            self._pending.pop(oldest, None)
+            self.stats['dropped'] += 1
+        self._pending[key] = kline
+        self._queue.put_nowait(key)
+
+    async def _process(self):
+        while True:
+            key = await self._queue.get()
+            kline = self._pending.pop(key, None)
+            if kline is None:
+                continue
+            try:
+                self.on_kline(key[0], kline)
+            except Exception as e:
+                print(f"Error processing kline: {e}")
+            self.stats['processed'] += 1
+
+
+class CombinedKlineStream(KlineStreamConsumer):
+    """
+    One long-lived Binance combined-stream connection for many symbols and intervals.
+
+    Streams are added and removed with SUBSCRIBE/UNSUBSCRIBE requests on the open
+    socket, so switching symbol or timeframe never reconnects. Every stream has
+    its own CandleRingBuffer and incoming klines are routed to it by stream name.
+    After a reconnect all current streams are subscribed again.
+    """
+
+    def __init__(self, base_url=BINANCE_COMBINED_STREAM_URL, capacity=500, on_kline=None, **kwargs):
+        super().__init__(base_url, self._route, **kwargs)
+        self.capacity = capacity
+        self.listener = on_kline  # Optional listener(stream, parsed kline) called after routing
+        self.buffers = {}  # stream name -> CandleRingBuffer
+        self._lock = threading.Lock()
+        self._request_id = 0
+
+    @staticmethod
+    def stream_name(symbol, interval):
+        return f"{symbol.lower()}@kline_{interval}"
+
+    def buffer(self, symbol, interval):
+        return self.buffers.get(self.stream_name(symbol, interval))
+
+    def subscribe(self, symbol, interval, history=None):
+        """
+        Start routing a stream into its own buffer, seeded with ``history`` (a
+        DataFrame of closed candles). Safe to call from any thread.
+        """
+        stream = self.stream_name(symbol, interval)
+        with self._lock:
+            buffer = self.buffers.get(stream)
+            if buffer is not None:
+                return buffer
+            buffer = CandleRingBuffer(capacity=self.capacity)
+            buffer.extend(history)
+            self.buffers[stream] = buffer
+        self._request('SUBSCRIBE', [stream])
+        return buffer
+
+    def unsubscribe(self, symbol, interval):
+        stream = self.stream_name(symbol, interval)
+        with self._lock:
+            if self.buffers.pop(stream, None) is None:
+                return
+        self._request('UNSUBSCRIBE', [stream])
+
+    def _request(self, method, streams):
+        loop, websocket = self._loop, self._websocket
+        if loop is None or websocket is None:
+            return  # Not connected; _on_connect subscribes everything once we are
+        asyncio.run_coroutine_threadsafe(self._send_request(websocket, method, streams), loop)
+
+    async def _send_request(self, websocket, method, streams):
+        self._request_id += 1
+        try:
+            await websocket.send(json.dumps({'method': method, 'params': streams, 'id': self._request_id}))
+        except Exception as e:
+            print(f"Error sending {method} for {streams}: {e}")
+
+    async def _on_connect(self, websocket):
+        with self._lock:
+            streams = list(self.buffers)
+        if streams:
+            await self._send_request(websocket, 'SUBSCRIBE', streams)
+
+    def _route(self, stream, kline):
+        buffer = self.buffers.get(stream)
+        if buffer is None:
+            return  # Unsubscribed while the event was queued
+        parsed = apply_kline(buffer, kline)
+        if self.listener is not None:
+            self.listener(stream, parsed)
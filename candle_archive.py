@@ -0,0 +1,144 @@
+import os
+import numpy as np
+import pandas as pd
+
+ARCHIVE_DIR = "archive"  # Directory holding one binary file per (symbol, timeframe)
+
+# Native MT5 rates record layout, as returned by copy_rates_* (packed, 60 bytes)
+RATES_DTYPE = np.dtype([
+    ('time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('tick_volume', '<u8'),
+    ('spread', '<i4'),
+    ('real_volume', '<u8'),
+])
+
+
+def rates_to_frame(rates):
+    """
+    Build the chart DataFrame (time, open, high, low, close, tick_volume) from MT5 rate records.
+    """
+    df = pd.DataFrame({
+        'time': pd.to_datetime(rates['time'], unit='s'),
+        'open': rates['open'],
+        'high': rates['high'],
+        'low': rates['low'],
+        'close': rates['close'],
+        'tick_volume': rates['tick_volume'],
+    })
+    return df
+
+
+class CandleArchive:
+    """
+    Memory-mapped candle archive in the native MT5 rates layout.
+
+    Every symbol/timeframe pair is a flat file of RATES_DTYPE records sorted by
+    bar open time. New bars are appended, the forming bar is overwritten in
+    place, older history is merged in with a rewrite, and range reads
+    binary-search the time column and return NumPy views straight into the
+    mapping, so nothing is parsed or copied on read.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = root
+        self._maps = {}  # (symbol, timeframe) -> (size in bytes, np.memmap)
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol}_{timeframe}.bin")
+
+    def _map(self, symbol, timeframe):
+        path = self.path(symbol, timeframe)
+        size = os.path.getsize(path) if os.path.isfile(path) else 0
+        cached = self._maps.get((symbol, timeframe))
+        if cached is not None and cached[0] == size:
+            return cached[1]
+        if size < RATES_DTYPE.itemsize:
+            mm = np.empty(0, dtype=RATES_DTYPE)
+        else:
+            mm = np.memmap(path, dtype=RATES_DTYPE, mode='r', shape=(size // RATES_DTYPE.itemsize,))
+        self._maps[(symbol, timeframe)] = (size, mm)
+        return mm
+
+    def count(self, symbol, timeframe):
+        return len(self._map(symbol, timeframe))
+
+    def last_time(self, symbol, timeframe):
+        mm = self._map(symbol, timeframe)
+        return int(mm['time'][-1]) if len(mm) else None
+
+    def upsert(self, symbol, timeframe, rates):
+        """
+        Write MT5 rate records sorted by time. The last archived bar is
+        overwritten and newer bars are appended in place. Bars older than the
+        last archived one that the archive does not hold yet (e.g. a longer
+        history fetched after a short one) are merged in by rewriting the file,
+        as CandleStore.replace does. Returns the number of records written.
+        """
+        if rates is None or len(rates) == 0:
+            return 0
+        rates = np.asarray(rates).astype(RATES_DTYPE, copy=False)
+
+        path = self.path(symbol, timeframe)
+        mm = self._map(symbol, timeframe)
+        if len(mm) == 0:
+            start, overwrite = 0, False
+        else:
+            last = int(mm['time'][-1])
+            start = int(np.searchsorted(rates['time'], last, side='left'))
+            overwrite = start < len(rates) and rates['time'][start] == last
+            missing = ~np.isin(rates['time'][:start], mm['time'])
+            if missing.any():
+                return self._merge(symbol, timeframe, mm, rates)
+        new = rates[start:]
+        if len(new) == 0:
+            return 0
+
+        with open(path, 'r+b' if os.path.isfile(path) else 'wb') as f:
+            if overwrite:
+                f.seek(-RATES_DTYPE.itemsize, os.SEEK_END)
+            else:
+                f.seek(0, os.SEEK_END)
+            f.write(new.tobytes())
+
+        # Drop the old mapping so the next read sees the new size
+        self._maps.pop((symbol, timeframe), None)
+        return len(new)
+
+    def _merge(self, symbol, timeframe, mm, rates):
+        # Union by open time (incoming bars win), written to a temporary file that replaces the
+        # archive in one step so a crash leaves either the old or the new history
+        merged = np.concatenate([np.asarray(mm), rates])
+        order = np.argsort(merged['time'], kind='stable')
+        merged = merged[order]
+        keep = np.r_[merged['time'][1:] != merged['time'][:-1], True]  # Last copy of every time
+        merged = merged[keep]
+
+        path = self.path(symbol, timeframe)
+        temp = path + ".tmp"
+        with open(temp, 'wb') as f:
+            f.write(merged.tobytes())
+        self._maps.pop((symbol, timeframe), None)  # Release the mapping before the file is swapped
+        os.replace(temp, path)
+        return len(rates)
+
+    def range(self, symbol, timeframe, start=None, end=None):
+        """
+        Return a zero-copy view of the bars with start <= time <= end (epoch seconds).
+        """
+        mm = self._map(symbol, timeframe)
+        times = mm['time']
+        lo = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+        hi = len(mm) if end is None else int(np.searchsorted(times, end, side='right'))
+        return mm[lo:hi]
+
+    def tail(self, symbol, timeframe, count):
+        """
+        Return a zero-copy view of the last ``count`` bars.
+        """
+        mm = self._map(symbol, timeframe)
+        return mm[max(len(mm) - count, 0):]
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.lines import Line2D
+from matplotlib.patches import Rectangle
+from matplotlib.ticker import FuncFormatter, MaxNLocator
+
+UP_COLOR = '#006340'  # Colors of mplfinance's 'charles' style
+DOWN_COLOR = '#a02128'
+BODY_WIDTH = 0.6  # Candle body width in bar slots
+RIGHT_MARGIN = 3  # Empty bar slots kept right of the forming candle
+Y_PADDING = 0.05  # Fraction of the price range added above and below
+
+
+class BlitCandleChart:
+    """
+    Candlestick and volume chart on a matplotlib figure that is updated in
+    place instead of being re-plotted.
+
+    Closed candles live in persistent collections that are only rebuilt when
+    the set of closed bars changes (a bar closed or the window moved), which
+    costs one full redraw per bar. The forming candle, its volume bar and the
+    last-price line are animated artists: a tick restores the saved background,
+    draws just those artists and blits the figure, unless the forming candle
+    leaves the current price or volume range.
+
+    Bars are placed at their index, like mplfinance, so gaps in the market do
+    not leave holes; the x tick labels show the bar times. The axes should
+    share their x axis (``plt.subplots(2, 1, sharex=True)``).
+    """
+
+    def __init__(self, fig, ax, ax_volume, time_format="%H:%M"):
+        self.fig = fig
+        self.canvas = fig.canvas
+        self.ax = ax
+        self.ax_volume = ax_volume
+        self.time_format = time_format
+        self._background = None
+        self._closed_times = None
+        self._times = np.array([], dtype='datetime64[ns]')
+
+        self._wicks = LineCollection([], linewidths=1)
+        self._bodies = PolyCollection([], linewidths=0.5)
+        self._volumes = PolyCollection([], linewidths=0)
+        ax.add_collection(self._wicks)
+        ax.add_collection(self._bodies)
+        ax_volume.add_collection(self._volumes)
+
+        self._forming_wick = Line2D([], [], linewidth=1, animated=True)
+        self._forming_body = Rectangle((0, 0), BODY_WIDTH, 0, linewidth=0.5, animated=True)
+        self._forming_volume = Rectangle((0, 0), BODY_WIDTH, 0, linewidth=0, animated=True)
+        self._price_line = ax.axhline(0, color='gray', linestyle='--', linewidth=0.8, animated=True)
+        ax.add_line(self._forming_wick)
+        ax.add_patch(self._forming_body)
+        ax_volume.add_patch(self._forming_volume)
+        self._animated = [self._forming_wick, self._forming_body, self._forming_volume, self._price_line]
+        for artist in self._animated:
+            artist.set_visible(False)
+
+        formatter = FuncFormatter(self._format_time)
+        ax.xaxis.set_major_formatter(formatter)
+        ax_volume.xaxis.set_major_formatter(formatter)
+        ax.xaxis.set_major_locator(MaxNLocator(8, integer=True))
+        ax_volume.xaxis.set_major_locator(MaxNLocator(8, integer=True))
+        ax.tick_params(labelbottom=False)
+        ax.yaxis.tick_right()
+        ax.set_ylabel("Price")
+        ax_volume.set_ylabel("Volume")
+
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _format_time(self, x, pos=None):
+        i = int(round(x))
+        if 0 <= i < len(self._times):
+            return pd.Timestamp(self._times[i]).strftime(self.time_format)
+        return ""
+
+    def reset(self, title):
+        """
+        Clear the chart for another symbol or timeframe.
+        """
+        self._closed_times = None
+        self._times = np.array([], dtype='datetime64[ns]')
+        self._wicks.set_segments([])
+        self._bodies.set_verts([])
+        self._volumes.set_verts([])
+        for artist in self._animated:
+            artist.set_visible(False)
+        self._background = None
+        self.ax.set_title(title)
+        self.canvas.draw_idle()
+
+    def _on_draw(self, event):
+        # A full draw (resize, zoom, new bar) invalidates the saved background
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._animated:
+            if artist.get_visible():
+                artist.axes.draw_artist(artist)
+
+    @staticmethod
+    def _colors(open_, close):
+        return np.where(close >= open_, UP_COLOR, DOWN_COLOR)
+
+    def _set_closed(self, x, open_, high, low, close, volume):
+        half = BODY_WIDTH / 2
+        left, right = x - half, x + half
+        bottom, top = np.minimum(open_, close), np.maximum(open_, close)
+        colors = self._colors(open_, close)
+
+        self._wicks.set_segments(np.stack([np.column_stack([x, low]), np.column_stack([x, high])], axis=1))
+        self._wicks.set_color(colors)
+        self._bodies.set_verts(np.stack([
+            np.column_stack([left, bottom]), np.column_stack([left, top]),
+            np.column_stack([right, top]), np.column_stack([right, bottom]),
+        ], axis=1))
+        self._bodies.set_facecolor(colors)
+        self._bodies.set_edgecolor(colors)
+        zeros = np.zeros_like(volume)
+        self._volumes.set_verts(np.stack([
+            np.column_stack([left, zeros]), np.column_stack([left, volume]),
+            np.column_stack([right, volume]), np.column_stack([right, zeros]),
+        ], axis=1))
+        self._volumes.set_facecolor(colors)
+
+    def _set_forming(self, x, open_, high, low, close, volume):
+        color = UP_COLOR if close >= open_ else DOWN_COLOR
+        self._forming_wick.set_data([x, x], [low, high])
+        self._forming_wick.set_color(color)
+        self._forming_body.set_bounds(x - BODY_WIDTH / 2, min(open_, close), BODY_WIDTH, abs(close - open_))
+        self._forming_body.set_color(color)
+        self._forming_volume.set_bounds(x - BODY_WIDTH / 2, 0, BODY_WIDTH, volume)
+        self._forming_volume.set_color(color)
+        self._price_line.set_ydata([close, close])
+        for artist in self._animated:
+            artist.set_visible(True)
+
+    def _fits(self, high, low, volume):
+        bottom, top = self.ax.get_ylim()
+        return bottom <= low and high <= top and volume <= self.ax_volume.get_ylim()[1]
+
+    def _rescale(self, n, high, low, volume):
+        span = high.max() - low.min()
+        pad = span * Y_PADDING if span > 0 else abs(high.max()) * Y_PADDING or 1.0
+        self.ax.set_xlim(-1, n - 1 + RIGHT_MARGIN)
+        self.ax.set_ylim(low.min() - pad, high.max() + pad)
+        self.ax_volume.set_ylim(0, max(volume.max(), 1) * 1.2)
+
+    def update(self, df, volume_column='volume'):
+        """
+        Show the latest bars of ``df`` (time, open, high, low, close and the
+        volume column, oldest first; the last row is the forming bar). Returns
+        'blit' when only the forming candle was redrawn, 'draw' when a full
+        redraw was scheduled and None for an empty frame.
+        """
+        if df.empty:
+            return None
+        times = df['time'].to_numpy(dtype='datetime64[ns]')
+        open_, high, low, close = (df[c].to_numpy(dtype=np.float64) for c in ('open', 'high', 'low', 'close'))
+        volume = df[volume_column].to_numpy(dtype=np.float64)
+        n = len(times)
+
+        self._set_forming(n - 1, open_[-1], high[-1], low[-1], close[-1], volume[-1])
+        closed_times = times[:-1]
+        if (self._closed_times is not None and self._background is not None
+                and np.array_equal(closed_times, self._closed_times)
+                and self._fits(high[-1], low[-1], volume[-1])):
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.fig.bbox)
+            return 'blit'
+
+        # A bar closed, the window moved or the forming candle left the axes range
+        self._times = times
+        self._closed_times = closed_times
+        self._set_closed(np.arange(n - 1, dtype=np.float64), open_[:-1], high[:-1], low[:-1], close[:-1], volume[:-1])
+        self._rescale(n, high, low, volume)
+        self._background = None  # Stale until the scheduled draw saves a new one
+        self.canvas.draw_idle()
+        return 'draw'
@@ -0,0 +1,248 @@
+import os
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+CANDLE_DIR = "candles"  # Directory holding one CSV file per (symbol, timeframe)
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def _stamp(path):
+    """
+    Identify the current contents of a file by (inode, size, mtime), or None if it does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+@contextmanager
+def _file_lock(path):
+    """
+    Hold an exclusive lock on ``path + '.lock'`` so writers in other processes
+    take turns on the same candle file.
+    """
+    with open(path + '.lock', 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # Gives up after ~10 s; keep waiting
+                    break
+                except OSError:
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _to_epoch_seconds(times):
+    """
+    Convert a datetime-like column to int64 epoch seconds.
+    """
+    return pd.to_datetime(times).values.astype('datetime64[s]').astype('int64')
+
+
+class CandleStore:
+    """
+    Deduplicating candle store keyed by (symbol, timeframe, bar open time).
+
+    Each symbol/timeframe pair lives in its own CSV file. Closed bars are
+    appended once; the last stored bar is the only one that may still be
+    forming, so a changed forming bar is rewritten in place by truncating the
+    file at the start of its line. Disk usage therefore tracks real history
+    instead of the number of polls.
+
+    Several processes may write the same file (e.g. print_price.py and
+    tkinter_plotchart_storedata_csv.py both store BTCUSD M1). Every write holds
+    a lock file next to the CSV, and the cached offsets are dropped and re-read
+    whenever the file was changed by anyone else since this store last wrote
+    it. Whole-file rewrites go to a temporary file that replaces the CSV in one
+    step, so readers never see a missing or half-written history.
+    """
+
+    def __init__(self, root=CANDLE_DIR):
+        self.root = root
+        self._state = {}  # (symbol, timeframe) -> dict(columns, last_time, last_row, last_offset, stamp)
+        self._lock = threading.RLock()  # Feeds and backfills may write from different threads
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, symbol, timeframe):
+        return os.path.join(self.root, f"{symbol}_{timeframe}.csv")
+
+    @staticmethod
+    def _empty_state():
+        return {'columns': None, 'last_time': None, 'last_row': None, 'last_offset': 0, 'stamp': None}
+
+    def _load_state(self, symbol, timeframe):
+        # Called with the file lock held, so the stamp cannot change underneath
+        key = (symbol, timeframe)
+        path = self.path(symbol, timeframe)
+        stamp = _stamp(path)
+        state = self._state.get(key)
+        if state is not None and state['stamp'] == stamp:
+            return state
+
+        state = self._empty_state()
+        if stamp is not None and stamp[1] > 0:
+            df = pd.read_csv(path)
+            times = _to_epoch_seconds(df['time'])
+            if len(times) > 1 and not (times[1:] > times[:-1]).all():
+                # Legacy or damaged file: keep the newest copy of every bar and rewrite it
+                df = self._dedupe(df, times)
+                df.to_csv(path + '.tmp', index=False, date_format=TIME_FORMAT)
+                os.replace(path + '.tmp', path)
+                times = _to_epoch_seconds(df['time'])
+            state['columns'] = list(df.columns)
+            if len(df):
+                state['last_time'] = int(times[-1])
+                state['last_row'] = self._format_row(df.iloc[-1].tolist(), int(times[-1]))
+                state['last_offset'] = self._last_line_offset(path)
+        state['stamp'] = _stamp(path)
+        self._state[key] = state
+        return state
+
+    @staticmethod
+    def _dedupe(df, times):
+        df = df.assign(_t=times)
+        df = df.drop_duplicates(subset='_t', keep='last').sort_values('_t')
+        return df.drop(columns='_t').reset_index(drop=True)
+
+    @staticmethod
+    def _last_line_offset(path):
+        # Byte offset at which the final data line starts
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            block = min(end, 4096)
+            f.seek(end - block)
+            tail = f.read(block).rstrip(b'\r\n')
+        return end - block + tail.rfind(b'\n') + 1
+
+    @staticmethod
+    def _format_row(values, epoch):
+        stamp = pd.Timestamp(epoch, unit='s').strftime(TIME_FORMAT)
+        return ','.join([stamp] + [str(v) for v in values[1:]]) + '\n'
+
+    def upsert(self, symbol, timeframe, df):
+        """
+        Store the bars of ``df`` (a 'time' column followed by value columns).
+        Only bars newer than the last stored one are appended, and the last
+        stored bar is rewritten if its values changed. Every writer of a
+        symbol/timeframe must use the same columns; a different set raises
+        ValueError. Returns the number of rows written.
+        """
+        if df is None or df.empty:
+            return 0
+        path = self.path(symbol, timeframe)
+        with self._lock, _file_lock(path):
+            return self._write(path, self._load_state(symbol, timeframe), df)
+
+    def _write(self, path, state, df):
+        times = _to_epoch_seconds(df['time'])
+        last_time = state['last_time']
+
+        if state['columns'] is None:
+            state['columns'] = list(df.columns)
+        elif list(df.columns) != state['columns']:
+            if set(df.columns) != set(state['columns']):
+                raise ValueError(f"Columns {list(df.columns)} do not match the {state['columns']} "
+                                 f"already stored in {path}")
+            df = df[state['columns']]
+
+        if last_time is None:
+            start = 0
+        else:
+            start = int(times.searchsorted(last_time, side='left'))
+        if start >= len(df):
+            return 0
+
+        rows = [self._format_row(values, int(t))
+                for values, t in zip(df.iloc[start:].itertuples(index=False, name=None), times[start:])]
+
+        rewrite_last = last_time is not None and int(times[start]) == last_time
+        if rewrite_last and rows[0] == state['last_row']:
+            rows = rows[1:]
+            rewrite_last = False
+            if not rows:
+                return 0
+
+        if not os.path.isfile(path) or os.path.getsize(path) == 0:
+            with open(path, 'w', newline='') as f:
+                f.write(','.join(state['columns']) + '\n')
+                offset = f.tell()
+                f.write(''.join(rows))
+        else:
+            with open(path, 'r+b') as f:
+                if rewrite_last:
+                    f.seek(state['last_offset'])
+                    f.truncate()
+                else:
+                    f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                f.write(''.join(rows).encode())
+
+        state['last_offset'] = offset + sum(len(r.encode()) for r in rows[:-1])
+        state['last_time'] = int(times[-1])
+        state['last_row'] = rows[-1]
+        state['stamp'] = _stamp(path)
+        return len(rows)
+
+    def read(self, symbol, timeframe):
+        """
+        Return the stored history for a symbol/timeframe as a DataFrame.
+        """
+        path = self.path(symbol, timeframe)
+        with self._lock, _file_lock(path):
+            self._load_state(symbol, timeframe)
+            if not os.path.isfile(path) or os.path.getsize(path) == 0:
+                return pd.DataFrame()
+            df = pd.read_csv(path)
+        df['time'] = pd.to_datetime(df['time'])
+        return df
+
+    def replace(self, symbol, timeframe, df):
+        """
+        Rewrite the whole history for a symbol/timeframe, e.g. after older bars
+        were fetched in front of what is already stored. The new file is written
+        next to the old one and swapped in with os.replace.
+        """
+        df = self._dedupe(df, _to_epoch_seconds(df['time']))
+        path = self.path(symbol, timeframe)
+        temp = path + '.tmp'
+        with self._lock, _file_lock(path):
+            if os.path.isfile(temp):
+                os.remove(temp)  # Left over from an interrupted rewrite
+            state = self._empty_state()
+            written = self._write(temp, state, df)
+            if written:
+                os.replace(temp, path)
+            elif os.path.isfile(path):
+                os.remove(path)  # Nothing to store
+            state['stamp'] = _stamp(path)
+            self._state[(symbol, timeframe)] = state
+            return written
+
+    def import_csv(self, csv_file, symbol, timeframe):
+        """
+        Deduplicate a legacy append-only CSV (such as price_data.csv) into the store.
+        """
+        df = pd.read_csv(csv_file)
+        df = self._dedupe(df, _to_epoch_seconds(df['time']))
+        df['time'] = pd.to_datetime(df['time'])
+        return self.upsert(symbol, timeframe, df)
@@ -0,0 +1,44 @@
+import base64
+import numpy as np
+import plotly.io as pio
+
+try:
+    import orjson
+except ImportError:  # Optional: plotly falls back to the standard json encoder
+    orjson = None
+
+try:
+    import flask_compress
+except ImportError:  # Optional: responses are sent uncompressed
+    flask_compress = None
+
+COMPRESSION_AVAILABLE = flask_compress is not None  # Pass as dash.Dash(compress=...)
+
+
+def typed_array(values, dtype='f8'):
+    """
+    Encode a numeric column as a plotly.js typed array: the raw little-endian
+    bytes in base64 instead of a JSON list of numbers. plotly.js has no 64-bit
+    integer arrays, so integers that may exceed 2**31 (epoch milliseconds,
+    volumes) go out as float64, which is exact up to 2**53.
+    """
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': dtype, 'bdata': base64.b64encode(array.tobytes()).decode('ascii')}
+
+
+def epoch_ms(times):
+    """
+    Datetime column as float64 epoch milliseconds, which a date axis reads directly.
+    """
+    return np.asarray(times, dtype='datetime64[ms]').astype(np.int64).astype(np.float64)
+
+
+def use_fast_json():
+    """
+    Have plotly (and so Dash) serialize callback output with orjson when it is
+    installed. Returns True if orjson is in use.
+    """
+    if orjson is None:
+        return False
+    pio.json.config.default_engine = 'orjson'
+    return True
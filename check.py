@@ -2,9 +2,12 @@ import dash
 from dash import dcc, html
 from dash.dependencies import Input, Output, State
 import plotly.graph_objs as go
-import plotly.subplots as sp
 import MetaTrader5 as mt5
 import pandas as pd
+from candle_archive import rates_to_frame
+from figure_builder import build_figure
+from market_data_service import market_data
+from push_updates import UpdateChannel, add_event_stream, push_url
 
 # Available timeframes
 TIMEFRAMES = {
@@ -20,16 +23,19 @@ SYMBOL = "BTCUSD"  # You can change this to any other symbol
 # Initialize MetaTrader 5 connection
 mt5.initialize()
 
+# Wakes the chart next to the order buttons on every new snapshot
+updates = UpdateChannel()
+market_data.add_listener(lambda symbol, timeframe, rates: updates.publish(symbol, timeframe))
+
 
 def get_data(symbol, timeframe, count=100):
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
-    if rates is None or len(rates) == 0:
+    # Empty until the first poll completes
+    snapshot = market_data.get(symbol, timeframe, count)
+    if snapshot is None:
         print(f"Failed to retrieve data for {symbol}")
         return pd.DataFrame()  # Return empty DataFrame if there's an issue
 
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    return df[['time', 'open', 'high', 'low', 'close', 'tick_volume']]
+    return rates_to_frame(snapshot.rates)
 
 
 # Initialize Dash app
@@ -54,13 +60,14 @@ app.layout = html.Div([
         config={'displayModeBar': False}
     ),
 
-    dcc.Interval(
-        id='interval-component',
-        interval=1 * 1000,  # Update every 1 second
-        n_intervals=0
-    ),
+    dcc.Store(id='push-url', data=push_url(SYMBOL, mt5.TIMEFRAME_M1)),  # Event stream of the chart's timeframe
+    dcc.Store(id='push-event'),  # Written by the server whenever the chart's timeframe publishes
 ])
 
+# Streams for the timeframes in TIMEFRAMES
+add_event_stream(app, updates, [(SYMBOL, timeframe) for timeframe in TIMEFRAMES.values()],
+                 on_wait=lambda symbol, timeframe: market_data.subscribe(symbol, int(timeframe)))
+
 
 @app.callback(
     Output('trade-modal', 'style'),
@@ -147,28 +154,15 @@ def place_order(n_clicks, amount, stop_loss, take_profit, buy_clicks, sell_click
 
 @app.callback(
     Output('live-candlestick-chart', 'figure'),
-    [Input('interval-component', 'n_intervals')]
+    [Input('push-event', 'data')]
 )
-def update_chart(n):
+def update_chart(event):
     df = get_data(SYMBOL, mt5.TIMEFRAME_M1, count=100)
 
     if df.empty:
         return go.Figure()
 
-    fig = sp.make_subplots(rows=1, cols=1)
-
-    # Create candlestick chart
-    candlestick_trace = go.Candlestick(
-        x=df['time'],
-        open=df['open'],
-        high=df['high'],
-        low=df['low'],
-        close=df['close'],
-        name="Candlesticks"
-    )
-    fig.add_trace(candlestick_trace)
-
-    return fig
+    return build_figure(df, f"Live Chart for {SYMBOL}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,168 @@
+from functools import lru_cache
+import numpy as np
+import plotly.subplots as sp
+from chart_encoding import epoch_ms, typed_array
+
+BACKGROUND_COLOR = 'rgb(20, 24, 31)'  # Dark background for plot and paper
+GRID_COLOR = 'DarkGray'
+PRICE_LABEL_X = 1.047  # Live price box position, slightly outside the chart
+CANDLE_TRACE = 0  # Index of the candlestick trace in figure['data']
+VOLUME_TRACE = 1  # Index of the volume trace when volume is shown
+INDICATOR_COLORS = ['#f2c94c', '#56ccf2', '#bb6bd9', '#f2994a', '#6fcf97', '#eb5757']  # Cycled over indicator lines
+
+
+def time_labels(times):
+    """
+    Bar open times as ISO strings, the form the browser keeps in its arrays.
+    """
+    return np.datetime_as_string(np.asarray(times, dtype='datetime64[s]'), unit='s').tolist()
+
+
+def _as_list(values):
+    return np.asarray(values).tolist()
+
+
+def line_values(values):
+    """
+    Indicator values as a list with None for the bars that have no value yet
+    (plain JSON has no NaN).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), None, values).tolist()
+
+
+def candle_colors(open_, close):
+    return np.where(np.asarray(close) > np.asarray(open_), 'green', 'red').tolist()
+
+
+def _row_heights(show_volume, panel):
+    if show_volume and panel:
+        return [0.6, 0.2, 0.2]
+    if show_volume:
+        return [0.7, 0.3]
+    if panel:
+        return [0.75, 0.25]
+    return None
+
+
+@lru_cache(maxsize=None)
+def layout_template(title, show_volume=False, height=None, time_format="%H:%M", panel=False):
+    """
+    Dark-theme layout for one chart variant, built and validated by plotly once
+    and then reused for every tick. The returned dict is shared: treat it as
+    read-only and replace top-level keys on a copy instead. Rows are price,
+    volume when ``show_volume`` and an indicator panel when ``panel``.
+    """
+    fig = sp.make_subplots(
+        rows=1 + bool(show_volume) + bool(panel), cols=1,
+        shared_xaxes=True,
+        row_heights=_row_heights(show_volume, panel),
+        vertical_spacing=0.02,
+    )
+    fig.update_layout(
+        title=title,
+        margin=dict(l=0, r=80, t=50, b=0),  # Right margin leaves room for the price box
+        xaxis_rangeslider_visible=False,
+        showlegend=False,
+        plot_bgcolor=BACKGROUND_COLOR,
+        paper_bgcolor=BACKGROUND_COLOR,
+        font=dict(color="white"),
+        hovermode='x unified',  # Crosshair style hover mode
+    )
+    if height is not None:
+        fig.update_layout(height=height)
+    fig.update_xaxes(type='date', showgrid=True, gridcolor=GRID_COLOR, showticklabels=True,
+                     showline=True, linecolor=GRID_COLOR, linewidth=1)
+    if time_format is not None:
+        fig.update_xaxes(tickformat=time_format)
+    fig.update_yaxes(showgrid=True, gridcolor=GRID_COLOR, side="right", tickformat=".2f",
+                     showticklabels=True, showline=True, linecolor=GRID_COLOR, linewidth=1)
+    return fig.layout.to_plotly_json()
+
+
+def build_figure(df, title, show_volume=False, height=None, price_label_x=PRICE_LABEL_X,
+                 x_range=None, volume_column='tick_volume', time_format="%H:%M", compact=False,
+                 overlays=None, panel=None, stream=None):
+    """
+    Candlestick figure (plus a volume row when ``show_volume``) with a dashed
+    line and optional label at the last price, as a plain figure dict.
+    ``overlays`` and ``panel`` map indicator series names to values aligned
+    with ``df``, drawn as lines over the candles and in a row below them; their
+    traces follow the candle and volume traces and are named after the series.
+
+    Trace arrays are prepared with vectorized NumPy calls and kept as lists so
+    figure_patch can index into them; the layout comes from the cached
+    template and only the price line, label and x range change per call.
+    With ``compact`` the numeric arrays are sent as base64 typed arrays (x as
+    epoch milliseconds) for charts that are always sent whole, never patched.
+    ``stream`` (a push_updates.push_url) is kept in layout.meta, so pushed bars
+    of another symbol or timeframe are not merged into the figure.
+    """
+    if compact:
+        x = typed_array(epoch_ms(df['time']))
+        column = typed_array
+    else:
+        x = time_labels(df['time'])
+        column = _as_list
+    data = [dict(
+        type='candlestick',
+        x=x,
+        open=column(df['open']),
+        high=column(df['high']),
+        low=column(df['low']),
+        close=column(df['close']),
+        name="Candlesticks",
+        hoverinfo="x+y",  # Show crosshair with date and price
+        xaxis='x', yaxis='y',
+    )]
+    if show_volume:
+        data.append(dict(
+            type='bar',
+            x=x,
+            y=column(df[volume_column]),
+            name="Volume",
+            marker=dict(color=candle_colors(df['open'], df['close'])),
+            hoverinfo="x+y",
+            xaxis='x2', yaxis='y2',
+        ))
+    lines = column if compact else line_values
+    panel_axis = str(2 + bool(show_volume))
+    for i, (name, values, axis) in enumerate(
+            [(name, values, '') for name, values in (overlays or {}).items()]
+            + [(name, values, panel_axis) for name, values in (panel or {}).items()]):
+        color = INDICATOR_COLORS[i % len(INDICATOR_COLORS)]
+        trace = dict(x=x, y=lines(values), name=name, hoverinfo="x+y", xaxis='x' + axis, yaxis='y' + axis)
+        if name.endswith(' histogram'):
+            trace.update(type='bar', marker=dict(color=color))
+        else:
+            trace.update(type='scatter', mode='lines', line=dict(color=color, width=1))
+        data.append(trace)
+
+    close = df['close'].to_numpy()
+    last_price = float(close[-1])
+    price_color = "green" if len(close) < 2 or close[-1] > close[-2] else "red"
+
+    layout = dict(layout_template(title, show_volume, height, time_format, bool(panel)))
+    layout['shapes'] = [dict(
+        type="line",
+        x0=0, x1=1, y0=last_price, y1=last_price,
+        xref="paper", yref="y",
+        line=dict(color=price_color, width=2, dash="dash"),
+    )]
+    if price_label_x is not None:
+        layout['annotations'] = [dict(
+            xref="paper", yref="y",
+            x=price_label_x, y=last_price,
+            text=f"{last_price:.2f}",
+            showarrow=False,
+            font=dict(color="white", size=12, family="Arial"),
+            bgcolor=price_color,
+            bordercolor="white",
+            align="center",
+            borderpad=4,  # Padding inside the box to make it adapt to content width
+        )]
+    if x_range is not None:
+        layout['xaxis'] = dict(layout['xaxis'], range=[str(v) for v in x_range])
+    if stream is not None:
+        layout['meta'] = {'stream': stream}
+    return {'data': data, 'layout': layout}
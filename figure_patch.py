@@ -0,0 +1,139 @@
+import numpy as np
+from dash import Patch, no_update
+from figure_builder import CANDLE_TRACE, candle_colors, line_values, time_labels
+
+OHLC = ('open', 'high', 'low', 'close')
+
+
+def _epoch_seconds(df):
+    return df['time'].values.astype('datetime64[s]').astype(np.int64)
+
+
+def _last_bar(df, volume_column='tick_volume'):
+    columns = OHLC + ((volume_column,) if volume_column in df else ())
+    return [float(df[name].iloc[-1]) for name in columns]
+
+
+def chart_state(df, key, volume_column='tick_volume'):
+    """
+    Small per-session record of what the browser's figure currently holds:
+    the view ``key`` (anything that forces a full rebuild when it changes,
+    e.g. timeframe and volume toggle), the open time and prices of its last
+    bar and the number of bars in its arrays.
+    """
+    return {'key': key, 'last_time': int(_epoch_seconds(df)[-1]), 'last_bar': _last_bar(df, volume_column),
+            'count': len(df)}
+
+
+def build_patch(df, state, key, candle_index=CANDLE_TRACE, volume_index=None, volume_column='tick_volume',
+                price_line=True, window=None, lines=None):
+    """
+    Build a dash.Patch that brings the browser's figure from ``state`` up to
+    ``df``: the last bar is overwritten in place, newer bars are appended, the
+    oldest bars are dropped to keep ``window`` bars, and the last-price line
+    (shapes[0]) and label (annotations[0]) are moved. The full figure must
+    hold its trace data as plain lists, as figure_builder.build_figure does:
+    plotly >= 6 sends go.* trace data as base64 typed arrays, which cannot
+    be indexed or extended.
+    ``lines`` maps the index of each indicator trace to its values aligned
+    with ``df``; those traces get the same overwrite, append and drop.
+
+    Returns (patch, new_state), (no_update, no_update) when the last bar has
+    not moved, or (None, None) when the figure has to be rebuilt (first
+    render, view change, or a gap the patch cannot bridge).
+    """
+    if not state or state.get('key') != key or df.empty:
+        return None, None
+
+    times = _epoch_seconds(df)
+    idx = int(np.searchsorted(times, state['last_time']))
+    if idx >= len(df) or times[idx] != state['last_time']:
+        return None, None
+
+    if idx == len(df) - 1 and state.get('last_bar') == _last_bar(df, volume_column):
+        return no_update, no_update
+
+    window = window or len(df)
+    rows = df.iloc[idx:]
+    x = time_labels(rows['time'])
+    colors = candle_colors(rows['open'], rows['close'])
+    last = state['count'] - 1
+
+    patch = Patch()
+    candle = patch['data'][candle_index]
+    volume = patch['data'][volume_index] if volume_index is not None else None
+    lines = {index: (patch['data'][index], line_values(values[idx:])) for index, values in (lines or {}).items()}
+
+    # Forming bar: overwrite the last element of every array
+    candle['x'][last] = x[0]
+    for name in OHLC:
+        candle[name][last] = float(rows[name].iloc[0])
+    if volume is not None:
+        volume['x'][last] = x[0]
+        volume['y'][last] = float(rows[volume_column].iloc[0])
+        volume['marker']['color'][last] = colors[0]
+    for line, values in lines.values():
+        line['x'][last] = x[0]
+        line['y'][last] = values[0]
+
+    # Newly opened bars: append, then drop from the front to keep the window
+    appended = len(rows) - 1
+    if appended:
+        candle['x'].extend(x[1:])
+        for name in OHLC:
+            candle[name].extend(rows[name].iloc[1:].tolist())
+        if volume is not None:
+            volume['x'].extend(x[1:])
+            volume['y'].extend(rows[volume_column].iloc[1:].tolist())
+            volume['marker']['color'].extend(colors[1:])
+        for line, values in lines.values():
+            line['x'].extend(x[1:])
+            line['y'].extend(values[1:])
+
+    count = state['count'] + appended
+    for _ in range(max(count - window, 0)):
+        del candle['x'][0]
+        for name in OHLC:
+            del candle[name][0]
+        if volume is not None:
+            del volume['x'][0]
+            del volume['y'][0]
+            del volume['marker']['color'][0]
+        for line, _ in lines.values():
+            del line['x'][0]
+            del line['y'][0]
+    count = min(count, window)
+
+    if price_line:
+        last_price = float(df['close'].iloc[-1])
+        price_color = "green" if len(df) < 2 or df['close'].iloc[-1] > df['close'].iloc[-2] else "red"
+        patch['layout']['shapes'][0]['y0'] = last_price
+        patch['layout']['shapes'][0]['y1'] = last_price
+        patch['layout']['shapes'][0]['line']['color'] = price_color
+        patch['layout']['annotations'][0]['y'] = last_price
+        patch['layout']['annotations'][0]['text'] = f"{last_price:.2f}"
+        patch['layout']['annotations'][0]['bgcolor'] = price_color
+
+    return patch, {'key': key, 'last_time': int(times[-1]), 'last_bar': _last_bar(df, volume_column),
+                   'count': count}
+
+
+def bars_delta(df, volume_column='tick_volume', lines=None):
+    """
+    Bars as plain arrays named after the figure's trace fields, pushed to
+    browsers that merge them into the figure themselves (assets/figure_delta.js).
+    ``lines`` maps indicator series names to values aligned with ``df``; they
+    are merged into the traces of the same name.
+    """
+    delta = {
+        'x': time_labels(df['time']),
+        'open': df['open'].tolist(),
+        'high': df['high'].tolist(),
+        'low': df['low'].tolist(),
+        'close': df['close'].tolist(),
+        'volume': df[volume_column].tolist(),
+        'color': candle_colors(df['open'], df['close']),
+    }
+    if lines:
+        delta['lines'] = {name: line_values(values) for name, values in lines.items()}
+    return delta
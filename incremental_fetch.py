@@ -0,0 +1,84 @@
+import MetaTrader5 as mt5
+import numpy as np
+from candle_archive import RATES_DTYPE
+
+
+class IncrementalFetcher:
+    """
+    Keeps a resident window of MT5 rates per (symbol, timeframe) and refreshes it
+    by asking the terminal only for the forming bar plus any bars closed since the
+    last known one.
+
+    The first call for a pair loads the full window. Later calls request two bars;
+    the request is doubled only when bars were missed (e.g. after a pause), so a
+    normal tick overwrites the tail of the buffer in place and costs O(1).
+    """
+
+    def __init__(self):
+        self._buffers = {}  # (symbol, timeframe) -> RATES_DTYPE array, oldest bar first
+        self._capacity = {}  # (symbol, timeframe) -> window size the buffer was loaded with
+
+    def reset(self, symbol=None, timeframe=None):
+        if symbol is None:
+            self._buffers.clear()
+            self._capacity.clear()
+        else:
+            self._buffers.pop((symbol, timeframe), None)
+            self._capacity.pop((symbol, timeframe), None)
+
+    def last_time(self, symbol, timeframe):
+        buf = self._buffers.get((symbol, timeframe))
+        return int(buf['time'][-1]) if buf is not None and len(buf) else None
+
+    def fetch(self, symbol, timeframe, count=100):
+        """
+        Return the latest ``count`` bars as a RATES_DTYPE array. The array is the
+        resident buffer itself and must be treated as read-only by callers.
+        Returns None if the terminal has no data for the pair.
+        """
+        key = (symbol, timeframe)
+        buf = self._buffers.get(key)
+
+        if buf is None or count > self._capacity[key]:
+            rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
+            if rates is None or len(rates) == 0:
+                return None
+            buf = np.array(rates, dtype=RATES_DTYPE)
+            self._buffers[key] = buf
+            self._capacity[key] = count
+            return buf
+
+        requested, count = count, self._capacity[key]
+        last_time = buf['time'][-1]
+        n = min(2, count)
+        while True:
+            rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, n)
+            if rates is None or len(rates) == 0:
+                return buf[-requested:]  # Keep serving the last known window
+            if rates['time'][0] <= last_time or n >= count:
+                break
+            n = min(n * 2, count)  # Bars were missed since the last call, look further back
+
+        rates = np.asarray(rates).astype(RATES_DTYPE, copy=False)
+        buf = self._merge(buf, rates, count)
+        self._buffers[key] = buf
+        return buf[-requested:]
+
+    @staticmethod
+    def _merge(buf, rates, count):
+        first = rates['time'][0]
+        if first > buf['time'][-1]:
+            # Gap wider than the window: the fresh rates replace the buffer
+            return np.array(rates, dtype=RATES_DTYPE)
+
+        idx = int(np.searchsorted(buf['time'], first, side='left'))
+        if idx + len(rates) <= len(buf):
+            # Same bars as before: overwrite the forming bar (and its neighbour) in place
+            buf[idx:idx + len(rates)] = rates
+            return buf
+
+        # At least one new bar opened: roll the window forward
+        return np.concatenate([buf[:idx], rates])[-count:]
+
+
+fetcher = IncrementalFetcher()  # Shared by the chart scripts
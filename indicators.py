@@ -0,0 +1,518 @@
+import math
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+
+SESSION_SECONDS = 24 * 60 * 60  # VWAP restarts at every UTC day
+
+
+def epoch_seconds(times):
+    return np.asarray(times, dtype='datetime64[s]').astype(np.int64)
+
+
+class _Smoother:
+    """
+    Exponential moving average of a scalar stream (alpha = 2 / (n + 1) for an
+    EMA, 1 / n for Wilder's smoothing), seeded with the first value like
+    pandas' ``ewm(adjust=False)``. NaN inputs are skipped and the value is NaN
+    until ``period`` inputs have been seen.
+    """
+
+    def __init__(self, alpha, period):
+        self.alpha = alpha
+        self.period = period
+        self._value = None
+        self._count = 0
+
+    @property
+    def value(self):
+        return self._value if self._value is not None and self._count >= self.period else np.nan
+
+    def peek(self, x):
+        if math.isnan(x):
+            return np.nan
+        value = x if self._value is None else self._value + self.alpha * (x - self._value)
+        return value if self._count + 1 >= self.period else np.nan
+
+    def push(self, x):
+        if math.isnan(x):
+            return
+        self._value = x if self._value is None else self._value + self.alpha * (x - self._value)
+        self._count += 1
+
+    def warm(self, values):
+        """
+        Smooth a whole array at once and keep the state after all but its last
+        element, which stays the forming one.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        raw = pd.Series(values).ewm(alpha=self.alpha, adjust=False, ignore_na=True).mean().to_numpy()
+        valid = ~np.isnan(values)
+        counts = np.cumsum(valid)
+        committed = np.flatnonzero(valid[:-1])
+        self._value = float(raw[committed[-1]]) if len(committed) else None
+        self._count = int(counts[-2]) if len(values) > 1 else 0
+        return np.where(valid & (counts >= self.period), raw, np.nan)
+
+
+class StreamingIndicator:
+    """
+    Indicator with running state, fed one bar at a time.
+
+    ``update`` is called for every change of the forming bar: a bar with the
+    same open time as the previous call only replaces the provisional value,
+    a newer one first commits the previous bar into the state. Both cost O(1).
+    ``warm_up`` computes the whole history with vectorized NumPy/pandas and
+    leaves the state as if the bars had been streamed, the last one forming.
+    Times are epoch seconds.
+    """
+
+    outputs = ('value',)
+    overlay = True  # Drawn over the candles; False for a separate panel
+
+    def __init__(self):
+        self._bar = None
+        self.values = (np.nan,) * len(self.outputs)
+
+    def update(self, time, open_, high, low, close, volume=0.0):
+        """
+        Feed the forming bar and return its provisional values, one per output.
+        """
+        if self._bar is not None:
+            if time < self._bar[0]:
+                return self.values  # Older than the forming bar
+            if time > self._bar[0]:
+                self._commit(*self._bar)
+        self._bar = (time, open_, high, low, close, volume)
+        self.values = self._provisional(*self._bar)
+        return self.values
+
+    def warm_up(self, times, open_, high, low, close, volume):
+        """
+        Values of every bar as a tuple of arrays, one per output.
+        """
+        arrays = [np.asarray(times, dtype=np.int64)] + [
+            np.asarray(a, dtype=np.float64) for a in (open_, high, low, close, volume)]
+        if len(arrays[0]) == 0:
+            self._bar = None
+            return tuple(np.empty(0) for _ in self.outputs)
+        result = self._warm(*arrays)
+        self._bar = tuple(a[-1].item() for a in arrays)
+        self.values = tuple(float(r[-1]) for r in result)
+        return result
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        raise NotImplementedError
+
+    def _commit(self, time, open_, high, low, close, volume):
+        raise NotImplementedError
+
+    def _warm(self, times, open_, high, low, close, volume):
+        raise NotImplementedError
+
+
+class _WindowSum:
+    """
+    Sum and sum of squares of the last ``size`` committed values, taken
+    around a shift so large prices do not cancel out; both are recomputed
+    exactly every ``size`` commits to stop rounding drift.
+    """
+
+    def __init__(self, size):
+        self.window = deque(maxlen=size)
+        self.shift = 0.0
+        self.sum = 0.0
+        self.sumsq = 0.0
+        self._commits = 0
+
+    def push(self, x):
+        if self.window.maxlen == 0:
+            return
+        if len(self.window) == self.window.maxlen:
+            old = self.window[0] - self.shift
+            self.sum -= old
+            self.sumsq -= old * old
+        self.window.append(x)
+        self._commits += 1
+        if self._commits >= self.window.maxlen:
+            self.reset(list(self.window))
+        else:
+            d = x - self.shift
+            self.sum += d
+            self.sumsq += d * d
+
+    def reset(self, values):
+        self.window.clear()
+        self.window.extend(values)
+        self.shift = self.window[-1] if self.window else 0.0
+        deviations = [v - self.shift for v in self.window]
+        self.sum = math.fsum(deviations)
+        self.sumsq = math.fsum(d * d for d in deviations)
+        self._commits = 0
+
+
+class SMA(StreamingIndicator):
+    """
+    Simple moving average of the close.
+    """
+
+    def __init__(self, period=20):
+        super().__init__()
+        self.period = period
+        self._window = _WindowSum(period - 1)  # Committed closes; the forming one completes the window
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        if len(self._window.window) < self.period - 1:
+            return (np.nan,)
+        return (self._window.shift + (self._window.sum + close - self._window.shift) / self.period,)
+
+    def _commit(self, time, open_, high, low, close, volume):
+        self._window.push(close)
+
+    def _warm(self, times, open_, high, low, close, volume):
+        self._window.reset(close[:-1][max(len(close) - self.period, 0):] if self.period > 1 else [])
+        return (pd.Series(close).rolling(self.period).mean().to_numpy(),)
+
+
+class EMA(StreamingIndicator):
+    """
+    Exponential moving average of the close, NaN for the first ``period - 1`` bars.
+    """
+
+    def __init__(self, period=50):
+        super().__init__()
+        self.period = period
+        self._ema = _Smoother(2.0 / (period + 1), period)
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        return (self._ema.peek(close),)
+
+    def _commit(self, time, open_, high, low, close, volume):
+        self._ema.push(close)
+
+    def _warm(self, times, open_, high, low, close, volume):
+        return (self._ema.warm(close),)
+
+
+def _rsi(gain, loss):
+    gain, loss = np.asarray(gain, dtype=np.float64), np.asarray(loss, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = 100.0 - 100.0 / (1.0 + gain / loss)
+    rsi = np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), rsi)
+    return np.where(np.isnan(gain) | np.isnan(loss), np.nan, rsi)
+
+
+class RSI(StreamingIndicator):
+    """
+    Relative strength index with Wilder's smoothing of gains and losses.
+    """
+
+    overlay = False
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self._gain = _Smoother(1.0 / period, period)
+        self._loss = _Smoother(1.0 / period, period)
+        self._prev_close = None
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        if self._prev_close is None:
+            return (np.nan,)
+        change = close - self._prev_close
+        return (float(_rsi(self._gain.peek(max(change, 0.0)), self._loss.peek(max(-change, 0.0)))),)
+
+    def _commit(self, time, open_, high, low, close, volume):
+        if self._prev_close is not None:
+            change = close - self._prev_close
+            self._gain.push(max(change, 0.0))
+            self._loss.push(max(-change, 0.0))
+        self._prev_close = close
+
+    def _warm(self, times, open_, high, low, close, volume):
+        change = np.r_[np.nan, np.diff(close)]
+        gain = self._gain.warm(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0)))
+        loss = self._loss.warm(np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0)))
+        self._prev_close = float(close[-2]) if len(close) > 1 else None
+        return (_rsi(gain, loss),)
+
+
+class ATR(StreamingIndicator):
+    """
+    Average true range with Wilder's smoothing; the first bar's true range is its high - low.
+    """
+
+    overlay = False
+
+    def __init__(self, period=14):
+        super().__init__()
+        self.period = period
+        self._atr = _Smoother(1.0 / period, period)
+        self._prev_close = None
+
+    def _true_range(self, high, low):
+        if self._prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        return (self._atr.peek(self._true_range(high, low)),)
+
+    def _commit(self, time, open_, high, low, close, volume):
+        self._atr.push(self._true_range(high, low))
+        self._prev_close = close
+
+    def _warm(self, times, open_, high, low, close, volume):
+        prev_close = np.r_[np.nan, close[:-1]]
+        true_range = np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+        self._prev_close = float(close[-2]) if len(close) > 1 else None
+        return (self._atr.warm(true_range),)
+
+
+class BollingerBands(StreamingIndicator):
+    """
+    Moving average of the close with bands ``width`` population standard deviations away.
+    """
+
+    outputs = ('middle', 'upper', 'lower')
+
+    def __init__(self, period=20, width=2.0):
+        super().__init__()
+        self.period = period
+        self.width = width
+        self._window = _WindowSum(period - 1)
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        if len(self._window.window) < self.period - 1:
+            return np.nan, np.nan, np.nan
+        d = close - self._window.shift
+        mean = (self._window.sum + d) / self.period
+        std = math.sqrt(max((self._window.sumsq + d * d) / self.period - mean * mean, 0.0))
+        middle = self._window.shift + mean
+        return middle, middle + self.width * std, middle - self.width * std
+
+    def _commit(self, time, open_, high, low, close, volume):
+        self._window.push(close)
+
+    def _warm(self, times, open_, high, low, close, volume):
+        self._window.reset(close[:-1][max(len(close) - self.period, 0):] if self.period > 1 else [])
+        rolling = pd.Series(close).rolling(self.period)
+        middle = rolling.mean().to_numpy()
+        std = rolling.std(ddof=0).to_numpy()
+        return middle, middle + self.width * std, middle - self.width * std
+
+
+class VWAP(StreamingIndicator):
+    """
+    Volume-weighted average of the typical price (high + low + close) / 3,
+    restarted every ``session`` seconds (UTC days by default).
+    """
+
+    def __init__(self, session=SESSION_SECONDS):
+        super().__init__()
+        self.session = session
+        self._session = None
+        self._pv = 0.0
+        self._volume = 0.0
+
+    def _totals(self, time, high, low, close, volume):
+        typical = (high + low + close) / 3.0
+        if time // self.session != self._session:
+            return typical * volume, volume, typical
+        return self._pv + typical * volume, self._volume + volume, typical
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        pv, total, typical = self._totals(time, high, low, close, volume)
+        return (pv / total if total > 0 else typical,)
+
+    def _commit(self, time, open_, high, low, close, volume):
+        self._pv, self._volume, _ = self._totals(time, high, low, close, volume)
+        self._session = time // self.session
+
+    def _warm(self, times, open_, high, low, close, volume):
+        typical = (high + low + close) / 3.0
+        sessions = times // self.session
+        pv = pd.Series(typical * volume).groupby(sessions).cumsum().to_numpy()
+        total = pd.Series(volume).groupby(sessions).cumsum().to_numpy()
+        if len(times) > 1:
+            self._session, self._pv, self._volume = int(sessions[-2]), float(pv[-2]), float(total[-2])
+        else:
+            self._session, self._pv, self._volume = None, 0.0, 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (np.where(total > 0, pv / total, typical),)
+
+
+class MACD(StreamingIndicator):
+    """
+    Difference of a fast and a slow EMA of the close, its signal EMA and the
+    histogram between the two.
+    """
+
+    outputs = ('macd', 'signal', 'histogram')
+    overlay = False
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        super().__init__()
+        self._fast = _Smoother(2.0 / (fast + 1), 1)
+        self._slow = _Smoother(2.0 / (slow + 1), slow)
+        self._signal = _Smoother(2.0 / (signal + 1), signal)
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        macd = self._fast.peek(close) - self._slow.peek(close)
+        signal = self._signal.peek(macd)
+        return macd, signal, macd - signal
+
+    def _commit(self, time, open_, high, low, close, volume):
+        self._fast.push(close)
+        self._slow.push(close)
+        self._signal.push(self._fast.value - self._slow.value)
+
+    def _warm(self, times, open_, high, low, close, volume):
+        macd = self._fast.warm(close) - self._slow.warm(close)
+        signal = self._signal.warm(macd)
+        return macd, signal, macd - signal
+
+
+def column_names(name, indicator):
+    """
+    Names of an indicator's series: its own name for a single output,
+    "<name> <output>" otherwise (e.g. "BB 20 upper").
+    """
+    if len(indicator.outputs) == 1:
+        return [name]
+    return [f"{name} {output}" for output in indicator.outputs]
+
+
+class IndicatorSet:
+    """
+    Named indicators fed from the same bars, with the last ``capacity``
+    values of every series kept in a ring (each row written twice, like
+    CandleRingBuffer) so the chart window can be read without copying.
+
+    ``feed`` takes the current window of bars as arrays; only the bars from
+    the forming one on are streamed in, so a tick costs O(1) per indicator.
+    The first window, or one that no longer reaches the forming bar (after a
+    gap or a reload), is warmed up in a single vectorized pass.
+    """
+
+    def __init__(self, indicators, capacity=500):
+        self.indicators = dict(indicators)
+        self.columns = [column for name, indicator in self.indicators.items()
+                        for column in column_names(name, indicator)]
+        self.capacity = capacity
+        self._times = np.zeros(2 * capacity, dtype=np.int64)
+        self._values = np.full((len(self.columns), 2 * capacity), np.nan)
+        self._start = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def last_time(self):
+        if self._size == 0:
+            return None
+        return int(self._times[self._start + self._size - 1])
+
+    def overlays(self):
+        """
+        Names of the indicators drawn over the candles.
+        """
+        return [name for name, indicator in self.indicators.items() if indicator.overlay]
+
+    def panels(self):
+        """
+        Names of the indicators drawn in a panel of their own.
+        """
+        return [name for name, indicator in self.indicators.items() if not indicator.overlay]
+
+    def columns_of(self, names):
+        """
+        Series names of the given indicators, in order.
+        """
+        return [column for name in names if name in self.indicators
+                for column in column_names(name, self.indicators[name])]
+
+    def _write(self, time, values):
+        last = self.last_time()
+        if last is not None and time < last:
+            return
+        if last is None or time > last:
+            slot = (self._start + self._size) % self.capacity
+            if self._size < self.capacity:
+                self._size += 1
+            else:
+                self._start = (self._start + 1) % self.capacity
+        else:
+            slot = (self._start + self._size - 1) % self.capacity
+        for i in (slot, slot + self.capacity):
+            self._times[i] = time
+            self._values[:, i] = values
+
+    def update(self, time, open_, high, low, close, volume=0.0):
+        """
+        Feed one bar (the forming one or a newer one) to every indicator.
+        """
+        with self._lock:
+            self._update(int(time), float(open_), float(high), float(low), float(close), float(volume))
+
+    def _update(self, time, open_, high, low, close, volume):
+        values = []
+        for indicator in self.indicators.values():
+            values.extend(indicator.update(time, open_, high, low, close, volume))
+        self._write(time, values)
+
+    def warm_up(self, times, open_, high, low, close, volume):
+        with self._lock:
+            self._warm_up(times, open_, high, low, close, volume)
+
+    def _warm_up(self, times, open_, high, low, close, volume):
+        times = np.asarray(times, dtype=np.int64)
+        series = []
+        for indicator in self.indicators.values():
+            series.extend(indicator.warm_up(times, open_, high, low, close, volume))
+        n = min(len(times), self.capacity)
+        self._start = 0
+        self._size = n
+        for offset in (0, self.capacity):
+            self._times[offset:offset + n] = times[len(times) - n:]
+            for row, values in enumerate(series):
+                self._values[row, offset:offset + n] = values[len(times) - n:]
+
+    def feed(self, times, open_, high, low, close, volume):
+        """
+        Bring the indicators up to a window of bars (epoch seconds, oldest
+        first; the last bar is the forming one).
+        """
+        times = np.asarray(times, dtype=np.int64)
+        if len(times) == 0:
+            return
+        with self._lock:
+            last = self.last_time()
+            if last is None or times[0] > last:
+                self._warm_up(times, open_, high, low, close, volume)
+                return
+            start = int(np.searchsorted(times, last))
+            for i in range(start, len(times)):
+                self._update(int(times[i]), float(open_[i]), float(high[i]), float(low[i]),
+                             float(close[i]), float(volume[i]))
+
+    def feed_frame(self, df, volume_column='tick_volume'):
+        self.feed(epoch_seconds(df['time']), df['open'].to_numpy(), df['high'].to_numpy(),
+                  df['low'].to_numpy(), df['close'].to_numpy(), df[volume_column].to_numpy())
+
+    def values(self, times):
+        """
+        Every series aligned with ``times`` (epoch seconds), NaN where no value is kept.
+        """
+        times = np.asarray(times, dtype=np.int64)
+        with self._lock:
+            lo, hi = self._start, self._start + self._size
+            kept = self._times[lo:hi]
+            if len(kept) == 0:
+                return {column: np.full(len(times), np.nan) for column in self.columns}
+            pos = np.minimum(np.searchsorted(kept, times), len(kept) - 1)
+            found = kept[pos] == times
+            return {column: np.where(found, self._values[row, lo:hi][pos], np.nan)
+                    for row, column in enumerate(self.columns)}
@@ -0,0 +1,113 @@
+import threading
+import numpy as np
+from candle_archive import RATES_DTYPE
+from timeframe_aggregator import resample_ohlcv
+from timeframes import timeframe_seconds
+
+MAX_VISIBLE_BARS = 1000  # Roughly one candle per horizontal pixel of a full-width chart
+MAX_LEVELS = 16  # Level k merges 2**k base bars
+
+
+def merge_rates(rates, width):
+    """
+    Merge sorted rate records into buckets of ``width`` seconds aligned to the
+    epoch: first open, max high, min low, last close, summed tick volume.
+    """
+    merged = resample_ohlcv(rates['time'], rates['open'], rates['high'], rates['low'],
+                            rates['close'], rates['tick_volume'], width)
+    out = np.zeros(len(merged[0]), dtype=RATES_DTYPE)
+    for name, values in zip(('time', 'open', 'high', 'low', 'close', 'tick_volume'), merged):
+        out[name] = values
+    return out
+
+
+class OHLCPyramid:
+    """
+    Level-of-detail pyramid over the bars of one symbol/timeframe.
+
+    Level 0 is the base history itself; level k merges the bars of level k-1
+    into buckets twice as wide, so every level is a valid OHLC series. When
+    the base only grows at its end (new bars, or the forming bar changing),
+    ``refresh`` rebuilds just the trailing bucket of each level.
+    """
+
+    def __init__(self, bar_seconds, max_levels=MAX_LEVELS):
+        self.bar_seconds = bar_seconds
+        self.max_levels = max_levels
+        self.levels = [np.empty(0, dtype=RATES_DTYPE)]
+
+    def refresh(self, base):
+        previous = self.levels[0]
+        if len(previous) and len(base) >= len(previous) and base['time'][len(previous) - 1] == previous['time'][-1]:
+            since = int(previous['time'][-1])  # Only the last known bar and newer ones changed
+        else:
+            since = None
+        self.levels = [base] + self.levels[1:]
+
+        for k in range(1, self.max_levels + 1):
+            below = self.levels[k - 1]
+            if len(below) <= 1:
+                del self.levels[k:]
+                break
+            width = self.bar_seconds * 2 ** k
+            if since is None or k >= len(self.levels):
+                level = merge_rates(below, width)
+            else:
+                bucket = since - since % width
+                kept = self.levels[k][:np.searchsorted(self.levels[k]['time'], bucket)]
+                tail = merge_rates(below[np.searchsorted(below['time'], bucket):], width)
+                level = np.concatenate([kept, tail])
+            if k < len(self.levels):
+                self.levels[k] = level
+            else:
+                self.levels.append(level)
+
+    def window(self, start=None, end=None, max_bars=MAX_VISIBLE_BARS, pad=1.0):
+        """
+        Return (rates, factor): the bars of the coarsest-needed level for the
+        visible range start..end (epoch seconds, None for the full history),
+        padded by ``pad`` visible widths on each side so panning has data, and
+        the number of base bars merged into each returned bar. The finest level
+        whose visible bar count fits in ``max_bars`` is used.
+        """
+        base = self.levels[0]
+        if len(base) == 0:
+            return base, 1
+        start = int(base['time'][0]) if start is None else int(start)
+        end = int(base['time'][-1]) if end is None else int(end)
+        span = max(end - start, self.bar_seconds)
+
+        for k, level in enumerate(self.levels):
+            times = level['time']
+            visible = np.searchsorted(times, end, side='right') - np.searchsorted(times, start, side='left')
+            if visible <= max_bars or k == len(self.levels) - 1:
+                lo = np.searchsorted(times, start - pad * span, side='left')
+                hi = np.searchsorted(times, end + pad * span, side='right')
+                return level[lo:hi], 2 ** k
+
+
+class PyramidCache:
+    """
+    OHLCPyramid per symbol/timeframe of a CandleArchive, kept in step with the
+    archive: unchanged archives are served from memory, appended ones only
+    recompute their tail buckets.
+    """
+
+    def __init__(self, archive, max_levels=MAX_LEVELS):
+        self.archive = archive
+        self.max_levels = max_levels
+        self._pyramids = {}  # (symbol, timeframe) -> (archive count, last record, OHLCPyramid)
+        self._lock = threading.Lock()
+
+    def get(self, symbol, timeframe):
+        with self._lock:
+            base = self.archive.tail(symbol, timeframe, self.archive.count(symbol, timeframe))
+            last = base[-1].tobytes() if len(base) else None
+            cached = self._pyramids.get((symbol, timeframe))
+            if cached is not None and cached[0] == len(base) and cached[1] == last:
+                return cached[2]
+
+            pyramid = cached[2] if cached is not None else OHLCPyramid(timeframe_seconds(timeframe), self.max_levels)
+            pyramid.refresh(base)
+            self._pyramids[(symbol, timeframe)] = (len(base), last, pyramid)
+            return pyramid
@@ -0,0 +1,245 @@
+import threading
+import time
+import numpy as np
+from collections import namedtuple
+from candle_archive import RATES_DTYPE, rates_to_frame
+from incremental_fetch import IncrementalFetcher
+from timeframe_aggregator import TimeframeAggregator
+from timeframes import timeframe_seconds
+
+POLL_INTERVAL = 1.0  # Seconds between polling cycles
+IDLE_TIMEOUT = 60.0  # Drop subscriptions nobody has read for this long
+MAX_BASE_BARS = 20000  # Cap on the base window polled to derive higher timeframes
+MAX_DERIVED_SECONDS = 24 * 60 * 60  # Longest timeframe derived from the base (D1)
+
+# Published state for one (symbol, timeframe): a read-only copy of the rates window
+Snapshot = namedtuple('Snapshot', ['version', 'published', 'rates'])
+
+
+class MarketDataService:
+    """
+    Background MT5 poller shared by every Dash session in the process.
+
+    Each subscribed (symbol, timeframe) is fetched exactly once per cycle,
+    regardless of how many browser tabs are watching it, and the result is
+    published as an immutable snapshot. Callbacks only read snapshots; the
+    polling thread is the only code that talks to the terminal.
+
+    With ``base_timeframe`` set, higher timeframes up to D1 are not polled at
+    all: they are derived from the base window by a TimeframeAggregator, so
+    switching a chart's timeframe costs no terminal round trip. W1, MN1 and
+    windows needing more than ``max_base_bars`` base bars are polled directly.
+    """
+
+    def __init__(self, poll_interval=POLL_INTERVAL, idle_timeout=IDLE_TIMEOUT,
+                 base_timeframe=None, max_base_bars=MAX_BASE_BARS):
+        self.poll_interval = poll_interval
+        self.idle_timeout = idle_timeout
+        self.base_timeframe = base_timeframe
+        self.max_base_bars = max_base_bars
+        self._fetcher = IncrementalFetcher()
+        self._subscriptions = {}  # (symbol, timeframe) -> dict(count, last_read, base)
+        self._aggregators = {}  # symbol -> (TimeframeAggregator, last folded base bar time)
+        self._snapshots = {}  # (symbol, timeframe) -> Snapshot
+        self._listeners = []
+        self._cycle_listeners = []
+        self._cycle_changed = []  # Pairs published during the current polling cycle
+        self._version = 0
+        self._lock = threading.Lock()
+        self._updated = threading.Condition(self._lock)
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="mt5-market-data", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def add_listener(self, listener):
+        """
+        Register ``listener(symbol, timeframe, rates)``, called from the polling
+        thread whenever a pair publishes a new snapshot.
+        """
+        self._listeners.append(listener)
+
+    def add_cycle_listener(self, listener):
+        """
+        Register ``listener(changed)``, called from the polling thread once per
+        cycle with the (symbol, timeframe) pairs that published in it, so a view
+        of many pairs can be updated with a single message per poll.
+        """
+        self._cycle_listeners.append(listener)
+
+    def _derivable(self, timeframe, count):
+        if self.base_timeframe is None or timeframe == self.base_timeframe:
+            return False
+        width, base = timeframe_seconds(timeframe), timeframe_seconds(self.base_timeframe)
+        # Weeks start on Sunday and months vary in length, so the aggregator's
+        # epoch-aligned buckets would not match MT5's bars; they are polled directly,
+        # as are windows that would need more base bars than max_base_bars
+        return (width > base and width % base == 0 and width <= MAX_DERIVED_SECONDS
+                and count * (width // base) <= self.max_base_bars)
+
+    def subscribe(self, symbol, timeframe, count=100):
+        with self._lock:
+            sub = self._subscriptions.get((symbol, timeframe))
+            count = max(count, sub['count']) if sub is not None else count
+        base = None
+        if self._derivable(timeframe, count):
+            base = self.base_timeframe
+            self.subscribe(symbol, base, count * (timeframe_seconds(timeframe) // timeframe_seconds(base)))
+        with self._lock:
+            sub = self._subscriptions.get((symbol, timeframe))
+            if sub is None or sub['base'] != base:
+                if sub is not None and sub['base'] is not None:
+                    self._fetcher.reset(symbol, timeframe)
+                self._subscriptions[(symbol, timeframe)] = {'count': count, 'last_read': time.time(), 'base': base}
+                if base is not None or sub is not None:
+                    self._aggregators.pop(symbol, None)  # Rebuilt with the new targets on the next publish
+            else:
+                sub['count'] = count
+                sub['last_read'] = time.time()
+        self.start()
+
+    def _touch(self, symbol, timeframe):
+        sub = self._subscriptions.get((symbol, timeframe))
+        if sub is not None:
+            sub['last_read'] = time.time()
+            if sub['base'] is not None:
+                self._touch(symbol, sub['base'])
+
+    def snapshot(self, symbol, timeframe):
+        with self._lock:
+            self._touch(symbol, timeframe)
+            return self._snapshots.get((symbol, timeframe))
+
+    def get(self, symbol, timeframe, count=100, timeout=None):
+        """
+        Subscribe if needed and return the latest snapshot of ``count`` bars,
+        waiting up to ``timeout`` seconds for the first one. Returns None if no
+        data has been published yet.
+        """
+        self.subscribe(symbol, timeframe, count)
+        if timeout is None:
+            timeout = 2 * self.poll_interval
+        snapshot = self.wait_for_update(symbol, timeframe, 0, timeout)
+        if snapshot is None:
+            return None
+        if len(snapshot.rates) > count:
+            snapshot = snapshot._replace(rates=snapshot.rates[-count:])
+        return snapshot
+
+    def wait_for_update(self, symbol, timeframe, version, timeout=None):
+        """
+        Block until the pair has a snapshot newer than ``version`` and return it,
+        or return the current snapshot (possibly None) after ``timeout`` seconds.
+        """
+        key = (symbol, timeframe)
+        with self._updated:
+            self._updated.wait_for(
+                lambda: key in self._snapshots and self._snapshots[key].version > version,
+                timeout)
+            return self._snapshots.get(key)
+
+    def _run(self):
+        while not self._stop.is_set():
+            started = time.time()
+            self.poll_once()
+            self._stop.wait(max(self.poll_interval - (time.time() - started), 0))
+
+    def poll_once(self):
+        with self._lock:
+            now = time.time()
+            for key, sub in list(self._subscriptions.items()):
+                if now - sub['last_read'] > self.idle_timeout:
+                    del self._subscriptions[key]
+                    self._snapshots.pop(key, None)
+                    self._fetcher.reset(*key)
+                    self._aggregators.pop(key[0], None)
+            # Derived timeframes are never polled, only their base
+            subscriptions = [(key, sub['count']) for key, sub in self._subscriptions.items()
+                             if sub['base'] is None]
+
+        self._cycle_changed = []
+        for (symbol, timeframe), count in subscriptions:
+            try:
+                rates = self._fetcher.fetch(symbol, timeframe, count)
+            except Exception as e:
+                print(f"Error polling {symbol} at {timeframe} timeframe: {e}")
+                continue
+            if rates is None or len(rates) == 0:
+                continue
+            changed = self._publish(symbol, timeframe, rates)
+            self._publish_derived(symbol, timeframe, rates, changed)
+
+        if self._cycle_changed:
+            for listener in self._cycle_listeners:
+                try:
+                    listener(self._cycle_changed)
+                except Exception as e:
+                    print(f"Error in market data cycle listener: {e}")
+
+    def _publish_derived(self, symbol, base, rates, changed):
+        with self._lock:
+            targets = {key[1]: sub['count'] for key, sub in self._subscriptions.items()
+                       if key[0] == symbol and sub['base'] == base}
+        entry = self._aggregators.get(symbol)
+        if not targets or (not changed and entry is not None):
+            return
+
+        if (entry is None or entry[0].base != base or set(entry[0].buffers) != set(targets)
+                or entry[0].capacity < max(targets.values())):
+            # First publish for this set of targets: vectorized backfill from the base window
+            aggregator = TimeframeAggregator(base, targets, capacity=max(targets.values()), time_unit='s')
+            aggregator.backfill(rates_to_frame(rates), volume_column='tick_volume')
+        else:
+            # Fold only the base bars at or after the last one already seen
+            aggregator = entry[0]
+            for bar in rates[np.searchsorted(rates['time'], entry[1]):]:
+                aggregator.update(int(bar['time']), bar['open'], bar['high'], bar['low'],
+                                  bar['close'], float(bar['tick_volume']))
+        self._aggregators[symbol] = (aggregator, int(rates['time'][-1]))
+
+        for timeframe, count in targets.items():
+            times, columns = aggregator.buffer(timeframe).view()
+            derived = np.zeros(min(len(times), count), dtype=RATES_DTYPE)
+            n = len(derived)
+            derived['time'] = times[len(times) - n:]
+            for name in ('open', 'high', 'low', 'close'):
+                derived[name] = columns[name][len(times) - n:]
+            derived['tick_volume'] = columns['volume'][len(times) - n:]
+            self._publish(symbol, timeframe, derived)
+
+    def _publish(self, symbol, timeframe, rates):
+        key = (symbol, timeframe)
+        previous = self._snapshots.get(key)
+        if (previous is not None and len(previous.rates) == len(rates)
+                and previous.rates[-1] == rates[-1] and previous.rates[0] == rates[0]):
+            return False  # Nothing moved since the last cycle
+
+        rates = rates.copy()
+        rates.flags.writeable = False
+        with self._updated:
+            self._version += 1
+            self._snapshots[key] = Snapshot(self._version, time.time(), rates)
+            self._updated.notify_all()
+
+        self._cycle_changed.append(key)
+        for listener in self._listeners:
+            try:
+                listener(symbol, timeframe, rates)
+            except Exception as e:
+                print(f"Error in market data listener: {e}")
+        return True
+
+
+market_data = MarketDataService()  # Shared by every chart in the process
@@ -1,7 +1,10 @@
 import time
+import MetaTrader5 as mt5
 import pandas as pd
+from candle_store import CandleStore
 
-csv_file = "price_data.csv"  # Path to your CSV file
+SYMBOL = "BTCUSD"
+csv_file = CandleStore().path(SYMBOL, mt5.TIMEFRAME_M1)  # The M1 candles print_price.py stores
 
 def tail_csv(file_path, interval=1):
     last_seen_row = None
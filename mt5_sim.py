@@ -0,0 +1,622 @@
+"""
+Simulated MetaTrader5 module for running the chart and order scripts without
+a terminal, e.g. on Linux or in CI.
+
+Prices come from M1 candles (a CandleArchive, or records added with
+``add_symbol``) replayed on a SimClock; ticks move inside each bar along
+open -> low -> high -> close (open -> high -> low -> close for down bars).
+Market orders fill at the simulated bid/ask, and positions close when the
+price path reaches their SL or TP. Every call can be delayed by an injected
+latency, so timings of our own code can be separated from the terminal's.
+
+    import mt5_sim
+    mt5_sim.install(speed=60, latency=0.005)  # Before anything imports MetaTrader5
+
+    python mt5_sim.py [--speed=60] [--latency=0.005] [--start=2024-11-01T01:00] [--csv=BTCUSD=data.csv] \
+        script.py [args]
+"""
+import calendar
+import fnmatch
+import functools
+import runpy
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import datetime
+import numpy as np
+from candle_archive import ARCHIVE_DIR, RATES_DTYPE, CandleArchive
+from refresh_scheduler import RefreshScheduler
+from timeframes import timeframe_seconds
+
+# Constants of the MetaTrader5 package
+TIMEFRAME_M1, TIMEFRAME_M2, TIMEFRAME_M3, TIMEFRAME_M4, TIMEFRAME_M5, TIMEFRAME_M6 = 1, 2, 3, 4, 5, 6
+TIMEFRAME_M10, TIMEFRAME_M12, TIMEFRAME_M15, TIMEFRAME_M20, TIMEFRAME_M30 = 10, 12, 15, 20, 30
+TIMEFRAME_H1, TIMEFRAME_H2, TIMEFRAME_H3, TIMEFRAME_H4 = 16385, 16386, 16387, 16388
+TIMEFRAME_H6, TIMEFRAME_H8, TIMEFRAME_H12, TIMEFRAME_D1 = 16390, 16392, 16396, 16408
+TIMEFRAME_W1, TIMEFRAME_MN1 = 32769, 49153
+ORDER_TYPE_BUY, ORDER_TYPE_SELL = 0, 1
+POSITION_TYPE_BUY, POSITION_TYPE_SELL = 0, 1
+DEAL_TYPE_BUY, DEAL_TYPE_SELL = 0, 1
+DEAL_ENTRY_IN, DEAL_ENTRY_OUT = 0, 1
+DEAL_REASON_CLIENT, DEAL_REASON_EXPERT, DEAL_REASON_SL, DEAL_REASON_TP = 0, 3, 4, 5
+TRADE_ACTION_DEAL, TRADE_ACTION_SLTP = 1, 6
+ORDER_FILLING_FOK, ORDER_FILLING_IOC, ORDER_FILLING_RETURN = 0, 1, 2
+ORDER_TIME_GTC, ORDER_TIME_DAY = 0, 1
+TRADE_RETCODE_DONE = 10009
+TRADE_RETCODE_INVALID = 10013
+TRADE_RETCODE_INVALID_VOLUME = 10014
+TRADE_RETCODE_INVALID_STOPS = 10016
+TRADE_RETCODE_MARKET_CLOSED = 10018
+TRADE_RETCODE_POSITION_CLOSED = 10036
+RES_S_OK, RES_E_INVALID_PARAMS, RES_E_NOT_FOUND, RES_E_NO_IPC = 1, -2, -4, -10004
+
+BAR_SECONDS = 60  # The history is M1
+WARMUP_BARS = 1000  # M1 bars before the clock when it starts on the first symbol read
+BALANCE = 10000.0  # Starting balance of the simulated account
+LEVERAGE = 100
+SYMBOL_DEFAULTS = {
+    'digits': 2,
+    'point': 0.01,
+    'spread': None,  # Points; None for the archived bars' spread
+    'trade_contract_size': 1.0,
+    'trade_stops_level': 0,
+    'volume_min': 0.01,
+    'volume_max': 100.0,
+    'volume_step': 0.01,
+    'currency_profit': 'USD',
+}
+PATH_KNOTS = np.array([0.0, 1 / 3, 2 / 3, 1.0])  # Fractions of the bar where the tick path turns
+
+Tick = namedtuple('Tick', 'time bid ask last volume time_msc flags volume_real')
+SymbolInfo = namedtuple('SymbolInfo', 'name visible select digits spread point trade_tick_size trade_tick_value '
+                                      'trade_contract_size trade_stops_level volume_min volume_max volume_step '
+                                      'bid ask time currency_profit description')
+AccountInfo = namedtuple('AccountInfo', 'login trade_mode leverage balance credit profit equity margin margin_free '
+                                        'margin_level currency server name company')
+TradePosition = namedtuple('TradePosition', 'ticket time time_msc time_update type magic identifier volume '
+                                            'price_open sl tp price_current swap profit symbol comment')
+TradeDeal = namedtuple('TradeDeal', 'ticket order time time_msc type entry magic position_id reason volume price '
+                                    'commission swap profit fee sl tp symbol comment external_id')
+OrderSendResult = namedtuple('OrderSendResult', 'retcode deal order volume price bid ask comment request_id '
+                                                'retcode_external request')
+
+
+def to_epoch(value):
+    """
+    Epoch seconds of a datetime (naive ones taken as UTC, as the terminal
+    does) or a number.
+    """
+    if isinstance(value, datetime):
+        return value.timestamp() if value.tzinfo is not None else calendar.timegm(value.timetuple())
+    return float(value)
+
+
+def _path(bar):
+    # Prices at PATH_KNOTS for one M1 record
+    if bar['close'] >= bar['open']:
+        return np.array([bar['open'], bar['low'], bar['high'], bar['close']])
+    return np.array([bar['open'], bar['high'], bar['low'], bar['close']])
+
+
+def _price_at(bar, fraction):
+    return float(np.interp(fraction, PATH_KNOTS, _path(bar)))
+
+
+def bar_starts(times, timeframe):
+    """
+    Open times of the ``timeframe`` bars holding ``times`` (epoch seconds),
+    as the terminal buckets them: weeks open on Sunday, months on the 1st.
+    """
+    times = np.asarray(times, dtype=np.int64)
+    if timeframe == TIMEFRAME_MN1:
+        return times.astype('datetime64[s]').astype('datetime64[M]').astype('datetime64[s]').astype(np.int64)
+    width = timeframe_seconds(timeframe)
+    origin = RefreshScheduler.bar_start(timeframe, 0) % width  # The Sunday origin of weeks, 0 otherwise
+    return times - (times - origin) % width
+
+
+def merge_bars(rates, timeframe):
+    """
+    Merge sorted M1 records into ``timeframe`` bars: first open, max high,
+    min low, last close, summed volumes and the smallest spread.
+    """
+    starts = bar_starts(rates['time'], timeframe)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]]) if len(rates) else np.empty(0, dtype=np.int64)
+    merged = np.zeros(len(first), dtype=RATES_DTYPE)
+    if len(first) == 0:
+        return merged
+    last = np.r_[first[1:], len(rates)] - 1
+    merged['time'] = starts[first]
+    merged['open'] = rates['open'][first]
+    merged['high'] = np.maximum.reduceat(rates['high'], first)
+    merged['low'] = np.minimum.reduceat(rates['low'], first)
+    merged['close'] = rates['close'][last]
+    merged['tick_volume'] = np.add.reduceat(rates['tick_volume'], first)
+    merged['spread'] = np.minimum.reduceat(rates['spread'], first)
+    merged['real_volume'] = np.add.reduceat(rates['real_volume'], first)
+    return merged
+
+
+def _extremes(bar, start, end):
+    # (high, low) of the tick path between two fractions of the bar
+    prices = _path(bar)
+    inside = prices[(PATH_KNOTS > start) & (PATH_KNOTS < end)]
+    points = np.r_[np.interp([start, end], PATH_KNOTS, prices), inside]
+    return float(points.max()), float(points.min())
+
+
+class SimClock:
+    """
+    Simulated time in epoch seconds, running at ``speed`` times wall-clock
+    time from where it was last set; speed 0 holds it still between
+    ``set``/``advance`` calls. Unset clocks are started by the terminal.
+    """
+
+    def __init__(self, start=None, speed=1.0):
+        self.speed = speed
+        self._origin = None
+        self._wall = None
+        if start is not None:
+            self.set(start)
+
+    @property
+    def started(self):
+        return self._origin is not None
+
+    def set(self, when):
+        self._origin = to_epoch(when)
+        self._wall = time.monotonic()
+
+    def advance(self, seconds):
+        self.set(self.now() + seconds)
+
+    def now(self):
+        return self._origin + (time.monotonic() - self._wall) * self.speed
+
+
+def _api(method):
+    # Sleep the injected latency outside the lock, then count and run the call serialized like the terminal
+    name = method.__name__
+
+    @functools.wraps(method)
+    def call(self, *args, **kwargs):
+        delay = self.latency.get(name, 0.0) if isinstance(self.latency, dict) else self.latency
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.calls[name] += 1
+            if name not in ('initialize', 'last_error') and not self.initialized:
+                self._error = (RES_E_NO_IPC, 'No IPC connection')
+                return None
+            return method(self, *args, **kwargs)
+    return call
+
+
+class SimulatedTerminal:
+    """
+    State behind the simulated MetaTrader5 functions: symbols and their M1
+    history, the clock, and one netting-free account of positions and deals.
+
+    ``latency`` is seconds added to every call, or a dict of seconds by
+    function name. ``calls`` counts the calls per function.
+    """
+
+    def __init__(self, archive_root=ARCHIVE_DIR, start=None, speed=1.0, latency=0.0, balance=BALANCE,
+                 leverage=LEVERAGE):
+        self.archive_root = archive_root
+        self.archive = None  # Opened on the first symbol without records in memory
+        self.clock = SimClock(start, speed)
+        self.latency = latency
+        self.calls = Counter()
+        self.initialized = False
+        self.account = {'login': 0, 'server': '', 'balance': balance, 'leverage': leverage}
+        self._symbols = {}  # name -> symbol settings
+        self._rates = {}  # name -> M1 records added in memory
+        self._positions = {}  # ticket -> position dict
+        self._deals = []
+        self._next_ticket = 1
+        self._error = (RES_S_OK, 'Success')
+        self._lock = threading.RLock()
+
+    # --- Setup
+
+    def add_symbol(self, name, rates=None, **settings):
+        """
+        Register ``name`` with overrides of SYMBOL_DEFAULTS and optionally its
+        M1 history (rate records or a candle DataFrame); otherwise its history
+        is read from the archive.
+        """
+        self._symbols[name] = dict(SYMBOL_DEFAULTS, **settings)
+        if rates is not None:
+            if not isinstance(rates, np.ndarray):
+                records = np.zeros(len(rates), dtype=RATES_DTYPE)
+                records['time'] = np.asarray(rates['time']).astype('datetime64[s]').astype(np.int64)
+                for column in ('open', 'high', 'low', 'close'):
+                    records[column] = rates[column]
+                volume = 'tick_volume' if 'tick_volume' in rates else 'volume'
+                if volume in rates:
+                    records['tick_volume'] = rates[volume]
+                rates = records
+            self._rates[name] = np.asarray(rates).astype(RATES_DTYPE, copy=False)
+
+    def _settings(self, symbol):
+        if symbol not in self._symbols:
+            self._symbols[symbol] = dict(SYMBOL_DEFAULTS)
+        return self._symbols[symbol]
+
+    def _bars(self, symbol):
+        rates = self._rates.get(symbol)
+        if rates is None:
+            if self.archive is None:
+                self.archive = CandleArchive(self.archive_root)
+            rates = self.archive.range(symbol, TIMEFRAME_M1)
+        return rates
+
+    def _now(self, bars=None):
+        if not self.clock.started:
+            if bars is None or len(bars) == 0:
+                return time.time()
+            self.clock.set(int(bars['time'][min(WARMUP_BARS, len(bars) - 1)]))
+        return self.clock.now()
+
+    def _locate(self, bars, when):
+        # Index of the M1 bar holding ``when`` and how far into it (1.0 past its end), or (-1, 0.0)
+        index = int(np.searchsorted(bars['time'], when, side='right')) - 1
+        if index < 0:
+            return -1, 0.0
+        return index, min((when - bars['time'][index]) / BAR_SECONDS, 1.0)
+
+    def _quote(self, symbol, bars, index, fraction):
+        # (bid, ask) at a point of the tick path
+        settings = self._settings(symbol)
+        spread = settings['spread'] if settings['spread'] is not None else int(bars['spread'][index])
+        bid = round(_price_at(bars[index], fraction), settings['digits'])
+        return bid, round(bid + spread * settings['point'], settings['digits'])
+
+    def _tick(self, symbol):
+        bars = self._bars(symbol)
+        now = self._now(bars)
+        index, fraction = self._locate(bars, now)
+        if index < 0:
+            return None, now
+        bid, ask = self._quote(symbol, bars, index, fraction)
+        return (bid, ask, index, fraction), now
+
+    def _m1(self, symbol, first, end_time):
+        # M1 records from index ``first`` opened before ``end_time``, up to the clock, the forming one cut there
+        bars = self._bars(symbol)
+        index, fraction = self._locate(bars, self._now(bars))
+        last = min(index, int(np.searchsorted(bars['time'], end_time, side='left')) - 1)
+        if last < first:
+            return np.empty(0, dtype=RATES_DTYPE)
+        rates = np.array(bars[first:last + 1])
+        if last == index and fraction < 1.0:
+            bar = rates[-1]
+            high, low = _extremes(bar, 0.0, fraction)
+            close = _price_at(bar, fraction)
+            bar['high'], bar['low'], bar['close'] = high, low, close
+            bar['tick_volume'] = int(bar['tick_volume'] * fraction)
+            bar['real_volume'] = int(bar['real_volume'] * fraction)
+        return rates
+
+    def _error_result(self, code, message):
+        self._error = (code, message)
+        return None
+
+    # --- Session
+
+    @_api
+    def initialize(self, path=None, login=None, password=None, server=None, timeout=None, portable=False):
+        self.initialized = True
+        if login is not None:
+            self.account.update(login=login, server=server or '')
+        return True
+
+    @_api
+    def login(self, login, password=None, server=None, timeout=None):
+        self.account.update(login=login, server=server or '')
+        return True
+
+    @_api
+    def shutdown(self):
+        self.initialized = False
+        return True
+
+    @_api
+    def last_error(self):
+        return self._error
+
+    # --- Market data
+
+    @_api
+    def symbol_select(self, symbol, enable=True):
+        return len(self._bars(symbol)) > 0
+
+    @_api
+    def symbol_info(self, symbol):
+        quote, now = self._tick(symbol)
+        if quote is None:
+            return self._error_result(RES_E_NOT_FOUND, f"Symbol {symbol} not found")
+        bid, ask, _, _ = quote
+        s = self._settings(symbol)
+        return SymbolInfo(symbol, True, True, s['digits'], int(round((ask - bid) / s['point'])), s['point'],
+                          s['point'], s['point'] * s['trade_contract_size'], s['trade_contract_size'],
+                          s['trade_stops_level'], s['volume_min'], s['volume_max'], s['volume_step'], bid, ask,
+                          int(now), s['currency_profit'], symbol)
+
+    @_api
+    def symbol_info_tick(self, symbol):
+        quote, now = self._tick(symbol)
+        if quote is None:
+            return self._error_result(RES_E_NOT_FOUND, f"No ticks for {symbol}")
+        bid, ask, index, fraction = quote
+        volume = int(self._bars(symbol)['tick_volume'][index] * fraction)
+        return Tick(int(now), bid, ask, 0.0, volume, int(now * 1000), 6, float(volume))
+
+    @_api
+    def copy_rates_from_pos(self, symbol, timeframe, start_pos, count):
+        bars = self._bars(symbol)
+        index, _ = self._locate(bars, self._now(bars))
+        if index < 0:
+            return self._error_result(RES_E_NOT_FOUND, f"No history for {symbol}")
+        # Look back until the window holds enough bars: gaps (weekends, halts) leave buckets without M1 bars
+        wanted = start_pos + count + 1  # One more, as the oldest bucket may be cut short
+        span = wanted * (timeframe_seconds(timeframe) // BAR_SECONDS)
+        while True:
+            first = max(index + 1 - span, 0)
+            starts = bar_starts(bars['time'][first:index + 1], timeframe)
+            if first == 0 or len(starts) == 0 or np.count_nonzero(starts[1:] != starts[:-1]) + 1 >= wanted:
+                break
+            span *= 2
+        if first > 0:
+            first += int(np.searchsorted(starts, starts[0], side='right'))  # Drop the partial oldest bucket
+        rates = self._m1(symbol, first, np.inf)
+        if timeframe != TIMEFRAME_M1:
+            rates = merge_bars(rates, timeframe)
+        end = len(rates) - start_pos
+        return rates[max(end - count, 0):max(end, 0)]
+
+    @_api
+    def copy_rates_range(self, symbol, timeframe, date_from, date_to):
+        start, end = to_epoch(date_from), to_epoch(date_to)
+        bars = self._bars(symbol)
+        first = int(np.searchsorted(bars['time'], bar_starts(int(start), timeframe), side='left'))
+        rates = self._m1(symbol, first, RefreshScheduler.next_bar(timeframe, int(end)))
+        if timeframe != TIMEFRAME_M1:
+            rates = merge_bars(rates, timeframe)
+        return rates[(rates['time'] >= start) & (rates['time'] <= end)]
+
+    # --- Trading
+
+    def _settle(self):
+        # Close the positions whose SL or TP the price path reached since they were last checked
+        for ticket, position in list(self._positions.items()):
+            bars = self._bars(position['symbol'])
+            now = self._now(bars)
+            start, (end, end_fraction) = position['checked'], self._locate(bars, now)
+            position['checked'] = now
+            begin, begin_fraction = self._locate(bars, start)
+            if end < 0 or now <= start:
+                continue
+            begin = max(begin, 0)
+
+            # Segments of the path: the rest of the starting bar, whole bars, the forming bar so far
+            first = bars[begin]
+            if begin == end:
+                high, low = _extremes(first, begin_fraction, end_fraction)
+                segments = [(start, _price_at(first, begin_fraction), high, low, begin)]
+            else:
+                high, low = _extremes(first, begin_fraction, 1.0)
+                segments = [(start, _price_at(first, begin_fraction), high, low, begin)]
+                whole = bars[begin + 1:end]
+                segments += list(zip(whole['time'], whole['open'], whole['high'], whole['low'],
+                                     range(begin + 1, end)))
+                high, low = _extremes(bars[end], 0.0, end_fraction)
+                segments.append((bars[end]['time'], float(bars[end]['open']), high, low, end))
+            seg_time, seg_open, seg_high, seg_low, seg_index = (np.array(column) for column in zip(*segments))
+
+            s = self._settings(position['symbol'])
+            spreads = (np.full(len(seg_index), s['spread']) if s['spread'] is not None
+                       else bars['spread'][seg_index]) * s['point']
+            buy = position['type'] == POSITION_TYPE_BUY
+            if not buy:  # Sells close at the ask
+                seg_open, seg_high, seg_low = seg_open + spreads, seg_high + spreads, seg_low + spreads
+            sl, tp = position['sl'] or None, position['tp'] or None
+            stop = np.zeros(len(seg_time), dtype=bool) if sl is None else (seg_low <= sl if buy else seg_high >= sl)
+            take = np.zeros(len(seg_time), dtype=bool) if tp is None else (seg_high >= tp if buy else seg_low <= tp)
+            touched = stop | take
+            if not touched.any():
+                continue
+            at = int(touched.argmax())
+            if stop[at]:  # Both on one bar: the SL
+                price, reason = (min(sl, seg_open[at]) if buy else max(sl, seg_open[at])), DEAL_REASON_SL
+            else:
+                price, reason = (max(tp, seg_open[at]) if buy else min(tp, seg_open[at])), DEAL_REASON_TP
+            label = 'sl' if reason == DEAL_REASON_SL else 'tp'
+            self._close(ticket, position['volume'], round(price, s['digits']), float(seg_time[at]),
+                        f"[{label} {round(price, s['digits'])}]", reason=reason)
+
+    def _profit(self, position, price, volume):
+        direction = 1 if position['type'] == POSITION_TYPE_BUY else -1
+        contract = self._settings(position['symbol'])['trade_contract_size']
+        return round((price - position['price_open']) * direction * volume * contract, 2)
+
+    def _deal(self, order, when, deal_type, entry, position, volume, price, profit, comment,
+              reason=DEAL_REASON_EXPERT):
+        ticket = self._next_ticket
+        self._next_ticket += 1
+        self._deals.append(TradeDeal(ticket, order, int(when), int(when * 1000), deal_type, entry,
+                                     position['magic'], position['ticket'], reason, volume, price, 0.0, 0.0, profit,
+                                     0.0, position['sl'], position['tp'], position['symbol'], comment, ''))
+        return ticket
+
+    def _close(self, ticket, volume, price, when, comment, order=0, reason=DEAL_REASON_EXPERT):
+        position = self._positions[ticket]
+        profit = self._profit(position, price, volume)
+        deal_type = DEAL_TYPE_SELL if position['type'] == POSITION_TYPE_BUY else DEAL_TYPE_BUY
+        deal = self._deal(order, when, deal_type, DEAL_ENTRY_OUT, position, volume, price, profit, comment, reason)
+        self.account['balance'] += profit
+        position['volume'] = round(position['volume'] - volume, 8)
+        if position['volume'] <= 0:
+            del self._positions[ticket]
+        return deal
+
+    @_api
+    def order_send(self, request):
+        self._settle()
+        symbol = request.get('symbol')
+        quote, now = self._tick(symbol)
+        if request.get('action') not in (TRADE_ACTION_DEAL, TRADE_ACTION_SLTP) or quote is None:
+            return self._result(TRADE_RETCODE_INVALID, request, comment='Invalid request')
+        bid, ask, index, fraction = quote
+        if fraction >= 1.0 and index == len(self._bars(symbol)) - 1:
+            return self._result(TRADE_RETCODE_MARKET_CLOSED, request, bid, ask, comment='Market closed')
+        s = self._settings(symbol)
+        ticket = request.get('position')
+
+        if request['action'] == TRADE_ACTION_SLTP:
+            if ticket not in self._positions:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, bid, ask, comment='Position closed')
+            position = self._positions[ticket]
+            if not self._stops_valid(position['type'], request.get('sl', 0.0), request.get('tp', 0.0), bid, ask, s):
+                return self._result(TRADE_RETCODE_INVALID_STOPS, request, bid, ask, comment='Invalid stops')
+            position.update(sl=request.get('sl', 0.0), tp=request.get('tp', 0.0), time_update=now)
+            return self._result(TRADE_RETCODE_DONE, request, bid, ask, order=ticket)
+
+        volume = float(request.get('volume', 0.0))
+        steps = volume / s['volume_step']
+        if not s['volume_min'] <= volume <= s['volume_max'] or abs(steps - round(steps)) > 1e-6:
+            return self._result(TRADE_RETCODE_INVALID_VOLUME, request, bid, ask, comment='Invalid volume')
+        order_type = request.get('type')
+        price = ask if order_type == ORDER_TYPE_BUY else bid
+        order = self._next_ticket
+        self._next_ticket += 1
+
+        if ticket is not None:  # Close (part of) a position with an opposite deal
+            position = self._positions.get(ticket)
+            if position is None or position['type'] == order_type:
+                return self._result(TRADE_RETCODE_POSITION_CLOSED, request, bid, ask, comment='Position closed')
+            volume = min(volume, position['volume'])
+            deal = self._close(ticket, volume, price, now, request.get('comment', ''), order)
+            return self._result(TRADE_RETCODE_DONE, request, bid, ask, deal, order, volume, price)
+
+        sl, tp = request.get('sl', 0.0), request.get('tp', 0.0)
+        if not self._stops_valid(order_type, sl, tp, bid, ask, s):
+            return self._result(TRADE_RETCODE_INVALID_STOPS, request, bid, ask, comment='Invalid stops')
+        position = self._positions[order] = {
+            'ticket': order, 'time': now, 'time_update': now, 'type': order_type, 'magic': request.get('magic', 0),
+            'volume': volume, 'price_open': price, 'sl': sl, 'tp': tp, 'symbol': symbol,
+            'comment': request.get('comment', ''), 'checked': now,
+        }
+        deal_type = DEAL_TYPE_BUY if order_type == ORDER_TYPE_BUY else DEAL_TYPE_SELL
+        deal = self._deal(order, now, deal_type, DEAL_ENTRY_IN, position, volume, price, 0.0, position['comment'])
+        return self._result(TRADE_RETCODE_DONE, request, bid, ask, deal, order, volume, price)
+
+    @staticmethod
+    def _stops_valid(order_type, sl, tp, bid, ask, settings):
+        # Buys check their stops against the bid, sells against the ask, at least the stops level away
+        gap = settings['trade_stops_level'] * settings['point']
+        if order_type == ORDER_TYPE_BUY:
+            return (not sl or sl < bid - gap) and (not tp or tp > bid + gap)
+        return (not sl or sl > ask + gap) and (not tp or tp < ask - gap)
+
+    def _result(self, retcode, request, bid=0.0, ask=0.0, deal=0, order=0, volume=0.0, price=0.0,
+                comment='Request executed'):
+        return OrderSendResult(retcode, deal, order, volume, price, bid, ask, comment, 0, 0, request)
+
+    def _position_tuple(self, position):
+        quote, _ = self._tick(position['symbol'])
+        current = quote[0] if position['type'] == POSITION_TYPE_BUY else quote[1]
+        return TradePosition(position['ticket'], int(position['time']), int(position['time'] * 1000),
+                             int(position['time_update']), position['type'], position['magic'], position['ticket'],
+                             position['volume'], position['price_open'], position['sl'], position['tp'], current,
+                             0.0, self._profit(position, current, position['volume']), position['symbol'],
+                             position['comment'])
+
+    @_api
+    def positions_get(self, symbol=None, group=None, ticket=None):
+        self._settle()
+        positions = [p for p in self._positions.values()
+                     if (symbol is None or p['symbol'] == symbol) and (ticket is None or p['ticket'] == ticket)
+                     and (group is None or fnmatch.fnmatch(p['symbol'], group))]
+        return tuple(self._position_tuple(p) for p in positions)
+
+    @_api
+    def positions_total(self):
+        self._settle()
+        return len(self._positions)
+
+    @_api
+    def history_deals_get(self, date_from=None, date_to=None, group=None, ticket=None, position=None):
+        self._settle()
+        start = -np.inf if date_from is None else to_epoch(date_from)
+        end = np.inf if date_to is None else to_epoch(date_to)
+        return tuple(deal for deal in self._deals
+                     if start <= deal.time <= end and (ticket is None or deal.order == ticket)
+                     and (position is None or deal.position_id == position)
+                     and (group is None or fnmatch.fnmatch(deal.symbol, group)))
+
+    @_api
+    def account_info(self):
+        self._settle()
+        positions = [self._position_tuple(p) for p in self._positions.values()]
+        profit = round(sum((p.profit for p in positions), 0.0), 2)
+        margin = round(sum(p.volume * self._settings(p.symbol)['trade_contract_size'] * p.price_open
+                           for p in positions) / self.account['leverage'], 2)
+        balance = round(self.account['balance'], 2)
+        equity = round(balance + profit, 2)
+        return AccountInfo(self.account['login'], 0, self.account['leverage'], balance, 0.0, profit, equity, margin,
+                           round(equity - margin, 2), round(equity / margin * 100, 2) if margin else 0.0, 'USD',
+                           self.account['server'], 'Simulated', 'mt5_sim')
+
+
+API = ('initialize', 'login', 'shutdown', 'last_error', 'symbol_select', 'symbol_info', 'symbol_info_tick',
+       'copy_rates_from_pos', 'copy_rates_range', 'order_send', 'positions_get', 'positions_total',
+       'history_deals_get', 'account_info')
+
+terminal = SimulatedTerminal()  # Backs the module-level API functions
+
+
+def __getattr__(name):
+    # mt5.copy_rates_from_pos(...) etc. call the current terminal
+    if name in API:
+        return getattr(terminal, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def install(**settings):
+    """
+    Replace the terminal with ``SimulatedTerminal(**settings)`` and register
+    this module as ``MetaTrader5``, so later ``import MetaTrader5 as mt5``
+    statements get the simulation. Returns the terminal.
+    """
+    global terminal
+    terminal = SimulatedTerminal(**settings)
+    sys.modules['MetaTrader5'] = sys.modules[__name__]
+    return terminal
+
+
+if __name__ == '__main__':
+    import mt5_sim  # The importable module, not this __main__ copy
+    options, csv_files = {}, []
+    arguments = sys.argv[1:]
+    while arguments and arguments[0].startswith('--'):
+        name, _, value = arguments.pop(0)[2:].partition('=')
+        if name == 'csv':
+            csv_files.append(value.split('=', 1))
+        elif name == 'start':
+            options['start'] = datetime.fromisoformat(value)
+        elif name == 'archive':
+            options['archive_root'] = value
+        else:
+            options[name] = float(value)
+    if not arguments:
+        sys.exit(__doc__)
+    simulated = mt5_sim.install(**options)
+    if csv_files:
+        from backtester import load_candles
+        for symbol, csv_file in csv_files:
+            simulated.add_symbol(symbol, load_candles(csv_file))
+    sys.argv = arguments
+    runpy.run_path(arguments[0], run_name='__main__')
@@ -1,11 +1,15 @@
 import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output
+from dash.dependencies import Input, Output, State
 import plotly.graph_objs as go
-import plotly.subplots as sp
 import MetaTrader5 as mt5
 import pandas as pd
-import os
+from candle_archive import rates_to_frame
+from figure_builder import VOLUME_TRACE, build_figure
+from figure_patch import build_patch, chart_state
+from market_data_service import MarketDataService
+from candle_store import CandleStore
+from push_updates import UpdateChannel, add_event_stream, push_url
 
 # Available timeframes
 TIMEFRAMES = {
@@ -17,27 +21,34 @@ TIMEFRAMES = {
 }
 
 SYMBOL = "BTCUSD"
-CSV_FILE = "price_data.csv"  # CSV file to store the data
+store = CandleStore()  # Deduplicated per-symbol/timeframe CSV files under candles/
 
 # Initialize MetaTrader 5 connection
 mt5.initialize()
 
+# M1 also feeds the candle files; the dropdown's higher timeframes are derived from it
+market_data = MarketDataService(base_timeframe=mt5.TIMEFRAME_M1)
+
 def get_data(symbol, timeframe, count=100):
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
-    if rates is None or len(rates) == 0:
+    # Empty until the first poll of this timeframe completes
+    snapshot = market_data.get(symbol, timeframe, count)
+    if snapshot is None:
         print(f"Failed to retrieve data for {symbol}")
         return pd.DataFrame()  # Return empty DataFrame if there's an issue
 
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    return df[['time', 'open', 'high', 'low', 'close', 'tick_volume']]
+    return rates_to_frame(snapshot.rates)
+
+def save_to_csv(symbol, timeframe, rates):
+    # Upsert only new or changed bars instead of appending the whole window
+    store.upsert(symbol, timeframe, rates_to_frame(rates))
+
 
-def save_to_csv(df, csv_file=CSV_FILE):
-    # Append to existing CSV, or create new if it doesn't exist
-    if not os.path.isfile(csv_file):
-        df.to_csv(csv_file, index=False)
-    else:
-        df.to_csv(csv_file, mode='a', header=False, index=False)
+# Persist each published snapshot once from the polling thread, not once per tab
+market_data.add_listener(save_to_csv)
+
+# Wakes update_chart in every tab showing the published timeframe
+updates = UpdateChannel()
+market_data.add_listener(lambda symbol, timeframe, rates: updates.publish(symbol, timeframe))
 
 app = dash.Dash(__name__)
 
@@ -59,110 +70,49 @@ app.layout = html.Div([
         style={'height': '90vh', 'overflow': 'hidden'},
         config={'displayModeBar': False}
     ),
-    dcc.Interval(
-        id='interval-component',
-        interval=1 * 1000,
-        n_intervals=0
-    )
+    dcc.Store(id='chart-state'),  # What the browser's figure holds, for incremental updates
+    dcc.Store(id='push-url'),  # Event stream of the selected timeframe
+    dcc.Store(id='push-event')  # Written by the server whenever that timeframe publishes
 ], style={'width': '100vw', 'height': '100vh', 'overflow': 'hidden'})
 
+# One stream per dropdown timeframe
+add_event_stream(app, updates, [(SYMBOL, timeframe) for timeframe in TIMEFRAMES.values()],
+                 on_wait=lambda symbol, timeframe: market_data.subscribe(symbol, int(timeframe)))
+
+@app.callback(
+    Output('push-url', 'data'),
+    [Input('timeframe-dropdown', 'value')]
+)
+def update_push_url(selected_timeframe):
+    return push_url(SYMBOL, selected_timeframe)
+
 @app.callback(
-    Output('live-candlestick-chart', 'figure'),
-    [Input('interval-component', 'n_intervals'),
+    [Output('live-candlestick-chart', 'figure'),
+     Output('chart-state', 'data')],
+    [Input('push-event', 'data'),
      Input('timeframe-dropdown', 'value'),
-     Input('volume-checkbox', 'value')]
+     Input('volume-checkbox', 'value')],
+    [State('chart-state', 'data')]
 )
-def update_chart(n, selected_timeframe, volume_option):
+def update_chart(event, selected_timeframe, volume_option, state):
     df = get_data(SYMBOL, selected_timeframe, count=100)
 
     if df.empty:
-        return go.Figure()
-
-    # Save data to CSV
-    save_to_csv(df)
+        return go.Figure(), None
 
     # Determine if volume is enabled
     show_volume = 'show_volume' in volume_option
-    volume_colors = ['green' if row['close'] > row['open'] else 'red' for index, row in df.iterrows()]
-
-    if show_volume:
-        fig = sp.make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.02)
-    else:
-        fig = sp.make_subplots(rows=1, cols=1)
-
-    candlestick_trace = go.Candlestick(
-        x=df['time'],
-        open=df['open'],
-        high=df['high'],
-        low=df['low'],
-        close=df['close'],
-        name="Candlesticks",
-        hoverinfo="x+y"
-    )
-
-    if show_volume:
-        volume_trace = go.Bar(
-            x=df['time'],
-            y=df['tick_volume'],
-            name="Volume",
-            marker=dict(color=volume_colors),
-            hoverinfo="x+y"
-        )
-        fig.add_trace(volume_trace, row=2, col=1)
-
-    fig.add_trace(candlestick_trace, row=1, col=1)
-
-    last_price = df['close'].iloc[-1]
-    price_color = "green" if df['close'].iloc[-1] > df['close'].iloc[-2] else "red"
-
-    fig.update_layout(
-        title=f"Live Chart for {SYMBOL}",
-        xaxis=dict(showgrid=True, gridcolor='DarkGray', showticklabels=True),
-        yaxis=dict(showgrid=True, gridcolor='DarkGray', side="right", showticklabels=True),
-        height=900 if show_volume else 600,
-        margin=dict(l=0, r=80, t=50, b=0),
-        xaxis_rangeslider_visible=False,
-        showlegend=False,
-        plot_bgcolor='rgb(20, 24, 31)',
-        paper_bgcolor='rgb(20, 24, 31)',
-        font=dict(color="white"),
-        hovermode='x unified',
-    )
-
-    fig.add_shape(
-        type="line",
-        x0=0, x1=1, y0=last_price, y1=last_price,
-        xref="paper", yref="y",
-        line=dict(color=price_color, width=2, dash="dash")
-    )
-
-    fig.update_yaxes(
-        tickformat=".2f",
-        showgrid=True,
-        gridcolor='DarkGray',
-        side="right"
-    )
-
-    fig.add_annotation(
-        xref="paper", yref="y",
-        x=1.035, y=last_price,
-        text=f"{last_price:.2f}",
-        showarrow=False,
-        font=dict(color="white", size=12, family="Arial"),
-        bgcolor=price_color,
-        bordercolor="white",
-        align="center",
-        borderpad=4
-    )
-
-    fig.update_xaxes(showline=True, linecolor='DarkGray', linewidth=1)
-    fig.update_yaxes(showline=True, linecolor='DarkGray', linewidth=1)
-    fig.update_xaxes(tickformat="%H:%M", matches='x')
-    fig.update_yaxes(showticklabels=True, title_text="")
-    if show_volume:
-        fig.update_yaxes(showticklabels=True, title_text="", row=2, col=1)
-
-    return fig
+
+    # Patch the open figure unless the timeframe or the volume toggle changed
+    view = [selected_timeframe, show_volume]
+    patch, new_state = build_patch(df, state, view, volume_index=VOLUME_TRACE if show_volume else None)
+    if patch is not None:
+        return patch, new_state
+
+    fig = build_figure(df, f"Live Chart for {SYMBOL}", show_volume,
+                       height=900 if show_volume else 600, price_label_x=1.035)
+
+    return fig, chart_state(df, view)
 
 if __name__ == '__main__':
     app.run_server(debug=True)
\ No newline at end of file
@@ -0,0 +1,115 @@
+import json
+import threading
+from dash.dependencies import ClientsideFunction, Input, Output, State
+from flask import Response, abort, stream_with_context
+
+EVENTS_PATH = "/updates"  # Server-sent event streams live under /updates/<symbol>/<timeframe>
+HEARTBEAT = 15.0  # Seconds between keep-alive comments on an idle stream
+MAX_STREAMS = 64  # Open event streams per process; each one parks a server thread
+
+
+def push_url(symbol, timeframe):
+    return f"{EVENTS_PATH}/{symbol}/{timeframe}"
+
+
+class UpdateChannel:
+    """
+    Per (symbol, timeframe) version counters that feeds bump whenever they
+    publish a new tick or bar. Event streams block on the channel instead of
+    the browser polling, so an idle chart costs one parked request and no
+    callbacks.
+    """
+
+    def __init__(self):
+        self._versions = {}  # (symbol, timeframe) -> version
+        self._changed = threading.Condition()
+
+    def publish(self, symbol, timeframe):
+        key = (str(symbol), str(timeframe))
+        with self._changed:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._changed.notify_all()
+
+    def version(self, symbol, timeframe):
+        with self._changed:
+            return self._versions.get((str(symbol), str(timeframe)), 0)
+
+    def wait(self, symbol, timeframe, version, timeout=None):
+        """
+        Block until the pair's version is past ``version`` or ``timeout``
+        seconds have passed, and return the current version.
+        """
+        key = (str(symbol), str(timeframe))
+        with self._changed:
+            self._changed.wait_for(lambda: self._versions.get(key, 0) > version, timeout)
+            return self._versions.get(key, 0)
+
+
+def add_event_stream(app, channel, streams, url_id='push-url', event_id='push-event', on_wait=None,
+                     delta=None, heartbeat=HEARTBEAT, max_streams=MAX_STREAMS):
+    """
+    Serve ``channel`` as server-sent events on app.server and wire the
+    browser side: whenever the dcc.Store ``url_id`` holds a push_url, an
+    EventSource (assets/push_updates.js) is opened on it and every event is
+    written into the dcc.Store ``event_id``, which chart callbacks take as
+    their Input in place of a dcc.Interval.
+
+    ``on_wait(symbol, timeframe)`` runs before every wait, e.g. to keep the
+    feed's subscription alive while a tab is connected but nothing moves.
+    ``delta(symbol, timeframe, since)`` returns (fields, since): extra event
+    fields such as the bars changed after ``since``, and the position to
+    continue from. ``since`` starts as None on every new connection.
+
+    Only the (symbol, timeframe) pairs in ``streams`` are served; any other
+    URL is a 404, so a crafted request cannot make ``on_wait`` subscribe the
+    feed to arbitrary symbols. Every open stream holds one server thread for
+    as long as the tab stays connected (a closed tab is noticed at the next
+    heartbeat), so at most ``max_streams`` are open at once and further
+    connections get a 503; the EventSource retries them on its own.
+    """
+    allowed = {(str(symbol), str(timeframe)) for symbol, timeframe in streams}
+    open_streams = threading.BoundedSemaphore(max_streams)
+
+    @app.server.route(f"{EVENTS_PATH}/<symbol>/<timeframe>")
+    def event_stream(symbol, timeframe):
+        if (symbol, timeframe) not in allowed:
+            abort(404)
+        if not open_streams.acquire(blocking=False):
+            return Response("Too many open event streams", status=503, headers={'Retry-After': str(int(heartbeat))})
+
+        url = push_url(symbol, timeframe)
+
+        def events():
+            since = None
+
+            def event(version):
+                nonlocal since
+                fields = {'version': version, 'stream': url}  # The chart drops events of a stream it no longer shows
+                if delta is not None:
+                    extra, since = delta(symbol, timeframe, since)
+                    fields.update(extra or {})
+                return f"data: {json.dumps(fields)}\n\n"
+
+            version = channel.version(symbol, timeframe)
+            yield event(version)  # Render straight away
+            while True:
+                if on_wait is not None:
+                    on_wait(symbol, timeframe)
+                current = channel.wait(symbol, timeframe, version, heartbeat)
+                if current > version:
+                    version = current
+                    yield event(version)
+                else:
+                    yield ": keep-alive\n\n"  # Also detects tabs that have gone away
+
+        response = Response(stream_with_context(events()), mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+        response.call_on_close(open_streams.release)  # Also runs if the stream never started
+        return response
+
+    app.clientside_callback(
+        ClientsideFunction(namespace='push', function_name='connect'),
+        Output(event_id, 'data'),
+        Input(url_id, 'data'),
+        State(event_id, 'id'),
+    )
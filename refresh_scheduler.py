@@ -0,0 +1,95 @@
+import time
+from datetime import datetime, timezone
+from timeframes import timeframe_seconds
+
+TICK_INTERVAL = 1.0  # Seconds between refreshes of the forming bar
+ROLLOVER_DELAY = 0.05  # Seconds after a bar boundary before the new bar is requested
+OFFSET_STEP = 15 * 60  # Broker server time zones are whole quarter hours
+MAX_OFFSET = 14 * 60 * 60  # Anything further out comes from a stale tick (closed market)
+WEEK_ORIGIN = 3 * 24 * 60 * 60  # MT5 weeks open on Sunday; the epoch is a Thursday
+MN1 = 0xC001
+
+
+class RefreshScheduler:
+    """
+    Decides when a chart on any MT5 timeframe or Binance interval needs a
+    refresh: every ``tick_interval`` seconds while a bar is forming (None
+    for bar closes only) and exactly at each bar boundary for the rollover.
+
+    Bar times are broker server time, so boundaries are computed on the
+    server clock; ``sync`` learns its offset from the time of the last tick.
+    ``state`` lets a periodic callback tell whether anything happened since
+    its previous run, so work follows market events instead of the timer.
+    """
+
+    def __init__(self, tick_interval=TICK_INTERVAL, rollover_delay=ROLLOVER_DELAY):
+        self.tick_interval = tick_interval
+        self.rollover_delay = rollover_delay
+        self.server_offset = 0  # Server time minus UTC, in seconds
+
+    def sync(self, server_time, now=None):
+        """
+        Update the server clock offset from a server timestamp such as the
+        last tick's time (rounded to whole quarter hours).
+        """
+        now = time.time() if now is None else now
+        offset = int(round((server_time - now) / OFFSET_STEP)) * OFFSET_STEP
+        if abs(offset) <= MAX_OFFSET:
+            self.server_offset = offset
+
+    def server_time(self, now=None):
+        return (time.time() if now is None else now) + self.server_offset
+
+    @staticmethod
+    def bar_start(timeframe, t):
+        """
+        Open time of the bar containing server time ``t`` (epoch seconds).
+        """
+        if timeframe == MN1:
+            day = datetime.fromtimestamp(t, timezone.utc)
+            return int(day.replace(day=1, hour=0, minute=0, second=0, microsecond=0).timestamp())
+        width = timeframe_seconds(timeframe)
+        origin = WEEK_ORIGIN if width == 7 * 24 * 60 * 60 else 0
+        return int(t - (t - origin) % width)
+
+    @classmethod
+    def next_bar(cls, timeframe, t):
+        """
+        Open time of the bar after the one containing server time ``t``.
+        """
+        if timeframe == MN1:
+            day = datetime.fromtimestamp(cls.bar_start(timeframe, t), timezone.utc)
+            year, month = (day.year + 1, 1) if day.month == 12 else (day.year, day.month + 1)
+            return int(day.replace(year=year, month=month).timestamp())
+        return cls.bar_start(timeframe, t) + timeframe_seconds(timeframe)
+
+    def next_delay(self, timeframe, now=None):
+        """
+        Seconds until the next refresh: the next tick, or the close of the
+        forming bar if that comes first.
+        """
+        t = self.server_time(now)
+        until_close = self.next_bar(timeframe, t) - t + self.rollover_delay
+        if self.tick_interval is None:
+            return until_close
+        return min(self.tick_interval, until_close)
+
+    def schedule(self, timeframe):
+        """
+        What the browser needs to run ``next_delay`` itself
+        (assets/refresh_schedule.js), so the refresh timer is rescheduled
+        without a server callback per tick.
+        """
+        width = timeframe_seconds(timeframe)
+        return {'width': width, 'origin': WEEK_ORIGIN if width == 7 * 24 * 60 * 60 else 0,
+                'month': timeframe == MN1, 'offset': self.server_offset, 'tick': self.tick_interval,
+                'rollover': self.rollover_delay}
+
+    def state(self, timeframe, tick_time, now=None):
+        """
+        Refresh state of a chart: the last tick time and the open time of the
+        forming bar. A periodic callback compares it with the state of its
+        previous run and only does work when it differs, i.e. when a new tick
+        arrived or a bar closed.
+        """
+        return tick_time, self.bar_start(timeframe, self.server_time(now))
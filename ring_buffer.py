@@ -0,0 +1,122 @@
+import threading
+import numpy as np
+import pandas as pd
+
+COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class CandleRingBuffer:
+    """
+    Fixed-capacity, column-oriented candle buffer.
+
+    Times are int64 (epoch milliseconds by default) and OHLCV are float64. Every
+    row is written twice, at ``i`` and ``i + capacity``, so the live window is
+    always one contiguous slice: appends and overwrites are O(1) and ``view()``
+    returns ordered arrays without copying.
+    """
+
+    def __init__(self, capacity=500, time_unit='ms'):
+        self.capacity = capacity
+        self.time_unit = time_unit
+        self.time = np.zeros(2 * capacity, dtype=np.int64)
+        self.columns = {name: np.zeros(2 * capacity, dtype=np.float64) for name in COLUMNS}
+        self.lock = threading.Lock()
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def clear(self):
+        with self.lock:
+            self._start = 0
+            self._size = 0
+
+    def last_time(self):
+        if self._size == 0:
+            return None
+        return int(self.time[self._start + self._size - 1])
+
+    def _write(self, slot, time, open_, high, low, close, volume):
+        for i in (slot, slot + self.capacity):
+            self.time[i] = time
+            self.columns['open'][i] = open_
+            self.columns['high'][i] = high
+            self.columns['low'][i] = low
+            self.columns['close'][i] = close
+            self.columns['volume'][i] = volume
+
+    def append(self, time, open_, high, low, close, volume):
+        """
+        Add a candle, overwriting the oldest one once the buffer is full.
+        """
+        with self.lock:
+            slot = (self._start + self._size) % self.capacity
+            self._write(slot, time, open_, high, low, close, volume)
+            if self._size < self.capacity:
+                self._size += 1
+            else:
+                self._start = (self._start + 1) % self.capacity
+
+    def update_last(self, time, open_, high, low, close, volume):
+        """
+        Overwrite the newest candle in place.
+        """
+        with self.lock:
+            if self._size == 0:
+                raise IndexError("update_last on an empty CandleRingBuffer")
+            slot = (self._start + self._size - 1) % self.capacity
+            self._write(slot, time, open_, high, low, close, volume)
+
+    def upsert(self, time, open_, high, low, close, volume):
+        """
+        Insert a candle keyed by its open time: a newer time appends, the newest
+        time overwrites in place and older times are ignored. Returns True if a
+        new candle was appended.
+        """
+        last = self.last_time()
+        if last is None or time > last:
+            self.append(time, open_, high, low, close, volume)
+            return True
+        if time == last:
+            self.update_last(time, open_, high, low, close, volume)
+        return False
+
+    def extend(self, df):
+        """
+        Append the rows of a DataFrame with 'time' and OHLCV columns, oldest first.
+        """
+        if df is None or df.empty:
+            return
+        times = pd.to_datetime(df['time']).values.astype(f'datetime64[{self.time_unit}]').astype(np.int64)
+        times = times[-self.capacity:]
+        n = len(times)
+        with self.lock:
+            slots = (self._start + self._size + np.arange(n)) % self.capacity
+            for i in (slots, slots + self.capacity):
+                self.time[i] = times
+                for name in COLUMNS:
+                    self.columns[name][i] = df[name].to_numpy(dtype=np.float64)[-n:]
+            total = self._size + n
+            if total > self.capacity:
+                self._start = (self._start + total - self.capacity) % self.capacity
+            self._size = min(total, self.capacity)
+
+    def view(self):
+        """
+        Return (time, columns) as ordered zero-copy views of the live window.
+        The views alias the buffer, so copy them before handing them to another thread.
+        """
+        lo, hi = self._start, self._start + self._size
+        return self.time[lo:hi], {name: col[lo:hi] for name, col in self.columns.items()}
+
+    def to_frame(self, volume_column='volume'):
+        """
+        Snapshot the buffer as a chart DataFrame (time, open, high, low, close, volume).
+        """
+        with self.lock:
+            times, columns = self.view()
+            data = {'time': pd.to_datetime(times, unit=self.time_unit)}
+            for name in COLUMNS:
+                data[volume_column if name == 'volume' else name] = columns[name].copy()
+        return pd.DataFrame(data)
@@ -0,0 +1,135 @@
+import threading
+from collections import deque
+import numpy as np
+import pandas as pd
+from indicators import IndicatorSet, StreamingIndicator
+
+
+class RollingStats(StreamingIndicator):
+    """
+    Mean and population variance (as np.var) of the closes of the last
+    ``bars`` bars, the forming one included.
+
+    The committed closes are kept with Welford's running mean and sum of
+    squared deviations, updated in O(1) as the window slides; the forming
+    bar is folded in without touching that state. Both are recomputed
+    exactly once per window of commits so rounding cannot accumulate.
+    """
+
+    outputs = ('mean', 'variance')
+
+    def __init__(self, bars):
+        super().__init__()
+        self.bars = bars
+        self._window = deque(maxlen=bars - 1)
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._commits = 0
+
+    def _reset(self, values):
+        self._window.clear()
+        self._window.extend(values)
+        window = np.fromiter(self._window, dtype=np.float64, count=len(self._window))
+        self._mean = float(window.mean()) if len(window) else 0.0
+        self._m2 = float(((window - self._mean) ** 2).sum())
+        self._commits = 0
+
+    def _provisional(self, time, open_, high, low, close, volume):
+        n = len(self._window) + 1
+        if n < self.bars:
+            return np.nan, np.nan
+        delta = close - self._mean
+        mean = self._mean + delta / n
+        return mean, max(self._m2 + delta * (close - mean), 0.0) / n
+
+    def _commit(self, time, open_, high, low, close, volume):
+        if self._window.maxlen == 0:
+            return
+        if len(self._window) < self._window.maxlen:
+            n = len(self._window) + 1
+            delta = close - self._mean
+            self._mean += delta / n
+            self._m2 += delta * (close - self._mean)
+            self._window.append(close)
+        else:
+            oldest = self._window[0]
+            previous = self._mean
+            self._mean += (close - oldest) / len(self._window)
+            self._m2 += (close - oldest) * (close - self._mean + oldest - previous)
+            self._window.append(close)
+            self._commits += 1
+            if self._commits >= self._window.maxlen:
+                self._reset(list(self._window))
+
+    def _warm(self, times, open_, high, low, close, volume):
+        self._reset(close[:-1][max(len(close) - self.bars, 0):] if self.bars > 1 else [])
+        rolling = pd.Series(close).rolling(self.bars)
+        return rolling.mean().to_numpy(), rolling.var(ddof=0).to_numpy()
+
+
+class RollingStatsService:
+    """
+    Resident close statistics for order sizing, fed by a MarketDataService.
+
+    Every tracked (symbol, timeframe) gets a RollingStats per window size,
+    updated from the polling thread whenever the pair publishes, so reading
+    a mean or variance on the order path is a lookup with no terminal round
+    trip. The first read of a pair subscribes it and waits for its first
+    snapshot; call ``track`` at start-up to have it warm before then.
+    """
+
+    def __init__(self, market_data, windows=(3,)):
+        self.market_data = market_data
+        self.windows = tuple(windows)
+        self._stats = {}  # (symbol, timeframe) -> IndicatorSet of RollingStats by window size
+        self._ready = threading.Condition()
+        market_data.add_listener(self._on_rates)
+
+    def track(self, symbol, timeframe):
+        with self._ready:
+            if (symbol, timeframe) not in self._stats:
+                self._stats[(symbol, timeframe)] = IndicatorSet(
+                    {bars: RollingStats(bars) for bars in self.windows}, capacity=1)
+        self.market_data.subscribe(symbol, timeframe, max(self.windows) + 1)
+
+    def _on_rates(self, symbol, timeframe, rates):
+        stats = self._stats.get((symbol, timeframe))
+        if stats is None:
+            return
+        stats.feed(rates['time'], rates['open'], rates['high'], rates['low'], rates['close'], rates['tick_volume'])
+        with self._ready:
+            self._ready.notify_all()
+
+    def stats(self, symbol, timeframe, bars, timeout=5.0):
+        """
+        (mean, variance) of the last ``bars`` closes, the forming bar included,
+        or None if the pair has not published enough bars within ``timeout``
+        seconds of its first read.
+        """
+        if bars not in self.windows:
+            raise ValueError(f"No rolling window of {bars} bars; configured windows are {self.windows}")
+        key = (symbol, timeframe)
+        if key not in self._stats:
+            self.track(symbol, timeframe)
+        stats = self._stats[key]
+        with self._ready:
+            self._ready.wait_for(lambda: len(stats) > 0, timeout)
+        mean, variance = stats.indicators[bars].values
+        if np.isnan(variance):
+            return None
+        return mean, variance
+
+    def variance(self, symbol, timeframe, bars, timeout=5.0):
+        result = self.stats(symbol, timeframe, bars, timeout)
+        return None if result is None else result[1]
+
+    def normalized_variance(self, symbol, timeframe, bars, max_percentage, timeout=5.0):
+        """
+        Variance capped at ``max_percentage`` of the mean price, or None
+        like ``stats``. Returns (mean, variance, normalized variance).
+        """
+        result = self.stats(symbol, timeframe, bars, timeout)
+        if result is None:
+            return None
+        mean, variance = result
+        return mean, variance, min(variance, mean * max_percentage)
@@ -0,0 +1,75 @@
+import sys
+import threading
+import uuid
+from collections import OrderedDict
+import numpy as np
+
+MAX_SESSIONS = 200  # Browser sessions kept before the least recently used is dropped
+MAX_BYTES = 256 * 1024 * 1024  # Cap on the arrays held across all sessions
+
+
+def _sizeof(value):
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sum(_sizeof(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class SessionCache:
+    """
+    Server-side per-session state, keyed by an opaque handle that is all the
+    browser keeps (in a dcc.Store). Entries are evicted least recently used
+    first once there are more than ``max_sessions`` of them or their arrays
+    together exceed ``max_bytes``; a callback that finds its handle gone
+    rebuilds or asks the user to reload.
+    """
+
+    def __init__(self, max_sessions=MAX_SESSIONS, max_bytes=MAX_BYTES):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # handle -> (value, size in bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_handle():
+        return uuid.uuid4().hex
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def get(self, handle, default=None):
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return default
+            self._entries.move_to_end(handle)
+            return entry[0]
+
+    def put(self, handle, value):
+        size = _sizeof(value)
+        with self._lock:
+            previous = self._entries.pop(handle, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[handle] = (value, size)
+            self._bytes += size
+            # Never evict the entry just written, even if it alone is over the cap
+            while len(self._entries) > 1 and (len(self._entries) > self.max_sessions or self._bytes > self.max_bytes):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def pop(self, handle):
+        with self._lock:
+            entry = self._entries.pop(handle, None)
+            if entry is None:
+                return None
+            self._bytes -= entry[1]
+            return entry[0]
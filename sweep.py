@@ -0,0 +1,184 @@
+"""
+Parameter sweep of the order scripts' strategies over stored candles on a
+process pool, built on backtester.backtest.
+
+    python sweep.py [candles.csv] [random draws, 0 for the full grid] [workers]
+"""
+import itertools
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+from backtester import DIRECTIONS, backtest, load_candles, summarize
+
+try:
+    import pyarrow  # noqa: F401
+except ImportError:  # Optional: results are written as CSV instead of Parquet
+    pyarrow = None
+
+HISTORY_COLUMNS = ('time', 'open', 'high', 'low', 'close')  # Rows of the shared history file
+RESULTS_FILE = "sweep_results"  # Extension added by save_results
+LOT_SIZES = (0.01, 0.05, 0.1)
+
+# Values tried per parameter of backtester.backtest; a (low, high) tuple is sampled uniformly by random_search
+SPACE = {
+    'bars': [2, 3, 4, 5, 6, 8, 10, 15, 20],  # calculate_variance(bars=...)
+    'max_percentage': [None, 0.0005, 0.001, 0.0025, 0.005, 0.01],  # Cap as a share of the mean; None for raw variance
+    'sequential': [True, False],  # Test_Algo (one position at a time) or Test_Random_Algo (a trade every bar)
+    'direction': list(DIRECTIONS),
+}
+
+
+def grid(space=SPACE):
+    """
+    Every combination of the values in ``space`` (tuples are taken as value lists).
+    """
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_search(count, space=SPACE, seed=0):
+    """
+    ``count`` parameter sets drawn from ``space``: lists are sampled as
+    choices, (low, high) tuples uniformly (as integers when both are ints).
+    """
+    rng = np.random.default_rng(seed)
+    draws = []
+    for _ in range(count):
+        params = {}
+        for name, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                params[name] = (int(rng.integers(low, high + 1)) if isinstance(low, int) and isinstance(high, int)
+                                else float(rng.uniform(low, high)))
+            else:
+                params[name] = values[rng.integers(len(values))]
+        draws.append(params)
+    return draws
+
+
+def share_history(candles, path=None):
+    """
+    Write candles (a DataFrame or MT5 rate records) to a .npy file of
+    float64 rows in HISTORY_COLUMNS order, time as epoch seconds. Workers
+    map it read-only, so every process reads the same page-cache copy and
+    nothing is pickled to them. Returns the path.
+    """
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.npy')
+        os.close(handle)
+    times = np.asarray(candles['time'])
+    if np.issubdtype(times.dtype, np.datetime64):
+        times = times.astype('datetime64[s]').astype(np.int64)
+    history = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(len(HISTORY_COLUMNS), len(times)))
+    history[0] = times
+    for row, name in enumerate(HISTORY_COLUMNS[1:], start=1):
+        history[row] = np.asarray(candles[name], dtype=np.float64)
+    history.flush()
+    del history
+    return path
+
+
+def open_history(path):
+    # Column name -> read-only view into the mapped file
+    return dict(zip(HISTORY_COLUMNS, np.load(path, mmap_mode='r')))
+
+
+_history = None  # This worker's mapping of the shared history
+
+
+def _init_worker(path):
+    global _history
+    _history = open_history(path)
+
+
+def _evaluate(task):
+    # Profits are linear in the lot size, so one replay serves every lot size
+    index, params, lot_sizes = task
+    summary = summarize(backtest(_history, lot_size=1.0, **params))
+    return index, [dict(summary, profit_per_lot=summary['total_profit'], lot_size=lot,
+                        total_profit=summary['total_profit'] * lot, max_drawdown=summary['max_drawdown'] * lot)
+                   for lot in lot_sizes]
+
+
+def _compact(rows):
+    # Narrow dtypes keep large sweeps small on disk and in memory
+    results = pd.DataFrame(rows)
+    for name in results:
+        column = results[name]
+        if name == 'max_percentage':
+            results[name] = column.astype(np.float32)  # None becomes NaN
+        elif column.dtype == object or pd.api.types.is_string_dtype(column):
+            results[name] = column.astype('category')
+        elif column.dtype == np.float64:
+            results[name] = column.astype(np.float32)
+        elif column.dtype == np.int64:
+            results[name] = pd.to_numeric(column, downcast='integer')
+    return results
+
+
+def run(history_path, param_sets, lot_sizes=LOT_SIZES, workers=None, chunksize=None, **fixed):
+    """
+    Backtest every parameter set (merged over ``fixed`` backtest arguments,
+    e.g. spread) at every lot size on a pool of ``workers`` processes
+    (default: one per core) sharing the history file read-only. Tasks are
+    independent and small, so throughput grows with the core count.
+
+    Returns the results table, one row per parameter set and lot size.
+    Rows are ranked by profit_per_lot (the total profit at 1.0 lot), so a
+    larger lot size cannot lift a worse strategy above a better one; within
+    a parameter set the lot sizes only scale total_profit and max_drawdown.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(index, dict(fixed, **params), tuple(lot_sizes)) for index, params in enumerate(param_sets)]
+    chunksize = chunksize or max(len(tasks) // (workers * 8), 1)
+    rows = []
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(history_path,)) as pool:
+        for index, summaries in pool.imap_unordered(_evaluate, tasks, chunksize):
+            rows.extend(dict(param_sets[index], **summary) for summary in summaries)
+    if not rows:
+        return pd.DataFrame()
+    return _compact(rows).sort_values(['profit_per_lot', 'lot_size'], ascending=[False, True], kind='stable',
+                                      ignore_index=True)
+
+
+def sweep(candles, param_sets=None, lot_sizes=LOT_SIZES, workers=None, **fixed):
+    """
+    ``run`` over candles in memory: shares them in a temporary file for the
+    duration of the sweep. ``param_sets`` defaults to the full SPACE grid.
+    """
+    path = share_history(candles)
+    try:
+        return run(path, grid() if param_sets is None else param_sets, lot_sizes, workers, **fixed)
+    finally:
+        os.remove(path)
+
+
+def save_results(results, path=RESULTS_FILE):
+    """
+    Write the results table as Parquet when pyarrow is installed, otherwise
+    CSV. Returns the file name written.
+    """
+    if pyarrow is not None:
+        path = f"{path}.parquet"
+        results.to_parquet(path, index=False)
+    else:
+        path = f"{path}.csv"
+        results.to_csv(path, index=False)
+    return path
+
+
+if __name__ == '__main__':
+    csv_file = sys.argv[1] if len(sys.argv) > 1 else "price_data.csv"
+    draws = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+    param_sets = random_search(draws) if draws else grid()
+    started = time.perf_counter()
+    results = sweep(load_candles(csv_file), param_sets, workers=workers)
+    elapsed = time.perf_counter() - started
+    print(f"{len(param_sets)} parameter sets x {len(LOT_SIZES)} lot sizes in {elapsed:.1f} s "
+          f"({len(param_sets) / elapsed:.1f} backtests/s), written to {save_results(results)}")
+    print(results.drop_duplicates(list(SPACE)).head(10).to_string())  # Best parameter sets, at the smallest lot
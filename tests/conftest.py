@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules live at the repository root, next to the scripts that import them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
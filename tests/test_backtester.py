@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtester import backtest, first_touch, sl_tp_distance, summarize
+
+
+def reference(df, bars=3, sequential=True, every=1, spread=0.0, direction='sell_first', max_percentage=None):
+    # Bar-by-bar replay of the rules in backtest's docstring, one trade at a time
+    open_, high, low, close = (df[name].to_numpy(dtype=float) for name in ('open', 'high', 'low', 'close'))
+    spread = np.broadcast_to(np.asarray(spread, dtype=float), open_.shape)
+    distance = sl_tp_distance(close, bars, max_percentage=max_percentage)
+    n = len(df)
+    trades = []
+    bar = bars
+    while bar < n:
+        number = len(trades)
+        buy = {'buy': True, 'sell': False}.get(direction, (number % 2 == 0) == (direction == 'buy_first'))
+        s = spread[bar]
+        entry = open_[bar] + s if buy else open_[bar]
+        sl = entry - distance[bar] if buy else entry + distance[bar]
+        tp = entry + distance[bar] if buy else entry - distance[bar]
+        exit_bar, exit_price, reason = n - 1, (close[-1] if buy else close[-1] + s), 'end'
+        for j in range(bar, n):
+            if buy:
+                stop, take, fill = low[j] <= sl, high[j] >= tp, open_[j]
+            else:
+                stop, take, fill = high[j] + s >= sl, low[j] + s <= tp, open_[j] + s
+            if stop:
+                exit_bar, exit_price, reason = j, (min(sl, fill) if buy else max(sl, fill)), 'sl'
+                break
+            if take:
+                exit_bar, exit_price, reason = j, (max(tp, fill) if buy else min(tp, fill)), 'tp'
+                break
+        trades.append((bar, exit_bar, buy, entry, exit_price, reason,
+                       (exit_price - entry) if buy else (entry - exit_price)))
+        if sequential:
+            if reason == 'end':
+                break
+            bar = exit_bar + 1
+        else:
+            bar += every
+    return pd.DataFrame(trades, columns=['entry', 'exit', 'buy', 'entry_price', 'exit_price', 'reason', 'profit'])
+
+
+def candles(count, seed=0, gaps=0.0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.4, count))
+    open_ = np.r_[100.0, close[:-1]] + rng.normal(0, gaps, count)  # Opens away from the previous close
+    wick = np.abs(rng.normal(0, 0.3, (2, count)))
+    return pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=count, freq='min'),
+        'open': open_,
+        'high': np.maximum(open_, close) + wick[0],
+        'low': np.minimum(open_, close) - wick[1],
+        'close': close,
+    })
+
+
+def check(df, **params):
+    trades = backtest(df, lot_size=1.0, **params)
+    expected = reference(df, **params)
+    assert len(trades) == len(expected)
+    times = df['time'].to_numpy()
+    np.testing.assert_array_equal(trades['entry_time'], times[expected['entry']])
+    np.testing.assert_array_equal(trades['exit_time'], times[expected['exit']])
+    np.testing.assert_array_equal(trades['type'], np.where(expected['buy'], 'buy', 'sell'))
+    np.testing.assert_array_equal(trades['reason'], expected['reason'])
+    np.testing.assert_allclose(trades['entry_price'], expected['entry_price'])
+    np.testing.assert_allclose(trades['exit_price'], expected['exit_price'])
+    np.testing.assert_allclose(trades['profit'], expected['profit'], atol=1e-9)
+    return trades
+
+
+@pytest.mark.parametrize('direction', ['sell_first', 'buy_first', 'buy', 'sell'])
+@pytest.mark.parametrize('sequential', [True, False])
+def test_matches_bar_by_bar_replay(sequential, direction):
+    check(candles(600, seed=1), bars=4, sequential=sequential, direction=direction, spread=0.15)
+
+
+@pytest.mark.parametrize('sequential', [True, False])
+def test_gapped_opens_and_spread_per_bar(sequential):
+    df = candles(500, seed=2, gaps=0.8)
+    spread = np.abs(np.random.default_rng(5).normal(0.2, 0.1, len(df)))
+    trades = check(df, bars=3, sequential=sequential, spread=spread, max_percentage=0.004)
+    assert (trades['reason'] != 'end').sum() > 10
+
+
+def test_gap_through_the_level_fills_at_the_open():
+    df = pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=6, freq='min'),
+        'open': [100.0, 102.0, 100.0, 100.0, 90.0, 90.0],
+        'high': [100.5, 102.5, 100.5, 100.5, 90.5, 90.5],
+        'low': [99.5, 101.5, 99.5, 99.5, 89.5, 89.5],
+        'close': [100.0, 102.0, 100.0, 100.0, 90.0, 90.0],
+    })
+    # Variance of (100, 102, 100) is 8/9; the buy at 100 gaps down through its SL on bar 4
+    trades = check(df, bars=3, sequential=True, direction='buy')
+    first = trades.iloc[0]
+    assert first['reason'] == 'sl' and first['exit_price'] == 90.0
+    assert first['profit'] == pytest.approx(-10.0)
+
+
+def test_sell_levels_are_checked_at_the_ask():
+    df = pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=5, freq='min'),
+        'open': [100.0, 101.0, 100.0, 100.0, 100.0],
+        'high': [100.0, 101.0, 100.0, 100.2, 100.2],
+        'low': [100.0, 101.0, 100.0, 99.0, 99.0],
+        'close': [100.0, 101.0, 100.0, 100.0, 100.0],
+    })
+    distance = 2 / 9  # Variance of (100, 101, 100)
+    # The bid high of bar 3 stays below the SL, but bid + spread reaches it
+    trades = check(df, bars=3, sequential=True, direction='sell', spread=0.1)
+    assert trades.iloc[0]['reason'] == 'sl'
+    assert trades.iloc[0]['exit_price'] == pytest.approx(100.0 + distance)
+    assert check(df, bars=3, sequential=True, direction='sell', spread=0.0).iloc[0]['reason'] == 'tp'
+
+
+def test_bar_touching_both_levels_counts_as_the_stop():
+    df = pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=5, freq='min'),
+        'open': [100.0, 101.0, 100.0, 100.0, 100.0],
+        'high': [100.0, 101.0, 100.0, 105.0, 100.0],
+        'low': [100.0, 101.0, 100.0, 95.0, 100.0],
+        'close': [100.0, 101.0, 100.0, 100.0, 100.0],
+    })
+    for direction in ('buy', 'sell'):
+        trade = check(df, bars=3, sequential=True, direction=direction).iloc[0]
+        assert trade['reason'] == 'sl' and trade['profit'] < 0
+
+
+def test_first_touch_across_growing_horizons():
+    rng = np.random.default_rng(7)
+    high = rng.normal(0, 1, 300)
+    low = high - 0.5
+    start = rng.integers(0, 320, 50)
+    upper, lower = rng.uniform(1.5, 3.5, 50), rng.uniform(-3.5, -1.5, 50)
+    exit_bar, hit_upper, hit_lower = first_touch(high, low, start, upper, lower, horizon=4)
+    for k in range(50):
+        touched = [j for j in range(start[k], 300) if high[j] >= upper[k] or low[j] <= lower[k]]
+        expected = touched[0] if touched else -1
+        assert exit_bar[k] == expected
+        if touched:
+            assert hit_upper[k] == (high[expected] >= upper[k]) and hit_lower[k] == (low[expected] <= lower[k])
+
+
+def test_summary_of_no_trades():
+    assert summarize(backtest(candles(2), bars=3))['trades'] == 0
@@ -0,0 +1,162 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pandas as pd
+import pytest
+import binance_backfill
+from binance_backfill import KlineBackfill, RateLimiter
+from candle_store import CandleStore
+
+MINUTE_MS = 60 * 1000
+START_MS = 1_700_000_000_000 // MINUTE_MS * MINUTE_MS  # A whole minute
+
+
+class StubBinance:
+    """
+    Local klines endpoint serving one 1m kline per minute in ``available``
+    (open times in ms), recording every request. The first ``throttle``
+    requests are answered with HTTP 429 and Retry-After: 0.
+    """
+
+    def __init__(self, available, throttle=0):
+        self.available = sorted(available)
+        self.throttle = throttle
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                query = {name: values[0] for name, values in parse_qs(urlparse(self.path).query).items()}
+                stub.requests.append(query)
+                if stub.throttle > 0:
+                    stub.throttle -= 1
+                    self.send_response(429)
+                    self.send_header('Retry-After', '0')
+                    self.end_headers()
+                    return
+                start, end, limit = int(query['startTime']), int(query['endTime']), int(query['limit'])
+                rows = [[t, str(t % 1000 + 1.0), str(t % 1000 + 2.0), str(t % 1000), str(t % 1000 + 1.5), "3.0"]
+                        for t in stub.available if start <= t <= end][:limit]
+                body = json.dumps(rows).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    servers = []
+
+    def start(count, throttle=0, missing=()):
+        server = StubBinance([START_MS + i * MINUTE_MS for i in range(count) if i not in missing], throttle)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def minutes(df):
+    return list((df['time'].values.astype('datetime64[ms]').astype('int64') - START_MS) // MINUTE_MS)
+
+
+def end_of(count):
+    return START_MS + (count - 1) * MINUTE_MS
+
+
+def test_fetch_range_paginates(stub, monkeypatch, tmp_path):
+    monkeypatch.setattr(binance_backfill, 'PAGE_LIMIT', 10)
+    server = stub(35)
+    backfill = KlineBackfill(CandleStore(str(tmp_path)), base_url=server.url, max_workers=2)
+    df = backfill.fetch_range('BTCUSDT', '1m', START_MS, end_of(35))
+    assert minutes(df) == list(range(35))
+    assert sorted(int(r['startTime']) for r in server.requests) == [START_MS + i * 10 * MINUTE_MS for i in range(4)]
+    assert all(int(r['endTime']) - int(r['startTime']) < 10 * MINUTE_MS for r in server.requests)
+
+
+def test_throttled_request_is_retried(stub, tmp_path):
+    server = stub(5, throttle=2)
+    backfill = KlineBackfill(CandleStore(str(tmp_path)), base_url=server.url)
+    assert minutes(backfill.fetch_range('BTCUSDT', '1m', START_MS, end_of(5))) == list(range(5))
+    assert len(server.requests) == 3
+
+
+def test_rate_limiter_waits_for_the_window(monkeypatch):
+    clock = {'now': 1000.0, 'slept': []}
+
+    class FakeTime:
+        @staticmethod
+        def time():
+            return clock['now']
+
+        @staticmethod
+        def sleep(seconds):
+            clock['slept'].append(seconds)
+            clock['now'] += seconds
+
+    monkeypatch.setattr(binance_backfill, 'time', FakeTime)
+    limiter = RateLimiter(weight_per_minute=4)
+    limiter.acquire(2)
+    clock['now'] += 10
+    limiter.acquire(2)
+    assert clock['slept'] == []
+    limiter.acquire(2)  # Budget spent: waits until the first request leaves the window
+    assert clock['slept'] == [50.0]
+
+
+def test_load_fetches_only_head_and_tail(stub, tmp_path):
+    server = stub(30)
+    backfill = KlineBackfill(CandleStore(str(tmp_path)), base_url=server.url)
+    assert minutes(backfill.load('BTCUSDT', '1m', START_MS + 10 * MINUTE_MS, end_of(20))) == list(range(10, 20))
+
+    server.requests.clear()
+    df = backfill.load('BTCUSDT', '1m', START_MS, end_of(30))
+    assert minutes(df) == list(range(30))
+    starts = sorted(int(r['startTime']) for r in server.requests)
+    # Head in front of the cache, tail from the last cached (possibly forming) candle
+    assert starts == [START_MS, START_MS + 19 * MINUTE_MS]
+    assert minutes(backfill.store.read('btcusdt', '1m')) == list(range(30))
+
+
+def test_load_fills_interior_gaps(stub, tmp_path):
+    server = stub(30)
+    store = CandleStore(str(tmp_path))
+    complete = KlineBackfill(store, base_url=server.url).fetch_range('BTCUSDT', '1m', START_MS, end_of(30))
+    store.upsert('btcusdt', '1m', complete[~complete.index.isin([5, 6, 7, 20])])
+
+    backfill = KlineBackfill(store, base_url=server.url)
+    server.requests.clear()
+    df = backfill.load('BTCUSDT', '1m', START_MS + 6 * MINUTE_MS, end_of(30))
+    assert minutes(df) == list(range(6, 30))
+    starts = sorted(int(r['startTime']) for r in server.requests)
+    assert starts == [START_MS + 6 * MINUTE_MS, START_MS + 20 * MINUTE_MS, START_MS + 29 * MINUTE_MS]
+    # Minute 5 lies outside the requested range and stays missing
+    assert minutes(store.read('btcusdt', '1m')) == [m for m in range(30) if m != 5]
+    pd.testing.assert_frame_equal(df, complete.iloc[6:].reset_index(drop=True), check_dtype=False)
+
+
+def test_empty_gap_is_requested_once(stub, tmp_path):
+    server = stub(10, missing=(4, 5))  # A halt: the exchange has no klines there either
+    backfill = KlineBackfill(CandleStore(str(tmp_path)), base_url=server.url)
+    assert minutes(backfill.load('BTCUSDT', '1m', START_MS, end_of(10))) == [0, 1, 2, 3, 6, 7, 8, 9]
+
+    server.requests.clear()
+    backfill.load('BTCUSDT', '1m', START_MS, end_of(10))
+    backfill.load('BTCUSDT', '1m', START_MS, end_of(10))
+    gap_requests = [r for r in server.requests if int(r['startTime']) == START_MS + 4 * MINUTE_MS]
+    assert len(gap_requests) == 1
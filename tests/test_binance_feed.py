@@ -0,0 +1,68 @@
+import asyncio
+import json
+import pytest
+from binance_feed import KlineStreamConsumer
+
+STREAM = 'btcusdt@kline_1m'
+
+
+def message(t=1_700_000_040_000, close='101.5', **changes):
+    kline = {'t': t, 's': 'BTCUSDT', 'i': '1m', 'o': '100.0', 'h': '102.0', 'l': '99.0', 'c': close,
+             'v': '3.5', 'x': False}
+    kline.update(changes)
+    return json.dumps({'stream': STREAM, 'data': {'e': 'kline', 'k': kline}})
+
+
+@pytest.fixture
+def consumer():
+    received = []
+    consumer = KlineStreamConsumer('ws://unused', lambda stream, kline: received.append((stream, kline)),
+                                   queue_size=2)
+    consumer._queue = asyncio.Queue(maxsize=consumer.queue_size)
+    consumer.received = received
+    return consumer
+
+
+@pytest.mark.parametrize('bad', [
+    '{"stream": "btcusdt@kline_1m", "data": {"k": ',  # Truncated JSON
+    message(c='not a price'),
+    message(h=None),
+    json.dumps({'data': {'k': {'t': 1, 'o': '1', 'h': '1', 'l': '1', 'c': '1', 'v': '1', 'x': True}}}),  # No 's'/'i'
+    '[1, 2, 3]',
+])
+def test_malformed_messages_are_skipped(consumer, bad):
+    consumer._enqueue(bad)
+    consumer._enqueue(message())
+    assert consumer.stats['malformed'] == 1
+    assert consumer.stats['received'] == 2
+    assert consumer._queue.qsize() == 1
+
+
+def test_subscription_replies_are_ignored(consumer):
+    consumer._enqueue(json.dumps({'result': None, 'id': 1}))
+    assert consumer.stats['malformed'] == 0
+    assert consumer._queue.qsize() == 0
+
+
+def test_pending_candles_are_coalesced_and_the_oldest_dropped(consumer):
+    consumer._enqueue(message(t=1, close='1.0'))
+    consumer._enqueue(message(t=1, close='2.0'))
+    consumer._enqueue(message(t=2))
+    consumer._enqueue(message(t=3))
+    assert consumer.stats['coalesced'] == 1
+    assert consumer.stats['dropped'] == 1
+    assert list(consumer._pending) == [(STREAM, 2), (STREAM, 3)]
+
+
+def test_processing_continues_after_a_bad_message(consumer):
+    async def scenario():
+        processor = asyncio.create_task(consumer._process())
+        consumer._enqueue(message(t=1, close='1.0'))
+        consumer._enqueue('garbage')
+        consumer._enqueue(message(t=2, close='2.0'))
+        while consumer.stats['processed'] < 2:
+            await asyncio.sleep(0)
+        processor.cancel()
+
+    asyncio.run(scenario())
+    assert [kline['c'] for _, kline in consumer.received] == ['1.0', '2.0']
@@ -0,0 +1,47 @@
+import os
+import numpy as np
+from candle_archive import RATES_DTYPE, CandleArchive
+
+MINUTE = 60
+
+
+def bars(start, count, close=1.0):
+    rates = np.zeros(count, dtype=RATES_DTYPE)
+    rates['time'] = (start + np.arange(count)) * MINUTE
+    rates['close'] = close
+    return rates
+
+
+def minutes(rates):
+    return list(rates['time'] // MINUTE)
+
+
+def test_forming_bar_is_overwritten_and_new_bars_appended(tmp_path):
+    archive = CandleArchive(str(tmp_path))
+    assert archive.upsert('BTCUSD', 1, bars(0, 5)) == 5
+    assert archive.upsert('BTCUSD', 1, bars(4, 3, close=2.0)) == 3
+    rates = archive.tail('BTCUSD', 1, 100)
+    assert minutes(rates) == list(range(7))
+    assert list(rates['close']) == [1.0] * 4 + [2.0] * 3
+
+
+def test_already_archived_older_bars_are_skipped(tmp_path):
+    archive = CandleArchive(str(tmp_path))
+    archive.upsert('BTCUSD', 1, bars(0, 10))
+    assert archive.upsert('BTCUSD', 1, bars(5, 6, close=2.0)) == 2
+    rates = archive.tail('BTCUSD', 1, 100)
+    assert minutes(rates) == list(range(11))
+    assert list(rates['close'][:9]) == [1.0] * 9
+
+
+def test_older_block_is_merged_in_front(tmp_path):
+    archive = CandleArchive(str(tmp_path))
+    archive.upsert('BTCUSD', 1, bars(10, 5))
+    assert archive.tail('BTCUSD', 1, 100) is not None  # Keep a mapping open across the rewrite
+    archive.upsert('BTCUSD', 1, bars(0, 12, close=2.0))
+    rates = archive.tail('BTCUSD', 1, 100)
+    assert minutes(rates) == list(range(15))
+    assert list(rates['close']) == [2.0] * 12 + [1.0] * 3
+    assert archive.count('BTCUSD', 1) == 15
+    assert minutes(CandleArchive(str(tmp_path)).tail('BTCUSD', 1, 100)) == list(range(15))
+    assert not any(name.endswith('.tmp') for name in os.listdir(tmp_path))
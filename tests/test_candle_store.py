@@ -0,0 +1,96 @@
+import os
+import threading
+import pandas as pd
+import pytest
+from candle_store import CandleStore
+
+
+def frame(start, closes, volume_column='tick_volume'):
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=len(closes), freq='min'),
+        'open': closes,
+        'high': closes,
+        'low': closes,
+        'close': closes,
+        volume_column: [1] * len(closes),
+    })
+
+
+def test_upsert_appends_new_bars_and_rewrites_the_forming_one(tmp_path):
+    store = CandleStore(str(tmp_path))
+    assert store.upsert('BTCUSD', 1, frame('2024-01-01', [1.0, 2.0, 3.0])) == 3
+    assert store.upsert('BTCUSD', 1, frame('2024-01-01 00:02', [3.5, 4.0])) == 2
+    assert store.upsert('BTCUSD', 1, frame('2024-01-01 00:02', [3.5, 4.0])) == 0
+
+    df = store.read('BTCUSD', 1)
+    assert df['close'].tolist() == [1.0, 2.0, 3.5, 4.0]
+    assert df['time'].is_monotonic_increasing
+
+
+def test_state_is_reloaded_from_disk(tmp_path):
+    CandleStore(str(tmp_path)).upsert('BTCUSD', 1, frame('2024-01-01', [1.0, 2.0]))
+    store = CandleStore(str(tmp_path))
+    store.upsert('BTCUSD', 1, frame('2024-01-01 00:01', [2.5, 3.0]))
+    assert store.read('BTCUSD', 1)['close'].tolist() == [1.0, 2.5, 3.0]
+
+
+def test_reordered_columns_are_stored_in_the_file_layout(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.upsert('BTCUSD', 1, frame('2024-01-01', [1.0]))
+    df = frame('2024-01-01 00:01', [2.0])
+    store.upsert('BTCUSD', 1, df[['time', 'close', 'open', 'high', 'low', 'tick_volume']])
+    assert store.read('BTCUSD', 1)['close'].tolist() == [1.0, 2.0]
+
+
+def test_a_different_column_set_is_rejected(tmp_path):
+    store = CandleStore(str(tmp_path))
+    store.upsert('BTCUSD', 1, frame('2024-01-01', [1.0]))
+    with pytest.raises(ValueError, match='do not match'):
+        store.upsert('BTCUSD', 1, frame('2024-01-01 00:01', [2.0], volume_column='volume'))
+
+
+def test_import_csv_keeps_the_newest_copy_of_every_bar(tmp_path):
+    legacy = pd.concat([frame('2024-01-01', [1.0, 2.0]), frame('2024-01-01 00:01', [2.5, 3.0])])
+    path = tmp_path / 'legacy.csv'
+    legacy.to_csv(path, index=False)
+    store = CandleStore(str(tmp_path / 'candles'))
+    store.import_csv(str(path), 'BTCUSD', 1)
+    assert store.read('BTCUSD', 1)['close'].tolist() == [1.0, 2.5, 3.0]
+
+
+def test_writers_sharing_a_file_take_turns(tmp_path):
+    # Two pollers of the same feed, as print_price.py and tkinter_plotchart_storedata_csv.py
+    closes = [float(i) for i in range(60)]
+    stores = [CandleStore(str(tmp_path)), CandleStore(str(tmp_path))]
+
+    def poll(store):
+        for i in range(len(closes)):
+            window = frame('2024-01-01', closes[:i + 1])
+            store.upsert('BTCUSD', 1, window.iloc[-5:])
+
+    threads = [threading.Thread(target=poll, args=(store,)) for store in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    df = stores[0].read('BTCUSD', 1)
+    assert df['close'].tolist() == closes
+    assert df['time'].is_unique
+
+
+def test_a_changed_file_is_reloaded_before_writing(tmp_path):
+    first, second = CandleStore(str(tmp_path)), CandleStore(str(tmp_path))
+    first.upsert('BTCUSD', 1, frame('2024-01-01', [1.0, 2.0]))
+    second.upsert('BTCUSD', 1, frame('2024-01-01 00:01', [2.5, 3.0]))
+    first.upsert('BTCUSD', 1, frame('2024-01-01 00:02', [3.5]))
+    assert first.read('BTCUSD', 1)['close'].tolist() == [1.0, 2.5, 3.5]
+
+
+def test_replace_swaps_the_file_in_one_step(tmp_path):
+    store, other = CandleStore(str(tmp_path)), CandleStore(str(tmp_path))
+    store.upsert('BTCUSD', 1, frame('2024-01-01 00:05', [5.0, 6.0]))
+    other.read('BTCUSD', 1)
+    store.replace('BTCUSD', 1, pd.concat([frame('2024-01-01', [0.0, 1.0]), store.read('BTCUSD', 1)]))
+    assert not os.path.exists(store.path('BTCUSD', 1) + '.tmp')
+    other.upsert('BTCUSD', 1, frame('2024-01-01 00:06', [6.5, 7.0]))
+    assert store.read('BTCUSD', 1)['close'].tolist() == [0.0, 1.0, 5.0, 6.5, 7.0]
@@ -0,0 +1,83 @@
+import json
+import numpy as np
+import pandas as pd
+from dash import no_update
+from plotly.io.json import to_json_plotly
+from figure_builder import VOLUME_TRACE, build_figure
+from figure_patch import build_patch, chart_state
+
+
+def frame(bars, start='2024-01-01'):
+    close = 100 + np.arange(bars, dtype=np.float64)
+    return pd.DataFrame({
+        'time': pd.date_range(start, periods=bars, freq='min'),
+        'open': close - 0.5,
+        'high': close + 1,
+        'low': close - 1,
+        'close': close,
+        'tick_volume': np.arange(bars) + 10,
+    })
+
+
+def apply(figure, patch):
+    # The browser's handling of the Patch operations dash sends
+    for op in patch.to_plotly_json()['operations']:
+        *path, last = op['location']
+        target = figure
+        for part in path:
+            target = target[part]
+        if op['operation'] == 'Assign':
+            target[last] = op['params']['value']
+        elif op['operation'] == 'Extend':
+            target[last].extend(op['params']['value'])
+        elif op['operation'] == 'Delete':
+            del target[last]
+    return figure
+
+
+def sent(figure):
+    # What the browser receives: the figure through plotly's JSON encoder, as dash sends it
+    return json.loads(to_json_plotly(figure))
+
+
+def test_figure_arrays_stay_lists_through_the_json_encoder():
+    # plotly >= 6 encodes NumPy-backed trace data as base64 typed arrays, which a patch cannot index
+    figure = sent(build_figure(frame(5), 'Chart', show_volume=True))
+    for trace in figure['data']:
+        for name in ('x', 'open', 'high', 'low', 'close', 'y'):
+            if name in trace:
+                assert isinstance(trace[name], list), (trace['type'], name)
+
+
+def test_patched_figure_matches_a_rebuilt_one():
+    df = frame(12)
+    view = ['M1', True]
+    old = df.iloc[:10].copy()
+    figure = sent(build_figure(old, 'Chart', show_volume=True))
+    state = chart_state(old, view)
+
+    new = df.iloc[2:].copy()  # The forming bar moved, two bars opened, two dropped off the front
+    new.loc[new.index[7], 'close'] += 0.25
+    patch, new_state = build_patch(new, state, view, volume_index=VOLUME_TRACE, window=10)
+    patched = apply(figure, patch)
+    rebuilt = sent(build_figure(new, 'Chart', show_volume=True))
+
+    for index in (0, VOLUME_TRACE):
+        for name in ('x', 'open', 'high', 'low', 'close', 'y'):
+            if name in rebuilt['data'][index]:
+                assert patched['data'][index][name] == rebuilt['data'][index][name]
+    assert patched['layout']['shapes'][0]['y0'] == rebuilt['layout']['shapes'][0]['y0']
+    assert new_state['count'] == 10
+
+
+def test_unchanged_bar_and_view_change():
+    df = frame(5)
+    state = chart_state(df, ['M1', False])
+    assert build_patch(df, state, ['M1', False]) == (no_update, no_update)
+    assert build_patch(df, state, ['M5', False]) == (None, None)
+
+
+def test_figure_carries_its_event_stream():
+    assert 'meta' not in build_figure(frame(3), 'Chart')['layout']
+    figure = sent(build_figure(frame(3), 'Chart', stream='/updates/BTCUSD/1'))
+    assert figure['layout']['meta'] == {'stream': '/updates/BTCUSD/1'}
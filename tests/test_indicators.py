@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+from indicators import ATR, EMA, MACD, RSI, SMA, VWAP, BollingerBands, IndicatorSet
+
+
+def make_set(capacity=300):
+    return IndicatorSet({
+        'SMA 20': SMA(20), 'EMA 50': EMA(50), 'RSI 14': RSI(14), 'ATR 14': ATR(14),
+        'BB 20': BollingerBands(20, 2.0), 'VWAP': VWAP(session=3600), 'MACD': MACD(),
+    }, capacity=capacity)
+
+
+def bars(count, seed=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.3, count))
+    open_ = np.r_[100.0, close[:-1]]
+    return {
+        'times': 1_700_000_000 // 60 * 60 + np.arange(count, dtype=np.int64) * 60,
+        'open': open_,
+        'high': np.maximum(open_, close) + rng.uniform(0, 0.2, count),
+        'low': np.minimum(open_, close) - rng.uniform(0, 0.2, count),
+        'close': close,
+        'volume': rng.integers(1, 50, count).astype(np.float64),
+    }
+
+
+def window(data, lo, hi, forming=None):
+    # The chart's window of bars [lo, hi), its last bar replaced by a forming version
+    arrays = [data[name][lo:hi].copy() for name in ('times', 'open', 'high', 'low', 'close', 'volume')]
+    if forming is not None:
+        for array, value in zip(arrays[1:], forming):
+            array[-1] = value
+    return arrays
+
+
+def test_streaming_matches_a_warm_up_of_the_whole_history():
+    data = bars(400, seed=1)
+    streamed = make_set()
+    streamed.feed(*window(data, 0, 120))
+    rng = np.random.default_rng(2)
+    for hi in range(121, 401):
+        # A few ticks of the forming bar, then its final values with the next poll
+        for _ in range(2):
+            o, h, l, c, v = (data[name][hi - 1] for name in ('open', 'high', 'low', 'close', 'volume'))
+            tick = c + rng.normal(0, 0.1)
+            streamed.feed(*window(data, max(hi - 100, 0), hi, (o, max(h, tick), min(l, tick), tick, v / 2)))
+        streamed.feed(*window(data, max(hi - 100, 0), hi))
+
+    warmed = make_set()
+    warmed.warm_up(*window(data, 0, 400))
+    times = data['times'][-250:]
+    expected, actual = warmed.values(times), streamed.values(times)
+    assert list(actual) == warmed.columns
+    for column in warmed.columns:
+        np.testing.assert_allclose(actual[column], expected[column], rtol=1e-9, atol=1e-9, err_msg=column)
+
+
+def test_warm_up_matches_pandas():
+    data = bars(200, seed=3)
+    indicators = make_set()
+    indicators.warm_up(*window(data, 0, 200))
+    values = indicators.values(data['times'])
+    close = pd.Series(data['close'])
+    np.testing.assert_allclose(values['SMA 20'], close.rolling(20).mean(), equal_nan=True)
+    np.testing.assert_allclose(values['EMA 50'][49:], close.ewm(span=50, adjust=False).mean()[49:])
+    middle = close.rolling(20).mean()
+    np.testing.assert_allclose(values['BB 20 upper'], middle + 2 * close.rolling(20).std(ddof=0), equal_nan=True)
+
+
+def test_gap_in_the_window_warms_up_again():
+    data = bars(300, seed=4)
+    indicators = make_set()
+    indicators.feed(*window(data, 0, 100))
+    indicators.feed(*window(data, 200, 300))  # Starts after the last bar seen: nothing to stream from
+    assert indicators.last_time() == data['times'][299]
+    fresh = make_set()
+    fresh.warm_up(*window(data, 200, 300))
+    np.testing.assert_array_equal(indicators.values(data['times'][200:])['SMA 20'],
+                                  fresh.values(data['times'][200:])['SMA 20'])
+
+
+def test_ring_keeps_the_last_capacity_values():
+    data = bars(50, seed=5)
+    indicators = make_set(capacity=10)
+    indicators.feed(*window(data, 0, 20))
+    for hi in range(21, 51):
+        indicators.feed(*window(data, hi - 20, hi))
+    assert len(indicators) == 10
+    values = indicators.values(data['times'])
+    assert np.isnan(values['SMA 20'][:40]).all()
+    assert not np.isnan(values['SMA 20'][40:]).any()
+    assert values['SMA 20'][-1] == pytest.approx(data['close'][-20:].mean())
+
+
+def test_overlays_and_panels():
+    indicators = make_set()
+    assert indicators.overlays() == ['SMA 20', 'EMA 50', 'BB 20', 'VWAP']
+    assert indicators.panels() == ['RSI 14', 'ATR 14', 'MACD']
+    assert indicators.columns_of(['MACD', 'unknown']) == ['MACD macd', 'MACD signal', 'MACD histogram']
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import mt5_sim
+
+mt5_sim.install()  # incremental_fetch imports MetaTrader5
+from candle_archive import RATES_DTYPE  # noqa: E402
+from market_data_service import MarketDataService  # noqa: E402
+
+M1, H1, D1, W1, MN1 = 1, 16385, 16408, 32769, 49153
+
+
+class FakeFetcher:
+    """
+    Serves a window of synthetic bars per timeframe and records what was polled.
+    """
+
+    def __init__(self, end=1_700_000_000):
+        self.end = end
+        self.polled = []
+
+    def fetch(self, symbol, timeframe, count=100):
+        self.polled.append((timeframe, count))
+        width = {M1: 60, H1: 3600, D1: 86400, W1: 7 * 86400, MN1: 30 * 86400}[timeframe]
+        rates = np.zeros(count, dtype=RATES_DTYPE)
+        rates['time'] = (self.end // width - np.arange(count)[::-1]) * width
+        rates['open'] = rates['close'] = 100.0 + np.arange(count)
+        rates['high'] = rates['open'] + 1
+        rates['low'] = rates['open'] - 1
+        rates['tick_volume'] = 1
+        return rates
+
+    def reset(self, symbol=None, timeframe=None):
+        pass
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = MarketDataService(base_timeframe=M1, max_base_bars=2000)
+    service._fetcher = FakeFetcher()
+    monkeypatch.setattr(service, 'start', lambda: None)  # Polled by hand
+    return service
+
+
+def test_intraday_timeframe_is_derived_from_the_base(service):
+    service.subscribe('BTCUSD', H1, 10)
+    service.poll_once()
+    assert [timeframe for timeframe, _ in service._fetcher.polled] == [M1]
+    assert service._fetcher.polled[0][1] == 600
+    snapshot = service.snapshot('BTCUSD', H1)
+    assert len(snapshot.rates) == 10
+    assert (np.diff(snapshot.rates['time']) == 3600).all()
+
+
+@pytest.mark.parametrize('timeframe', [W1, MN1])
+def test_week_and_month_are_polled_directly(service, timeframe):
+    service.subscribe('BTCUSD', timeframe, 10)
+    service.poll_once()
+    assert service._fetcher.polled == [(timeframe, 10)]
+    assert service._subscriptions[('BTCUSD', timeframe)]['base'] is None
+
+
+def test_window_beyond_the_base_cap_is_polled_directly(service):
+    service.subscribe('BTCUSD', H1, 10)
+    service.subscribe('BTCUSD', H1, 100)  # 6000 M1 bars would exceed max_base_bars
+    service._fetcher.polled.clear()
+    service.poll_once()
+    assert (H1, 100) in service._fetcher.polled
+    snapshot = service.snapshot('BTCUSD', H1)
+    assert len(snapshot.rates) == 100
@@ -0,0 +1,88 @@
+import threading
+from datetime import datetime, timezone
+import numpy as np
+import pytest
+import mt5_sim
+from candle_archive import RATES_DTYPE
+from mt5_sim import SimulatedTerminal, bar_starts
+
+START = int(datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp())  # A Monday
+
+
+def m1_bars(count, start=START, skip=()):
+    # Rising M1 bars, one per minute except the ``skip`` indices
+    index = np.array([i for i in range(count) if i not in set(skip)])
+    rates = np.zeros(len(index), dtype=RATES_DTYPE)
+    rates['time'] = start + index * 60
+    rates['open'] = 100.0 + index * 0.1
+    rates['close'] = rates['open'] + 0.1
+    rates['high'] = rates['close'] + 0.05
+    rates['low'] = rates['open'] - 0.05
+    rates['tick_volume'] = 10
+    rates['spread'] = 10
+    return rates
+
+
+def terminal(rates, at):
+    sim = SimulatedTerminal(start=at, speed=0)
+    sim.add_symbol('TEST', rates)
+    sim.initialize()
+    return sim
+
+
+def test_weeks_open_on_sunday_and_months_on_the_first():
+    times = np.array([START, START + 5 * 86400, int(datetime(2024, 2, 29, 13, tzinfo=timezone.utc).timestamp())])
+    weeks = bar_starts(times, mt5_sim.TIMEFRAME_W1)
+    assert [datetime.fromtimestamp(t, timezone.utc).weekday() for t in weeks] == [6, 6, 6]
+    assert list(weeks[:2]) == [START - 86400] * 2
+    months = bar_starts(times, mt5_sim.TIMEFRAME_MN1)
+    assert [datetime.fromtimestamp(t, timezone.utc).date().isoformat() for t in months] == \
+        ['2024-01-01', '2024-01-01', '2024-02-01']
+
+
+def test_weekly_bars_match_the_m1_history():
+    rates = m1_bars(21 * 1440)
+    sim = terminal(rates, START + 21 * 1440 * 60)
+    weeks = sim.copy_rates_from_pos('TEST', mt5_sim.TIMEFRAME_W1, 0, 2)
+    assert [datetime.fromtimestamp(t, timezone.utc).weekday() for t in weeks['time']] == [6, 6]
+    for bar in weeks:
+        inside = rates[(rates['time'] >= bar['time']) & (rates['time'] < bar['time'] + 7 * 86400)]
+        assert bar['open'] == inside['open'][0] and bar['close'] == inside['close'][-1]
+        assert bar['high'] == inside['high'].max() and bar['low'] == inside['low'].min()
+        assert bar['tick_volume'] == inside['tick_volume'].sum()
+
+
+def test_gaps_do_not_shorten_the_window():
+    rates = m1_bars(48 * 60, skip=range(10 * 60, 30 * 60))  # 20 hours without bars
+    sim = terminal(rates, START + 48 * 60 * 60)
+    hours = sim.copy_rates_from_pos('TEST', mt5_sim.TIMEFRAME_H1, 0, 20)
+    assert len(hours) == 20
+    assert (hours['time'] % 3600 == 0).all()
+    assert hours['time'][0] == START + 8 * 3600  # Bars 8 and 9 come from before the gap
+    assert list(sim.copy_rates_from_pos('TEST', mt5_sim.TIMEFRAME_H1, 2, 18)) == list(hours[:18])
+
+
+@pytest.mark.parametrize('target, reason', [('tp', mt5_sim.DEAL_REASON_TP), ('sl', mt5_sim.DEAL_REASON_SL)])
+def test_stop_exits_carry_their_deal_reason(target, reason):
+    sim = terminal(m1_bars(600), START + 60 * 60)
+    tick = sim.symbol_info_tick('TEST')
+    level = {'tp': dict(tp=tick.bid + 1.0), 'sl': dict(sl=tick.bid + 0.5, type=mt5_sim.ORDER_TYPE_SELL)}[target]
+    request = dict(action=mt5_sim.TRADE_ACTION_DEAL, symbol='TEST', volume=0.1, type=mt5_sim.ORDER_TYPE_BUY)
+    request.update(level)
+    assert sim.order_send(request).retcode == mt5_sim.TRADE_RETCODE_DONE
+    sim.clock.advance(60 * 60)  # Prices rise 6.0 an hour
+    assert sim.positions_get() == ()
+    opened, closed = sim.history_deals_get()
+    assert opened.reason == mt5_sim.DEAL_REASON_EXPERT
+    assert closed.reason == reason and closed.entry == mt5_sim.DEAL_ENTRY_OUT
+
+
+def test_calls_are_counted_under_the_lock():
+    sim = terminal(m1_bars(600), START + 60 * 60)
+    threads = [threading.Thread(target=lambda: [sim.symbol_info_tick('TEST') for _ in range(200)])
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sim.calls['symbol_info_tick'] == 800
@@ -0,0 +1,52 @@
+import json
+import dash
+from dash import dcc, html
+import pytest
+from push_updates import UpdateChannel, add_event_stream, push_url
+
+
+@pytest.fixture
+def setup():
+    app = dash.Dash(__name__)
+    app.layout = html.Div([dcc.Store(id='push-url'), dcc.Store(id='push-event')])
+    channel = UpdateChannel()
+    subscribed = []
+    add_event_stream(app, channel, [('BTCUSD', 1), ('BTCUSD', 16385)], max_streams=1,
+                     on_wait=lambda symbol, timeframe: subscribed.append((symbol, timeframe)))
+    return app.server.test_client(), channel, subscribed
+
+
+def first_event(response):
+    chunk = next(iter(response.response))
+    return json.loads(chunk.decode().removeprefix('data: '))
+
+
+def test_configured_stream_sends_the_current_version(setup):
+    client, channel, _ = setup
+    channel.publish('BTCUSD', 1)
+    response = client.get(push_url('BTCUSD', 1), buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert first_event(response) == {'version': 1, 'stream': push_url('BTCUSD', 1)}
+    response.close()
+
+
+@pytest.mark.parametrize('url', [push_url('DOGEUSD', 1), push_url('BTCUSD', 5), push_url('BTCUSD', 'x')])
+def test_unknown_pairs_are_not_found(setup, url):
+    client, _, subscribed = setup
+    response = client.get(url, buffered=False)
+    assert response.status_code == 404
+    assert subscribed == []
+
+
+def test_streams_are_limited_and_released_on_close(setup):
+    client, _, _ = setup
+    first = client.get(push_url('BTCUSD', 1), buffered=False)
+    assert first.status_code == 200
+    refused = client.get(push_url('BTCUSD', 16385), buffered=False)
+    assert refused.status_code == 503
+    assert 'Retry-After' in refused.headers
+    first.close()
+    again = client.get(push_url('BTCUSD', 16385), buffered=False)
+    assert again.status_code == 200
+    again.close()
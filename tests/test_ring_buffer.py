@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+from ring_buffer import CandleRingBuffer
+
+
+def candle(t):
+    return (t, t + 0.5, t + 1.0, t - 1.0, t + 0.25, 10.0 * t)
+
+
+def test_window_stays_ordered_and_contiguous_across_wraps():
+    buffer = CandleRingBuffer(capacity=4)
+    for t in range(1, 12):
+        buffer.append(*candle(t))
+        times, columns = buffer.view()
+        expected = list(range(max(t - 3, 1), t + 1))
+        assert list(times) == expected
+        assert list(columns['close']) == [e + 0.25 for e in expected]
+        assert times.base is buffer.time  # A view into the doubled storage, not a copy
+
+
+def test_upsert_overwrites_the_forming_candle_and_ignores_older_ones():
+    buffer = CandleRingBuffer(capacity=3)
+    assert buffer.upsert(*candle(1))
+    assert buffer.upsert(*candle(2))
+    assert not buffer.upsert(2, 9.0, 9.0, 9.0, 9.0, 9.0)
+    assert not buffer.upsert(*candle(1))
+    times, columns = buffer.view()
+    assert list(times) == [1, 2]
+    assert list(columns['open']) == [1.5, 9.0]
+
+
+def test_update_last_on_an_empty_buffer():
+    with pytest.raises(IndexError):
+        CandleRingBuffer().update_last(*candle(1))
+
+
+def test_extend_keeps_the_newest_rows():
+    buffer = CandleRingBuffer(capacity=5)
+    buffer.append(*candle(0))
+    df = pd.DataFrame({
+        'time': pd.to_datetime(np.arange(1, 9), unit='ms'),
+        'open': np.arange(1, 9) + 0.5, 'high': np.arange(1, 9) + 1.0, 'low': np.arange(1, 9) - 1.0,
+        'close': np.arange(1, 9) + 0.25, 'volume': np.arange(1, 9) * 10.0,
+    })
+    buffer.extend(df)
+    assert len(buffer) == 5
+    frame = buffer.to_frame(volume_column='tick_volume')
+    assert list(frame.columns) == ['time', 'open', 'high', 'low', 'close', 'tick_volume']
+    pd.testing.assert_frame_equal(frame, df.iloc[3:].rename(columns={'volume': 'tick_volume'}).reset_index(drop=True),
+                                  check_dtype=False)
+    buffer.append(*candle(9))
+    assert list(buffer.view()[0]) == [5, 6, 7, 8, 9]
+
+
+def test_to_frame_copies_the_values():
+    buffer = CandleRingBuffer(capacity=2, time_unit='s')
+    buffer.append(*candle(60))
+    frame = buffer.to_frame()
+    buffer.update_last(60, 0.0, 0.0, 0.0, 0.0, 0.0)
+    assert frame['close'].iloc[0] == 60.25
+    assert frame['time'].iloc[0] == pd.Timestamp(60, unit='s')
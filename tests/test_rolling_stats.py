@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from candle_archive import RATES_DTYPE
+from rolling_stats import RollingStats, RollingStatsService
+
+
+def closes(count, seed=0, level=60000.0):
+    # A high price level with small moves is where a naive running variance loses precision
+    return level + np.cumsum(np.random.default_rng(seed).normal(0, 0.5, count))
+
+
+@pytest.mark.parametrize('bars', [2, 3, 10])
+def test_streamed_bars_match_np_var(bars):
+    close = closes(3000, seed=bars)
+    stats = RollingStats(bars)
+    ticks = np.random.default_rng(1).normal(0, 0.2, 3)
+    for i, price in enumerate(close):
+        for tick in ticks:  # The forming bar changes a few times before it closes
+            stats.update(i * 60, price, price, price, price + tick)
+        mean, variance = stats.update(i * 60, price, price, price, price)
+        window = close[max(i + 1 - bars, 0):i + 1]
+        if i + 1 < bars:
+            assert np.isnan(variance)
+            continue
+        assert mean == pytest.approx(window.mean(), rel=1e-12)
+        assert variance == pytest.approx(np.var(window), rel=1e-6, abs=1e-9)
+
+
+def test_warm_up_matches_pandas_and_continues_streaming():
+    close = closes(500, seed=4)
+    times = np.arange(len(close)) * 60
+    stats = RollingStats(5)
+    means, variances = stats.warm_up(times[:400], close[:400], close[:400], close[:400], close[:400],
+                                     np.zeros(400))
+    expected = [np.var(close[i - 4:i + 1]) for i in range(4, 400)]
+    np.testing.assert_allclose(variances[4:], expected, rtol=1e-6, atol=1e-9)  # pandas also rolls its sums
+    assert np.isnan(variances[:4]).all()
+    for i in range(399, 500):  # Bar 399 is still forming after the warm-up
+        _, variance = stats.update(times[i], close[i], close[i], close[i], close[i])
+        assert variance == pytest.approx(np.var(close[i - 4:i + 1]), rel=1e-6, abs=1e-9)
+
+
+class FakeMarketData:
+    def __init__(self):
+        self.listeners = []
+        self.subscribed = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def subscribe(self, symbol, timeframe, count=100):
+        self.subscribed.append((symbol, timeframe, count))
+
+    def publish(self, symbol, timeframe, close):
+        rates = np.zeros(len(close), dtype=RATES_DTYPE)
+        rates['time'] = np.arange(len(close)) * 60
+        rates['open'] = rates['high'] = rates['low'] = rates['close'] = close
+        for listener in self.listeners:
+            listener(symbol, timeframe, rates)
+
+
+def test_service_serves_the_latest_window():
+    market_data = FakeMarketData()
+    service = RollingStatsService(market_data, windows=(3, 5))
+    service.track('BTCUSD', 1)
+    assert market_data.subscribed == [('BTCUSD', 1, 6)]
+    close = closes(20, seed=2)
+    market_data.publish('BTCUSD', 1, close[:10])
+    market_data.publish('BTCUSD', 1, close[5:20])
+    mean, variance = service.stats('BTCUSD', 1, 3, timeout=0)
+    assert mean == pytest.approx(close[-3:].mean())
+    assert variance == pytest.approx(np.var(close[-3:]))
+    assert service.variance('BTCUSD', 1, 5, timeout=0) == pytest.approx(np.var(close[-5:]))
+    with pytest.raises(ValueError):
+        service.stats('BTCUSD', 1, 4)
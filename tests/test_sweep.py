@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from backtester import backtest, summarize
+from sweep import grid, random_search, sweep
+
+LOT_SIZES = (0.01, 0.1)
+
+
+@pytest.fixture(scope='module')
+def candles():
+    rng = np.random.default_rng(3)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, 400))
+    open_ = np.r_[close[0], close[:-1]]
+    spread = np.abs(rng.normal(0, 0.3, 400))
+    return pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=400, freq='min'),
+        'open': open_,
+        'high': np.maximum(open_, close) + spread,
+        'low': np.minimum(open_, close) - spread,
+        'close': close,
+    })
+
+
+@pytest.fixture(scope='module')
+def results(candles):
+    space = {'bars': [3, 5], 'max_percentage': [None, 0.005], 'sequential': [True, False], 'direction': ['sell_first']}
+    return sweep(candles, grid(space), lot_sizes=LOT_SIZES, workers=1, spread=0.1)
+
+
+def test_one_row_per_parameter_set_and_lot_size(results):
+    assert len(results) == 8 * len(LOT_SIZES)
+    for lot in LOT_SIZES:
+        rows = results[np.isclose(results['lot_size'], lot)]
+        np.testing.assert_allclose(rows['total_profit'], rows['profit_per_lot'] * lot, rtol=1e-5, atol=1e-6)
+
+
+def test_ranked_by_profit_per_lot_not_lot_size(results):
+    assert results['profit_per_lot'].is_monotonic_decreasing
+    # The rows of one parameter set stay together, smallest lot first
+    sets = results[['bars', 'max_percentage', 'sequential']].astype(float).fillna(-1).to_numpy()
+    assert (sets[::2] == sets[1::2]).all()
+    assert (results['lot_size'].iloc[::2].to_numpy() < results['lot_size'].iloc[1::2].to_numpy()).all()
+
+
+def test_matches_a_direct_backtest(candles, results):
+    best = results.iloc[0]
+    max_percentage = None if np.isnan(best['max_percentage']) else float(best['max_percentage'])
+    expected = summarize(backtest(candles, bars=int(best['bars']), sequential=bool(best['sequential']),
+                                  max_percentage=max_percentage, direction=best['direction'],
+                                  lot_size=float(best['lot_size']), spread=0.1))
+    assert best['trades'] == expected['trades']
+    assert best['total_profit'] == pytest.approx(expected['total_profit'], rel=1e-5, abs=1e-6)
+
+
+def test_random_search_draws_from_lists_and_ranges():
+    draws = random_search(20, {'bars': (2, 4), 'max_percentage': (0.001, 0.002), 'sequential': [True, False]}, seed=1)
+    assert len(draws) == 20
+    assert all(2 <= d['bars'] <= 4 and isinstance(d['bars'], int) for d in draws)
+    assert all(0.001 <= d['max_percentage'] <= 0.002 for d in draws)
+    assert {d['sequential'] for d in draws} == {True, False}
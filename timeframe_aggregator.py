@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from ring_buffer import CandleRingBuffer, COLUMNS
+from timeframes import timeframe_seconds
+
+TIME_UNITS = {'s': 1, 'ms': 1000}
+
+
+def resample_ohlcv(times, open_, high, low, close, volume, width):
+    """
+    Vectorized OHLCV resampling of sorted bars into buckets of ``width`` (same
+    unit as ``times``): first open, max high, min low, last close, summed volume.
+    Buckets start at multiples of ``width``. Returns (times, open, high, low, close, volume).
+    """
+    times = np.asarray(times)
+    if len(times) == 0:
+        empty = np.empty(0)
+        return times[:0], empty, empty, empty, empty, empty
+    buckets = times - times % width
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    return (
+        buckets[starts],
+        np.asarray(open_)[starts],
+        np.maximum.reduceat(np.asarray(high), starts),
+        np.minimum.reduceat(np.asarray(low), starts),
+        np.asarray(close)[ends],
+        np.add.reduceat(np.asarray(volume, dtype=np.float64), starts),
+    )
+
+
+class TimeframeAggregator:
+    """
+    Derives higher-timeframe candles locally from a single base feed.
+
+    Every target timeframe keeps its own CandleRingBuffer plus the running
+    aggregate of the closed base bars in its current bucket. A base update
+    (forming or newly opened base bar) is folded in with O(1) work per target,
+    so switching the chart between timeframes needs no I/O. ``backfill``
+    rebuilds every target from base history with vectorized resampling.
+    """
+
+    def __init__(self, base, targets, capacity=500, time_unit='ms'):
+        self.base = base
+        self.capacity = capacity
+        self.time_unit = time_unit
+        scale = TIME_UNITS[time_unit]
+        self.widths = {}
+        for target in targets:
+            width = timeframe_seconds(target)
+            if width % timeframe_seconds(base) or width <= timeframe_seconds(base):
+                raise ValueError(f"Cannot derive {target} from {base}")
+            self.widths[target] = width * scale
+        self.buffers = {target: CandleRingBuffer(capacity, time_unit) for target in self.widths}
+        self._state = {target: None for target in self.widths}  # bucket, closed aggregate, forming base bar
+
+    def buffer(self, timeframe):
+        return self.buffers[timeframe]
+
+    @staticmethod
+    def _combine(agg, bar):
+        if agg is None:
+            return bar
+        return (agg[0], max(agg[1], bar[1]), min(agg[2], bar[2]), bar[3], agg[4] + bar[4])
+
+    def update(self, time, open_, high, low, close, volume):
+        """
+        Fold one base bar update (the forming bar or a newly opened one) into every target.
+        """
+        bar = (open_, high, low, close, volume)
+        for target, width in self.widths.items():
+            bucket = time - time % width
+            state = self._state[target]
+            if state is None or bucket > state[0]:
+                state = (bucket, None, time, bar)
+            elif bucket < state[0] or time < state[2]:
+                continue  # Late update for a bar that has already been folded
+            elif time > state[2]:
+                # The previous base bar closed inside the same bucket
+                state = (bucket, self._combine(state[1], state[3]), time, bar)
+            else:
+                state = (bucket, state[1], time, bar)
+            self._state[target] = state
+            self.buffers[target].upsert(bucket, *self._combine(state[1], bar))
+
+    def backfill(self, df, volume_column='volume'):
+        """
+        Rebuild every target from base history (a DataFrame with time and OHLCV columns).
+        """
+        if df is None or df.empty:
+            return
+        times = pd.to_datetime(df['time']).values.astype(f'datetime64[{self.time_unit}]').astype(np.int64)
+        values = [df[volume_column if name == 'volume' else name].to_numpy(dtype=np.float64)
+                  for name in COLUMNS]
+
+        for target, width in self.widths.items():
+            t, o, h, l, c, v = resample_ohlcv(times, *values, width)
+            # A leading bucket that started before the history did would be a partial candle
+            keep = t >= times[0]
+            keep[-1] = True
+            t, o, h, l, c, v = (x[keep] for x in (t, o, h, l, c, v))
+            buffer = self.buffers[target]
+            buffer.clear()
+            buffer.extend(pd.DataFrame({'time': pd.to_datetime(t, unit=self.time_unit), 'open': o,
+                                        'high': h, 'low': l, 'close': c, 'volume': v}))
+
+            # Running state: closed base bars of the last bucket, then the last base bar
+            first = int(np.searchsorted(times, t[-1], side='left'))
+            closed = None
+            if first < len(times) - 1:
+                head = resample_ohlcv(times[first:-1], *[col[first:-1] for col in values], width)
+                closed = tuple(float(x[0]) for x in head[1:])
+            last = tuple(float(col[-1]) for col in values)
+            self._state[target] = (int(t[-1]), closed, int(times[-1]), last)
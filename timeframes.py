@@ -0,0 +1,36 @@
+# Binance kline interval names and their length in seconds
+BINANCE_INTERVALS = {
+    '1s': 1,
+    '1m': 60,
+    '3m': 3 * 60,
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '30m': 30 * 60,
+    '1h': 60 * 60,
+    '2h': 2 * 60 * 60,
+    '4h': 4 * 60 * 60,
+    '6h': 6 * 60 * 60,
+    '8h': 8 * 60 * 60,
+    '12h': 12 * 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+
+def timeframe_seconds(timeframe):
+    """
+    Length of a bar in seconds for a Binance interval name ('1m', '4h', ...) or
+    an MT5 TIMEFRAME_* constant. MT5 encodes minutes directly (M1 = 1 ... M30 = 30),
+    hours as 0x4000 | hours (H1 = 16385 ... D1 = 16408), W1 as 0x8001 and MN1 as
+    0xC001; months are approximated as 30 days.
+    """
+    if isinstance(timeframe, str):
+        return BINANCE_INTERVALS[timeframe]
+    timeframe = int(timeframe)
+    kind, value = timeframe & 0xC000, timeframe & 0x3FFF
+    if kind == 0:
+        return value * 60
+    if kind == 0x4000:
+        return value * 60 * 60
+    if kind == 0x8000:
+        return value * 7 * 24 * 60 * 60
+    return value * 30 * 24 * 60 * 60
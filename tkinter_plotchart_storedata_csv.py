@@ -1,9 +1,13 @@
-import matplotlib.pyplot as plt
-import mplfinance as mpf
+import queue
+import threading
 import MetaTrader5 as mt5
-import pandas as pd
-import time
-from tkinter import Tk, StringVar, OptionMenu
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+from candle_archive import rates_to_frame
+from candle_renderer import BlitCandleChart
+from candle_store import CandleStore
+from incremental_fetch import IncrementalFetcher
+from tkinter import Tk, StringVar, OptionMenu, TOP, BOTH
 
 # Available timeframes
 TIMEFRAMES = {
@@ -15,76 +19,108 @@ TIMEFRAMES = {
 }
 
 SYMBOL = "BTCUSD"  # You can change this to any other symbol
-CSV_FILE = "data.csv"  # File to store data
+CANDLES = 100  # Bars shown on the chart
+FETCH_INTERVAL = 1.0  # Seconds between fetches on the worker thread
+RENDER_INTERVAL = 100  # Milliseconds between checks of the Tk loop for fetched data
+store = CandleStore()  # Deduplicated per-symbol/timeframe CSV files under candles/
+fetcher = IncrementalFetcher()  # Only asks the terminal for the forming bar after the first load
 
 # Initialize MetaTrader 5 connection
 mt5.initialize()
 
 
-def get_data_and_save(symbol, timeframe, count=100):
-    rates = mt5.copy_rates_from_pos(symbol, timeframe, 0, count)
+def get_data_and_save(symbol, timeframe, count=CANDLES):
+    rates = fetcher.fetch(symbol, timeframe, count)
     if rates is None or len(rates) == 0:
         print(f"Failed to retrieve data for {symbol}")
-        return pd.DataFrame()  # Return empty DataFrame if there's an issue
+        return None
 
-    # Create DataFrame and format time
-    df = pd.DataFrame(rates)
-    df['time'] = pd.to_datetime(df['time'], unit='s')
-    df = df[['time', 'open', 'high', 'low', 'close', 'tick_volume']]
-    df.rename(columns={'tick_volume': 'volume'}, inplace=True)
+    # Same layout as every other writer of the store: time, OHLC and tick_volume
+    df = rates_to_frame(rates)
 
-    # Append data to CSV
-    df.to_csv(CSV_FILE, mode='a', header=not pd.io.common.file_exists(CSV_FILE), index=False)
+    # Upsert new or changed bars into the candle store
+    store.upsert(symbol, timeframe, df)
 
     return df
 
 
-def plot_realtime_chart(selected_interval):
-    selected_timeframe = TIMEFRAMES[selected_interval]
-
-    fig, (ax, ax_volume) = plt.subplots(2, 1, figsize=(10, 8), gridspec_kw={'height_ratios': [3, 1]})
-    plt.ion()  # Turn on interactive mode
-    plt.show(block=False)
-
-    while True:
-        df = get_data_and_save(SYMBOL, selected_timeframe, count=100)
+def fetch_worker(selected, results, wake, stop):
+    """
+    Fetch the selected timeframe every FETCH_INTERVAL seconds, or right away
+    when woken by a timeframe change, and hand the frames to the Tk loop. All
+    terminal and disk I/O happens here, so the GUI never blocks on it. A
+    failed fetch or store write is reported and retried on the next round.
+    """
+    while not stop.is_set():
+        interval = selected['interval']
+        try:
+            df = get_data_and_save(SYMBOL, TIMEFRAMES[interval])
+        except Exception as e:
+            print(f"Error fetching {SYMBOL} at {interval} timeframe: {e}")
+            df = None
+        if df is not None:
+            results.put((interval, df))
+        wake.wait(FETCH_INTERVAL)
+        wake.clear()
+
+
+# GUI for selecting time frame using Tkinter, with the chart embedded below
+root = Tk()
+root.title(f"Live Chart for {SYMBOL}")
 
-        if not df.empty:
-            ax.cla()
-            ax_volume.cla()
+selected_interval = StringVar(root)
+selected_interval.set("1 Min")  # Default value
+selected = {'interval': selected_interval.get()}  # Read by the worker thread
 
-            # Plot the latest 100 candles with volume
-            mpf.plot(
-                df.set_index('time'),
-                type='candle',
-                style='charles',
-                ax=ax,
-                volume=ax_volume,
-                ylabel="Price",
-                ylabel_lower="Volume"
-            )
+fig = Figure(figsize=(10, 8))
+ax, ax_volume = fig.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]})
+canvas = FigureCanvasTkAgg(fig, master=root)
+chart = BlitCandleChart(fig, ax, ax_volume)
+chart.reset(f"Live Chart for {SYMBOL} ({selected['interval']})")
 
-            ax.set_title(f"Live Chart for {SYMBOL} ({selected_interval})")
+results = queue.Queue()
+wake = threading.Event()
+stop = threading.Event()
+worker = threading.Thread(target=fetch_worker, args=(selected, results, wake, stop), daemon=True)
 
-            plt.pause(1)  # Adjust update interval if needed
 
-        time.sleep(1)  # Fetch new data every second
+def on_dropdown_change(value):
+    # Switch the chart without leaving the Tk mainloop; the worker fetches the new timeframe next
+    selected['interval'] = value
+    chart.reset(f"Live Chart for {SYMBOL} ({value})")
+    wake.set()
 
 
-def on_dropdown_change(value):
-    plot_realtime_chart(value)
+def render():
+    # Only the most recent frame of the selected timeframe is drawn
+    latest = None
+    while True:
+        try:
+            interval, df = results.get_nowait()
+        except queue.Empty:
+            break
+        if interval == selected['interval']:
+            latest = df
+    if latest is not None:
+        chart.update(latest, volume_column='tick_volume')
+    root.after(RENDER_INTERVAL, render)
 
 
-# GUI for selecting time frame using Tkinter
-root = Tk()
-root.title("Select Timeframe")
+def on_close():
+    stop.set()
+    wake.set()
+    root.quit()
 
-selected_interval = StringVar(root)
-selected_interval.set("1 Min")  # Default value
 
 dropdown = OptionMenu(root, selected_interval, *TIMEFRAMES.keys(), command=on_dropdown_change)
 dropdown.pack()
+canvas.get_tk_widget().pack(side=TOP, fill=BOTH, expand=True)
+root.protocol("WM_DELETE_WINDOW", on_close)
 
+worker.start()
+root.after(RENDER_INTERVAL, render)
 root.mainloop()
 
-mt5.shutdown()  # Disconnect from MetaTrader 5 when done
\ No newline at end of file
+worker.join()  # Let the last fetch finish before disconnecting
+root.destroy()
+mt5.shutdown()  # Disconnect from MetaTrader 5 when done